@@ -0,0 +1,427 @@
+# Game statistics
+# Every finished game is added to a set of running totals for its board size as it comes in: the mean and variance of
+# the scores and moves (Welford's method), a count of games for each max tile, the time taken to reach 2048, and a sketch
+# of the scores which gives approximate percentiles. None of these keep the games themselves, so they take the same
+# memory after a million games as after one, and the menu can show them without reading any history.
+#
+# The game appends a fixed size record for each finished game to a games log, and saves the totals after each game, both
+# on a background thread. The totals can always be rebuilt from the log, which is read a chunk of records at a time so a
+# log of any size can be processed with little memory. Run this file to rebuild or print the totals, from a games log or from the JSON lines
+# written by simulate.py --output.
+
+import argparse
+import itertools
+import json
+import math
+import os
+import queue
+import struct
+import threading
+import time
+
+gamesLogPath = "games.bin"
+analyticsPath = "analytics.json"
+
+# A games log record: rows, columns, score, moves, max tile exponent, game length in milliseconds, then the milliseconds
+# and moves it took to reach 2048, both 0 if the game never reached it (or the time wasn't recorded)
+gameRecord = struct.Struct("<BBQIBIII")
+
+# The tile that counts as winning, as an exponent
+winExponent = 11
+
+
+def boardName(rows, columns):
+    '''Return the name of a board size, in the same "R x C" form as the leaderboard'''
+    return f"{rows} x {columns}"
+
+
+class RunningStats:
+    '''The count, mean, variance, min and max of a stream of numbers, updated one number at a time'''
+    __slots__ = ("count", "mean", "m2", "minimum", "maximum")
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=None, maximum=None):
+        '''Start empty, or carry on from saved totals'''
+        self.count = count
+        self.mean = mean
+        # The sum of squared differences from the mean, the variance is this over the count
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def add(self, value):
+        '''Add one number'''
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def merge(self, other):
+        '''Add every number counted by another RunningStats, as if they had been added here'''
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+        self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+
+    def variance(self):
+        '''Return the population variance, 0 when fewer than 2 numbers have been added'''
+        return self.m2 / self.count if self.count > 1 else 0.0
+
+    def stdev(self):
+        '''Return the population standard deviation'''
+        return math.sqrt(self.variance())
+
+    def toList(self):
+        '''Return the totals as a list, for saving'''
+        return [self.count, self.mean, self.m2, self.minimum, self.maximum]
+
+
+class QuantileSketch:
+    '''Approximate percentiles of a stream of numbers that are 0 or more. Numbers are counted in buckets which grow by a
+    fixed ratio, so any percentile is within relativeAccuracy of the real value and the number of buckets only grows with
+    the log of the largest number (a few hundred buckets cover every possible score)'''
+
+    def __init__(self, relativeAccuracy=0.01, buckets=None, zeroCount=0):
+        '''Start empty, or carry on from saved buckets'''
+        self.relativeAccuracy = relativeAccuracy
+        self.gamma = (1 + relativeAccuracy) / (1 - relativeAccuracy)
+        self.logGamma = math.log(self.gamma)
+        # Bucket index to count, bucket i holds the numbers from gamma ** (i - 1) up to gamma ** i
+        self.buckets = buckets if buckets is not None else {}
+        self.zeroCount = zeroCount
+        self.count = zeroCount + sum(self.buckets.values())
+
+    def add(self, value):
+        '''Add one number'''
+        self.count += 1
+        if value <= 0:
+            self.zeroCount += 1
+            return
+        index = math.ceil(math.log(value) / self.logGamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other):
+        '''Add every number counted by another sketch with the same accuracy'''
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zeroCount += other.zeroCount
+        self.count += other.count
+
+    def quantile(self, fraction):
+        '''Return the approximate number a fraction (0 to 1) of the way through the numbers added, or None if there are none'''
+        if self.count == 0:
+            return None
+        rank = fraction * (self.count - 1)
+        seen = self.zeroCount
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # The middle of the bucket, measured so that the error is the same either side
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def toDict(self):
+        '''Return the sketch as a dictionary, for saving'''
+        return {"relativeAccuracy": self.relativeAccuracy, "zeroCount": self.zeroCount,
+                "buckets": {str(index): count for index, count in self.buckets.items()}}
+
+    @classmethod
+    def fromDict(cls, data):
+        '''Create a sketch from a dictionary made by toDict'''
+        return cls(data["relativeAccuracy"], {int(index): count for index, count in data["buckets"].items()}, data["zeroCount"])
+
+
+class SizeStats:
+    '''The running totals for every game played on one board size'''
+
+    def __init__(self):
+        '''Start with no games'''
+        self.scores = RunningStats()
+        self.scoreSketch = QuantileSketch()
+        self.moves = RunningStats()
+        self.durations = RunningStats()
+        # Max tile exponent to the number of games that ended with it
+        self.maxTiles = {}
+        # Only games that reached 2048 with a recorded time are counted in these
+        self.winTimes = RunningStats()
+        self.winTimeSketch = QuantileSketch()
+        self.winMoves = RunningStats()
+
+    @property
+    def games(self):
+        '''Return the number of games counted'''
+        return self.scores.count
+
+    def add(self, record):
+        '''Add one game from a games log record'''
+        rows, columns, score, moves, maxExponent, durationMs, winMs, winMoves = record
+        self.scores.add(score)
+        self.scoreSketch.add(score)
+        self.moves.add(moves)
+        self.durations.add(durationMs)
+        self.maxTiles[maxExponent] = self.maxTiles.get(maxExponent, 0) + 1
+        if winMs > 0:
+            self.winTimes.add(winMs)
+            self.winTimeSketch.add(winMs)
+            self.winMoves.add(winMoves)
+
+    def merge(self, other):
+        '''Add every game counted by another SizeStats'''
+        for name in ("scores", "scoreSketch", "moves", "durations", "winTimes", "winTimeSketch", "winMoves"):
+            getattr(self, name).merge(getattr(other, name))
+        for exponent, count in other.maxTiles.items():
+            self.maxTiles[exponent] = self.maxTiles.get(exponent, 0) + count
+
+    def scorePercentile(self, fraction):
+        '''Return the approximate score a fraction (0 to 1) of the way through the games, kept within the real min and max'''
+        value = self.scoreSketch.quantile(fraction)
+        return None if value is None else min(max(value, self.scores.minimum), self.scores.maximum)
+
+    def winRate(self):
+        '''Return the fraction of games that ended with a 2048 tile or bigger'''
+        wins = sum(count for exponent, count in self.maxTiles.items() if exponent >= winExponent)
+        return wins / self.games if self.games else 0.0
+
+    def toDict(self):
+        '''Return the totals as a dictionary, for saving'''
+        return {
+            "scores": self.scores.toList(), "scoreSketch": self.scoreSketch.toDict(), "moves": self.moves.toList(),
+            "durations": self.durations.toList(), "maxTiles": {str(exponent): count for exponent, count in self.maxTiles.items()},
+            "winTimes": self.winTimes.toList(), "winTimeSketch": self.winTimeSketch.toDict(), "winMoves": self.winMoves.toList(),
+        }
+
+    @classmethod
+    def fromDict(cls, data):
+        '''Create a SizeStats from a dictionary made by toDict'''
+        stats = cls()
+        for name in ("scores", "moves", "durations", "winTimes", "winMoves"):
+            setattr(stats, name, RunningStats(*data[name]))
+        stats.scoreSketch = QuantileSketch.fromDict(data["scoreSketch"])
+        stats.winTimeSketch = QuantileSketch.fromDict(data["winTimeSketch"])
+        stats.maxTiles = {int(exponent): count for exponent, count in data["maxTiles"].items()}
+        return stats
+
+
+class GameAnalytics:
+    '''Running totals for each board size, updated as each game finishes'''
+
+    def __init__(self):
+        '''Start with no games'''
+        # Board size name ("4 x 4") to its SizeStats
+        self.sizes = {}
+
+    def addGame(self, record):
+        '''Add one game from a games log record'''
+        name = boardName(record[0], record[1])
+        stats = self.sizes.get(name)
+        if stats is None:
+            stats = self.sizes[name] = SizeStats()
+        stats.add(record)
+
+    def addRecords(self, records):
+        '''Add every game from an iterable of records, returning how many were added'''
+        count = 0
+        for record in records:
+            self.addGame(record)
+            count += 1
+        return count
+
+    def merge(self, other):
+        '''Add every game counted by another GameAnalytics'''
+        for name, stats in other.sizes.items():
+            self.sizes.setdefault(name, SizeStats()).merge(stats)
+
+    def boardSizes(self):
+        '''Return the board size names, the most played first'''
+        return sorted(self.sizes, key=lambda name: -self.sizes[name].games)
+
+    def toDict(self):
+        '''Return the totals for every board size as a dictionary, for saving'''
+        return {name: stats.toDict() for name, stats in self.sizes.items()}
+
+    def save(self, path=analyticsPath):
+        '''Save the totals'''
+        writeTotals(self.toDict(), path)
+
+    @classmethod
+    def load(cls, path=analyticsPath):
+        '''Load totals saved by save'''
+        with open(path) as f:
+            data = json.load(f)
+        analytics = cls()
+        analytics.sizes = {name: SizeStats.fromDict(stats) for name, stats in data.items()}
+        return analytics
+
+    @classmethod
+    def open(cls, path=analyticsPath, logPath=gamesLogPath):
+        '''Load the saved totals, or rebuild them from the games log (and save them) if they haven't been saved or can't be read'''
+        try:
+            return cls.load(path)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        analytics = cls()
+        for chunk in readGamesLog(logPath):
+            analytics.addRecords(chunk)
+        if analytics.sizes:
+            analytics.save(path)
+        return analytics
+
+
+def writeTotals(totals, path=analyticsPath):
+    '''Save totals from GameAnalytics.toDict, the new file replaces the old one in a single step so a crash can't leave half a file'''
+    temporaryPath = path + ".tmp"
+    with open(temporaryPath, "w") as f:
+        json.dump(totals, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporaryPath, path)
+
+
+def appendGame(record, path=gamesLogPath):
+    '''Add one game record to the end of a games log, flushed to disk before this returns. A record cut short by a crash
+    is cut off first, so the records after it still line up'''
+    with open(path, "ab") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size % gameRecord.size:
+            f.truncate(size - size % gameRecord.size)
+        f.write(gameRecord.pack(*record))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def isValidRecord(record):
+    '''Return whether a games log record could have been written by the game. After a crash some file systems leave
+    blocks of zeros where the last records were, and a board always has at least one row and column'''
+    return record[0] > 0 and record[1] > 0
+
+
+def readGamesLog(path=gamesLogPath, chunkSize=65536):
+    '''Yield the records in a games log a chunk at a time, as iterators of tuples. A missing log has no records, a
+    partly written record at the end (from a crash while writing it) is skipped, and so are damaged records'''
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return
+    with f:
+        while True:
+            data = f.read(chunkSize * gameRecord.size)
+            whole = len(data) - len(data) % gameRecord.size
+            if whole == 0:
+                break
+            yield filter(isValidRecord, gameRecord.iter_unpack(memoryview(data)[:whole]))
+
+
+class AnalyticsWriter:
+    '''Appends finished games to the games log and saves the totals on a background thread, so the game never waits for the disk'''
+
+    def __init__(self, path=analyticsPath, logPath=gamesLogPath):
+        '''Start the writing thread'''
+        self.path = path
+        self.logPath = logPath
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, record, totals):
+        '''Queue a game record, and the totals from GameAnalytics.toDict once it was added. This returns straight away'''
+        self.queue.put((record, totals))
+
+    def run(self):
+        '''Append queued games to the log until None is queued'''
+        totals = None
+        while True:
+            item = self.queue.get()
+            try:
+                if item is not None:
+                    record, totals = item
+                    appendGame(record, self.logPath)
+                # Every game is appended, but only the newest totals need saving once everything waiting has been written
+                if totals is not None and (item is None or self.queue.empty()):
+                    writeTotals(totals, self.path)
+                    totals = None
+            except OSError as error:
+                # A failed write shouldn't stop the game, the totals can be rebuilt from whatever is in the log
+                print(f"Couldn't save the statistics: {error}")
+            if item is None:
+                break
+
+    def close(self):
+        '''Write everything still queued, then stop the thread'''
+        self.queue.put(None)
+        self.thread.join()
+
+
+def readSimulationLog(path, size, chunkSize=65536):
+    '''Yield the games in a JSON lines file from simulate.py --output a chunk at a time, as lists of records. The
+    simulator doesn't say when a game reached 2048, and its times are how long the AI took rather than a player'''
+    with open(path) as f:
+        while True:
+            lines = list(itertools.islice(f, chunkSize))
+            if not lines:
+                break
+            records = []
+            for line in lines:
+                result = json.loads(line)
+                exponent = result["maxTile"].bit_length() - 1 if result["maxTile"] > 0 else 0
+                records.append((size[0], size[1], result["score"], result["moves"], exponent, int(result["time"] * 1000), 0, 0))
+            yield records
+
+
+def describe(name, stats):
+    '''Return lines of text summarizing the games on one board size'''
+    scores = stats.scores
+    lines = [
+        f"{name}: {stats.games} games",
+        f"  Score: mean {scores.mean:.1f}, stdev {scores.stdev():.1f}, min {scores.minimum}, max {scores.maximum}",
+        f"  Score percentiles: p50 {stats.scorePercentile(0.5):.0f}, p90 {stats.scorePercentile(0.9):.0f}, "
+        f"p99 {stats.scorePercentile(0.99):.0f}",
+        f"  Moves per game: mean {stats.moves.mean:.1f}, stdev {stats.moves.stdev():.1f}",
+        "  Max tiles: " + ", ".join(f"{1 << exponent if exponent else 0}: {count}" for exponent, count in sorted(stats.maxTiles.items())),
+        f"  Reached 2048: {stats.winRate():.1%}",
+    ]
+    if stats.winTimes.count:
+        lines.append(f"  Time to 2048: mean {stats.winTimes.mean / 1000:.1f}s, median {stats.winTimeSketch.quantile(0.5) / 1000:.1f}s, "
+                     f"best {stats.winTimes.minimum / 1000:.1f}s, mean moves {stats.winMoves.mean:.1f}")
+    return lines
+
+
+def main():
+    '''Build the totals from a games log or simulator output, a chunk at a time, and print them'''
+    parser = argparse.ArgumentParser(description="Work out game statistics from a games log, without loading it all into memory")
+    parser.add_argument("path", nargs="?", default=gamesLogPath, help="games log, or JSON lines from simulate.py --output")
+    parser.add_argument("--size", type=int, default=4, help="width and height of the board, for simulator output")
+    parser.add_argument("--chunk", type=int, default=65536, help="number of games read at a time")
+    parser.add_argument("--output", default=None, help="save the totals to this file, which the game reads (analytics.json)")
+    args = parser.parse_args()
+
+    if args.path.endswith(".jsonl") or args.path.endswith(".json"):
+        chunks = readSimulationLog(args.path, (args.size, args.size), args.chunk)
+    else:
+        chunks = readGamesLog(args.path, args.chunk)
+
+    analytics = GameAnalytics()
+    games = 0
+    startTime = time.perf_counter()
+    for chunk in chunks:
+        games += analytics.addRecords(chunk)
+    elapsed = time.perf_counter() - startTime
+
+    for name in analytics.boardSizes():
+        print("\n".join(describe(name, analytics.sizes[name])))
+    print(f"Read {games} games in {elapsed:.2f}s ({games / elapsed if elapsed > 0 else 0:.0f} games/s)")
+    if args.output:
+        analytics.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Tile animations
+# A move is animated in two parts. First every tile slides from its old cell to its new one, then merged tiles pop and
+# the new tile grows into place. The board itself is updated straight away, the animation only changes what is drawn,
+# so a move made while an animation is running is never lost: the old animation is skipped and the new one starts
+# from the updated board. Each frame is built as a list of (surface, position) pairs and drawn with a single blits call.
+
+import math
+import time
+
+import pygame
+
+# Scaled tile surfaces used while tiles pop, by (value, size in pixels). Sizes are whole pixels, so this stays small
+scaledSurfaces = {}
+
+
+def easeOutCubic(progress):
+    '''Ease a progress from 0 to 1 so it starts quickly and slows down at the end'''
+    return 1 - (1 - progress) ** 3
+
+
+def getScaledSurface(surface, value, size):
+    '''Return a tile surface scaled to size pixels, scaling it the first time that size is used'''
+    key = (value, size)
+    if key not in scaledSurfaces:
+        scaledSurfaces[key] = pygame.transform.smoothscale(surface, (size, size))
+    return scaledSurfaces[key]
+
+
+class MoveAnimation:
+    def __init__(self, tracks, oldValues, newValues, spawned, slideTime=0.1, popTime=0.1):
+        '''Set up the animation of one move. tracks comes from engine.moveTracks, oldValues and newValues are the tile values
+        before and after the move (including the spawned tile) and spawned is the cell the new tile appeared in'''
+        self.movements = [(fromCell, toCell, oldValues[fromCell]) for fromCell, toCell, merged in tracks]
+        self.mergedCells = {toCell for fromCell, toCell, merged in tracks if merged}
+        self.newValues = newValues
+        self.spawned = spawned
+        self.slideTime = slideTime
+        self.popTime = popTime
+        self.startTime = time.perf_counter()
+
+    def isFinished(self, now=None):
+        '''Check if the whole animation has been shown'''
+        if now is None:
+            now = time.perf_counter()
+        return now - self.startTime >= self.slideTime + self.popTime
+
+    def getScale(self, cell, progress):
+        '''Return how big the tile in a cell should be drawn while tiles pop, as a fraction of its normal size'''
+        if cell == self.spawned:
+            return easeOutCubic(progress)
+        if cell in self.mergedCells:
+            return 1 + 0.2 * math.sin(math.pi * progress)
+        return 1
+
+    def getBlits(self, now, positions, tileSize, getSurface):
+        '''Return a list of (surface, position) pairs for the tiles at this point in the animation. positions is the top left
+        corner of every cell, and getSurface returns the surface for a tile value'''
+        elapsed = now - self.startTime
+        blits = []
+
+        if elapsed < self.slideTime:
+            # Slide every tile from its old cell towards its new one
+            progress = easeOutCubic(elapsed / self.slideTime)
+            for fromCell, toCell, value in self.movements:
+                fromX, fromY = positions[fromCell]
+                toX, toY = positions[toCell]
+                blits.append((getSurface(value), (fromX + (toX - fromX) * progress, fromY + (toY - fromY) * progress)))
+            return blits
+
+        # Every tile is in its new cell, merged tiles pop and the new tile grows into place
+        progress = min(1.0, (elapsed - self.slideTime) / self.popTime)
+        for cell in range(len(self.newValues)):
+            value = self.newValues[cell]
+            if value == 0:
+                continue
+            scale = self.getScale(cell, progress)
+            x, y = positions[cell]
+            if scale == 1:
+                blits.append((getSurface(value), (x, y)))
+            else:
+                size = max(1, int(tileSize * scale))
+                offset = (tileSize - size) / 2
+                blits.append((getScaledSurface(getSurface(value), value, size), (x + offset, y + offset)))
+        return blits
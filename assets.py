@@ -0,0 +1,56 @@
+# Asset manager
+# Fonts and the window icon are loaded from disk the first time they are used and kept from then on, and rendered text
+# is cached so the same text (menu labels, tile numbers, scores) is only rendered once. Nothing is loaded when this
+# module is imported, so headless tools can import the game without a display.
+
+from collections import OrderedDict
+
+import pygame
+
+fontPath = "./ClearSans-Bold.ttf"
+iconPath = "./2048.ico"
+
+
+def initPygame():
+    '''Start only the pygame subsystems the game uses, the display and fonts. pygame.init() would also start sound,
+    joysticks and the rest, which the game never uses'''
+    pygame.display.init()
+    pygame.font.init()
+
+
+class Assets:
+    def __init__(self, textCacheSize=512):
+        '''Create empty caches, textCacheSize is how many rendered pieces of text are kept'''
+        self.fonts = {}
+        self.textCache = OrderedDict()
+        self.textCacheSize = textCacheSize
+        self.windowIcon = None
+
+    def font(self, size):
+        '''Return the game font at the size given, loading it the first time that size is used'''
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.Font(fontPath, size)
+        return self.fonts[size]
+
+    def icon(self):
+        '''Return the window icon, loading it the first time it is used'''
+        if self.windowIcon is None:
+            self.windowIcon = pygame.image.load(iconPath)
+        return self.windowIcon
+
+    def text(self, text, size, color):
+        '''Return a surface with the text rendered in the game font. The least recently used text is dropped once the cache is full'''
+        key = (text, size, color)
+        surface = self.textCache.get(key)
+        if surface is None:
+            surface = self.font(size).render(text, True, color)
+            self.textCache[key] = surface
+            if len(self.textCache) > self.textCacheSize:
+                self.textCache.popitem(last=False)
+        else:
+            self.textCache.move_to_end(key)
+        return surface
+
+
+# Shared by the whole game, so every part of it uses the same caches
+assets = Assets()
@@ -0,0 +1,109 @@
+# Autosave
+# The game in progress is saved as a small snapshot (the packed board, score, move count, time played, spawn stream state
+# and a few flags) so it can be carried on after the game is closed or crashes. Snapshots are handed to an Autosaver,
+# which writes them on a background thread, so a frame never waits for the disk. Only the newest snapshot waiting is
+# kept, so however fast moves are made the file is written at most once every interval, and the moves in between are
+# folded into the next write.
+#
+# Each save is written to a temporary file which then replaces the save in a single step, so a crash while saving
+# leaves the last complete save rather than half a file.
+
+import os
+import pickle
+import threading
+
+savePath = "autosave.bin"
+
+# Snapshots from other versions of the game are ignored rather than restored wrongly
+saveVersion = 1
+
+
+def writeSave(snapshot, path=savePath):
+    '''Write a snapshot, replacing the old save only once the new one is safely on disk'''
+    temporaryPath = path + ".tmp"
+    with open(temporaryPath, "wb") as f:
+        pickle.dump(snapshot, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporaryPath, path)
+
+
+def loadSave(path=savePath):
+    '''Return the saved snapshot, or None if there isn't one that can be used'''
+    try:
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != saveVersion:
+        return None
+    return snapshot
+
+
+def removeSave(path=savePath):
+    '''Delete the save, once the game it holds has ended'''
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class Autosaver:
+    '''Writes snapshots on a background thread, only ever writing the newest one'''
+
+    # Queued instead of a snapshot to delete the save
+    removal = object()
+
+    def __init__(self, path=savePath, interval=0.5):
+        '''Start the saving thread. interval is the shortest time in seconds between writes'''
+        self.path = path
+        self.interval = interval
+        self.condition = threading.Condition()
+        # The newest snapshot that hasn't been written yet, a newer one replaces it
+        self.pending = None
+        self.closing = False
+        self.writes = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def save(self, snapshot):
+        '''Queue a snapshot to be written, replacing any that hasn't been written yet. This returns straight away'''
+        with self.condition:
+            self.pending = snapshot
+            self.condition.notify()
+
+    def clear(self):
+        '''Queue the save to be deleted, along with any snapshot that hasn't been written yet'''
+        self.save(self.removal)
+
+    def run(self):
+        '''Write snapshots as they are queued until the saver is closed'''
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closing:
+                    self.condition.wait()
+                snapshot = self.pending
+                self.pending = None
+            if snapshot is None:
+                return
+
+            try:
+                if snapshot is self.removal:
+                    removeSave(self.path)
+                else:
+                    writeSave(snapshot, self.path)
+                    self.writes += 1
+            except OSError as error:
+                # A failed save shouldn't stop the game, the next snapshot will try again
+                print(f"Couldn't autosave: {error}")
+
+            # Wait before the next write, moves made in the meantime are folded into one snapshot. Closing ends the wait
+            with self.condition:
+                self.condition.wait_for(lambda: self.closing, timeout=self.interval)
+
+    def close(self):
+        '''Write the snapshot still waiting, if there is one, and stop the thread'''
+        with self.condition:
+            self.closing = True
+            self.condition.notify()
+        self.thread.join()
@@ -0,0 +1,148 @@
+# NumPy batch engine
+# Holds many boards at once as a (boards, rows, columns) uint8 array of exponents (0 = empty, 1 = a 2 tile, ...)
+# and moves or spawns tiles on all of them with array operations, rather than looping over boards in Python.
+# Directions are the same as engine.py, 0 = Up, 1 = Right, 2 = Down, 3 = Left.
+
+import numpy as np
+
+import engine
+
+
+def slideLeft(lines):
+    '''Slide a (lines, width) exponent array to the left, merging equal pairs once. Returns the new lines and the score of each line'''
+    lines = compactLeft(lines)
+    rewards = np.zeros(len(lines), dtype=np.int64)
+
+    # Merge from the left, a tile set to 0 by a merge can't match the tile after it, so each tile only merges once.
+    # Like the scalar engine, tiles at maxExponent don't merge, so exponents always fit in 4 bits
+    for i in range(lines.shape[1] - 1):
+        merge = (lines[:, i] == lines[:, i + 1]) & (lines[:, i] > 0) & (lines[:, i] < engine.maxExponent)
+        lines[merge, i] += 1
+        lines[merge, i + 1] = 0
+        rewards += np.where(merge, np.left_shift(1, lines[:, i].astype(np.int64)), 0)
+
+    return compactLeft(lines), rewards
+
+
+def compactLeft(lines):
+    '''Move every non-empty tile in each line to the left, keeping their order'''
+    order = np.argsort(lines == 0, axis=1, kind="stable")
+    return np.take_along_axis(lines, order, axis=1)
+
+
+def orient(boards, direction):
+    '''Turn boards so that moving in the given direction becomes moving left'''
+    if direction == engine.LEFT:
+        return boards
+    if direction == engine.RIGHT:
+        return boards[:, :, ::-1]
+    if direction == engine.UP:
+        return boards.transpose(0, 2, 1)
+    return boards.transpose(0, 2, 1)[:, :, ::-1]
+
+
+def unorient(boards, direction):
+    '''Undo orient, turning boards back to their normal layout'''
+    if direction == engine.LEFT:
+        return boards
+    if direction == engine.RIGHT:
+        return boards[:, :, ::-1]
+    if direction == engine.UP:
+        return boards.transpose(0, 2, 1)
+    return boards[:, :, ::-1].transpose(0, 2, 1)
+
+
+def moveBatch(boards, moves):
+    '''Move each board in the direction given for it. Returns the new boards, the score gained and whether each board moved'''
+    moves = np.asarray(moves)
+    count = len(boards)
+    newBoards = boards.copy()
+    rewards = np.zeros(count, dtype=np.int64)
+
+    # Handle all of the boards moving in the same direction together, so there are at most 4 passes
+    for direction in (engine.UP, engine.RIGHT, engine.DOWN, engine.LEFT):
+        selected = np.flatnonzero(moves == direction)
+        if len(selected) == 0:
+            continue
+        turned = orient(boards[selected], direction)
+        lines, lineRewards = slideLeft(turned.reshape(-1, turned.shape[2]))
+        newBoards[selected] = unorient(lines.reshape(turned.shape), direction)
+        rewards[selected] = lineRewards.reshape(len(selected), -1).sum(axis=1)
+
+    moved = (newBoards != boards).reshape(count, -1).any(axis=1)
+    return newBoards, rewards, moved
+
+
+def spawnBatch(boards, rng, mask=None):
+    '''Place a 2 (90%) or 4 (10%) tile in a random empty cell of each board, in place. Only boards where mask is set are changed'''
+    count = len(boards)
+    cells = boards.reshape(count, -1)
+    empty = cells == 0
+
+    # Give every empty cell a random key and pick the largest, which is a uniformly random empty cell
+    keys = rng.random(cells.shape)
+    keys[~empty] = -1.0
+    chosen = keys.argmax(axis=1)
+    values = np.where(rng.random(count) < 0.9, 1, 2).astype(boards.dtype)
+
+    place = empty.any(axis=1)
+    if mask is not None:
+        place &= mask
+    selected = np.flatnonzero(place)
+    rows, columns = np.divmod(chosen[selected], boards.shape[2])
+    boards[selected, rows, columns] = values[selected]
+    return boards
+
+
+def legalMoves(boards):
+    '''Return a (boards, 4) array which is True where moving in that direction would change the board'''
+    empty = boards == 0
+    filled = ~empty
+    # Matching tiles can only merge below maxExponent
+    same = (boards[:, :, 1:] == boards[:, :, :-1]) & (boards[:, :, 1:] < engine.maxExponent)
+    sameColumn = (boards[:, 1:, :] == boards[:, :-1, :]) & (boards[:, 1:, :] < engine.maxExponent)
+
+    # A board can move left if a tile has an empty cell to its left, or a matching tile next to it
+    left = ((empty[:, :, :-1] & filled[:, :, 1:]) | (same & filled[:, :, 1:])).any(axis=(1, 2))
+    right = ((filled[:, :, :-1] & empty[:, :, 1:]) | (same & filled[:, :, 1:])).any(axis=(1, 2))
+    up = ((empty[:, :-1, :] & filled[:, 1:, :]) | (sameColumn & filled[:, 1:, :])).any(axis=(1, 2))
+    down = ((filled[:, :-1, :] & empty[:, 1:, :]) | (sameColumn & filled[:, 1:, :])).any(axis=(1, 2))
+
+    legal = np.empty((len(boards), 4), dtype=bool)
+    legal[:, engine.UP] = up
+    legal[:, engine.RIGHT] = right
+    legal[:, engine.DOWN] = down
+    legal[:, engine.LEFT] = left
+    return legal
+
+
+def doneMask(boards):
+    '''Return True for each board that has no moves left'''
+    return ~legalMoves(boards).any(axis=1)
+
+
+class BatchEngine:
+    '''A batch of games stepped together, with its own random generator for the spawns'''
+
+    def __init__(self, batchSize, size=(4, 4), seed=None):
+        '''Create the batch and start every game with two tiles'''
+        self.size = tuple(size)
+        self.rng = np.random.default_rng(seed)
+        self.boards = np.zeros((batchSize,) + self.size, dtype=np.uint8)
+        self.reset()
+
+    def reset(self, mask=None):
+        '''Clear the boards (all of them, or only those where mask is set) and spawn two tiles on each'''
+        if mask is None:
+            mask = np.ones(len(self.boards), dtype=bool)
+        self.boards[mask] = 0
+        for i in range(2):
+            spawnBatch(self.boards, self.rng, mask)
+        return self.boards
+
+    def step(self, moves):
+        '''Apply one move to every board and spawn a tile on the boards that moved.
+        Returns the boards, the score gained, which boards moved and which boards have no moves left'''
+        self.boards, rewards, moved = moveBatch(self.boards, moves)
+        spawnBatch(self.boards, self.rng, moved)
+        return self.boards, rewards, moved, doneMask(self.boards)
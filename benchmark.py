@@ -0,0 +1,299 @@
+# Benchmarks for the game's hot paths
+# Runs without a window using SDL's dummy video driver, so it can be used on machines without a display.
+# Each benchmark times individual calls and reports operations per second and percentiles in microseconds.
+# Results can be saved as a JSON baseline, and a later run can be compared against it, failing if anything
+# has become slower by more than the threshold. The whole suite is run several times and each benchmark is compared on
+# the run with its median ops/sec, as a single run can land on a moment the machine is busy.
+
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+from random import Random
+
+# The dummy driver must be set before pygame is imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import engine
+import game
+from assets import initPygame
+from leaderboard import Leaderboard
+from viewport import getWindowSize
+
+# The game loads its assets with relative paths, so main() runs from the folder the game is in
+gameFolder = os.path.dirname(os.path.abspath(__file__))
+
+boardSizes = [(4, 4), (5, 5), (6, 6)]
+# Large boards, which are moved as strings of cells and drawn with scaled down tiles
+largeBoardSizes = [(16, 16), (64, 64)]
+directionNames = ["up", "right", "down", "left"]
+
+
+def loadGame():
+    '''Start the parts of pygame the game needs and return the game module, without showing the menu'''
+    initPygame()
+    return game
+
+
+def timeCalls(function, setup=None, minTime=0.2, minCalls=20, maxCalls=100000):
+    '''Call a function repeatedly, returning how long each call took in seconds. setup is called before each call and isn't timed'''
+    times = []
+    startTime = time.perf_counter()
+    while len(times) < maxCalls and (len(times) < minCalls or time.perf_counter() - startTime < minTime):
+        if setup:
+            setup()
+        callStart = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - callStart)
+    return times
+
+
+def summarize(times):
+    '''Return operations per second and the mean and percentile times in microseconds for a list of call times'''
+    times = sorted(times)
+    total = sum(times)
+
+    def percentile(fraction):
+        return times[min(len(times) - 1, int(fraction * len(times)))] * 1e6
+
+    return {
+        "calls": len(times),
+        "opsPerSecond": len(times) / total if total > 0 else 0.0,
+        "mean": total / len(times) * 1e6,
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+    }
+
+
+def randomValues(size, rng):
+    '''Return a row-major list of tile values for a half full board'''
+    return [rng.choice([0, 0, 2, 4, 8, 16, 32, 64, 128]) for i in range(size[0] * size[1])]
+
+
+def makeBoard(game, size, values):
+    '''Create a Board with the tile values given, and set up the window to fit it'''
+    game.windowSize = getWindowSize(size)
+    game.screen = pygame.display.set_mode(game.windowSize)
+    board = game.Board(size, seed=0)
+    setValues(board, values)
+    return board
+
+
+def setValues(board, values):
+    '''Put the tile values back on a board, so every call starts from the same position'''
+    board.cells[:] = bytes(value.bit_length() - 1 if value > 0 else 0 for value in values)
+    board.isGameOver = False
+    board.animation = None
+    board.updateStatus()
+
+
+def boardBenchmarks(game, results, rng):
+    '''Time moving, spawning, finding empty cells and drawing on each board size'''
+    for size in boardSizes:
+        label = f"{size[0]}x{size[1]}"
+        values = randomValues(size, rng)
+        board = makeBoard(game, size, values)
+        reset = lambda: setValues(board, values)
+
+        for direction in range(4):
+            results[f"moveTiles {directionNames[direction]} {label}"] = summarize(
+                timeCalls(lambda: board.moveTiles(direction), reset))
+        results[f"spawnRandomPiece {label}"] = summarize(timeCalls(board.spawnRandomPiece, reset))
+        results[f"getPlaceableTiles {label}"] = summarize(timeCalls(board.getPlaceableTiles))
+
+        # Forget what was drawn last time, so the whole board is drawn on every call
+        def forceRedraw():
+            board.drawnValues = None
+        results[f"Board.draw full frame {label}"] = summarize(timeCalls(board.draw, forceRedraw))
+        results[f"Board.draw idle frame {label}"] = summarize(timeCalls(board.draw))
+
+        # Draw frames part way through sliding and popping, a frame has to take well under 16.7ms to keep up 60 FPS
+        reset()
+        board.moveTiles(next(direction for direction in range(4) if board.status.canMove(direction)))
+        animation = board.animation
+        for name, offset in (("slide", animation.slideTime / 2), ("pop", animation.slideTime + animation.popTime / 2)):
+            now = animation.startTime + offset
+            results[f"Board.drawAnimation {name} {label}"] = summarize(timeCalls(lambda: board.drawAnimation(now)))
+
+
+def largeBoardBenchmarks(game, results, rng):
+    '''Time moving, finding empty cells and drawing on large boards, and the engine's moves on their own'''
+    for size in largeBoardSizes:
+        label = f"{size[0]}x{size[1]}"
+        values = randomValues(size, rng)
+        board = makeBoard(game, size, values)
+        reset = lambda: setValues(board, values)
+        packedBoard = board.status.board
+
+        for direction in range(4):
+            results[f"moveTiles {directionNames[direction]} {label}"] = summarize(
+                timeCalls(lambda: board.moveTiles(direction), reset))
+            results[f"engine.moveBoard {directionNames[direction]} {label}"] = summarize(
+                timeCalls(lambda: engine.moveBoard(packedBoard, direction, size)))
+        results[f"engine.boardStatus {label}"] = summarize(timeCalls(lambda: engine.boardStatus(packedBoard, size)))
+        results[f"getPlaceableTiles {label}"] = summarize(timeCalls(board.getPlaceableTiles))
+
+        def forceRedraw():
+            board.drawnValues = None
+        results[f"Board.draw full frame {label}"] = summarize(timeCalls(board.draw, forceRedraw))
+        results[f"Board.draw idle frame {label}"] = summarize(timeCalls(board.draw))
+
+
+def tileBenchmarks(game, results):
+    '''Time drawing a single tile of each value'''
+    game.windowSize = (450, 450)
+    game.screen = pygame.display.set_mode(game.windowSize)
+    for exponent in range(0, 18):
+        value = 1 << exponent if exponent > 0 else 0
+        tile = game.Tile(value, 0, 0)
+        results[f"Tile.draw {value}"] = summarize(timeCalls(tile.draw))
+
+
+def menuBenchmarks(game, results):
+    '''Time drawing the text on one frame of the menu, and starting a new process up to the point the menu can be drawn'''
+    game.screen = pygame.display.set_mode((600, 460))
+    menu = game.Menu((600, 460))
+    game.leaderboard = Leaderboard(":memory:", [], [])
+
+    def drawMenuText():
+        menu.drawTimes()
+        menu.drawScores()
+        menu.drawText("Controls:", 300)
+        menu.drawText("W A S D or Arrow Keys: Move Tiles", 325)
+    results["Menu text frame"] = summarize(timeCalls(drawMenuText))
+    game.leaderboard.close()
+
+    # Startup is timed in new processes, so nothing is already loaded
+    startupCode = ("import game; game.initPygame(); game.pygame.display.set_icon(game.assets.icon()); "
+                   "game.Menu((600, 460)).drawText('Controls:', 300)")
+    times = []
+    for i in range(5):
+        startTime = time.perf_counter()
+        subprocess.run([sys.executable, "-c", startupCode], check=True, capture_output=True)
+        times.append(time.perf_counter() - startTime)
+    results["Startup to menu"] = summarize(times)
+
+
+def writeRecords(path, records):
+    '''Write a list of records to a pickle file, the same way the game saves them'''
+    with open(path, "wb") as f:
+        for record in records:
+            pickle.dump(record, f)
+
+
+def leaderboardBenchmarks(game, results, rng, recordCounts):
+    '''Time reading the top scores and times from leaderboards built from pickle files of different sizes'''
+    game.screen = pygame.display.set_mode((600, 460))
+    menu = game.Menu((600, 460))
+    sizes = ["4 x 4", "5 x 5", "6 x 6"]
+
+    for count in recordCounts:
+        with tempfile.TemporaryDirectory() as folder:
+            scoresPath = os.path.join(folder, "high_scores.bin")
+            timesPath = os.path.join(folder, "best_times.bin")
+            writeRecords(scoresPath, ([rng.randrange(100, 100000), rng.choice(sizes)] for i in range(count)))
+            writeRecords(timesPath, ([rng.randrange(30000, 3600000), rng.randrange(900, 3000), rng.choice(sizes), 2048] for i in range(count)))
+
+            importStart = time.perf_counter()
+            game.leaderboard = Leaderboard(os.path.join(folder, "leaderboard.db"), [scoresPath], [timesPath])
+            results[f"Leaderboard import {count}"] = summarize([time.perf_counter() - importStart])
+
+            clearCache = game.leaderboard.cache.clear
+            results[f"Menu.getScores {count}"] = summarize(timeCalls(menu.getScores, clearCache))
+            results[f"Menu.getTimes {count}"] = summarize(timeCalls(menu.getTimes, clearCache))
+            results[f"Menu.getScores cached {count}"] = summarize(timeCalls(menu.getScores))
+            results[f"Menu.getTimes cached {count}"] = summarize(timeCalls(menu.getTimes))
+            game.leaderboard.close()
+
+
+def runSuite(game, seed, recordCounts):
+    '''Run every benchmark once, returning the results by name'''
+    # Each run starts from the same seed, so every run times the same boards and records
+    rng = Random(seed)
+    results = {}
+    boardBenchmarks(game, results, rng)
+    tileBenchmarks(game, results)
+    largeBoardBenchmarks(game, results, rng)
+    menuBenchmarks(game, results)
+    leaderboardBenchmarks(game, results, rng, recordCounts)
+    return results
+
+
+def combineRuns(runs):
+    '''Return, for each benchmark, the result of the run with its median ops/sec, along with the spread between its
+    fastest and slowest runs as a fraction of the median'''
+    combined = {}
+    for name in runs[0]:
+        ordered = sorted((run[name] for run in runs), key=lambda result: result["opsPerSecond"])
+        result = dict(ordered[len(ordered) // 2])
+        median = result["opsPerSecond"]
+        result["spread"] = (ordered[-1]["opsPerSecond"] - ordered[0]["opsPerSecond"]) / median if median > 0 else 0.0
+        combined[name] = result
+    return combined
+
+
+def compare(results, baseline, threshold):
+    '''Return a list of the benchmarks whose ops/sec have dropped from the baseline by more than threshold (a fraction),
+    or by more than the spread between the baseline's runs if that is wider'''
+    regressions = []
+    for name, result in results.items():
+        # Importing and starting up are only timed a few times, so they are too noisy to compare
+        if name in baseline and not name.startswith(("Leaderboard import", "Startup")):
+            old = baseline[name]["opsPerSecond"]
+            # A benchmark that was very noisy in the baseline still counts as a regression if it becomes 10 times slower
+            allowedDrop = min(0.9, max(threshold, baseline[name].get("spread", 0.0)))
+            if old > 0 and result["opsPerSecond"] < old * (1 - allowedDrop):
+                regressions.append((name, old, result["opsPerSecond"]))
+    return regressions
+
+
+def main():
+    '''Run the benchmarks, print the results and optionally save or compare against a baseline'''
+    parser = argparse.ArgumentParser(description="Benchmark moving, spawning, drawing and the leaderboard, without a display")
+    parser.add_argument("--records", default="1000,100000,1000000", help="comma separated leaderboard sizes to test")
+    parser.add_argument("--save", default=None, help="save the results to this JSON file as a baseline")
+    parser.add_argument("--compare", default=None, help="compare the results with a baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="fraction ops/sec can drop by before it counts as a regression, widened to the baseline's spread")
+    parser.add_argument("--runs", type=int, default=3, help="how many times to run the suite, each benchmark is compared on its median run")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random boards and records")
+    args = parser.parse_args()
+
+    # Baseline paths are relative to where the benchmark was started, everything else to the game folder
+    args.save = os.path.abspath(args.save) if args.save else None
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+    os.chdir(gameFolder)
+
+    game = loadGame()
+    recordCounts = [int(count) for count in args.records.split(",") if count]
+    results = combineRuns([runSuite(game, args.seed, recordCounts) for run in range(max(1, args.runs))])
+
+    print(f"{'Benchmark':40} {'ops/sec':>12} {'spread':>7} {'mean us':>10} {'p50 us':>10} {'p90 us':>10} {'p99 us':>10}")
+    for name, result in results.items():
+        print(f"{name:40} {result['opsPerSecond']:12.0f} {result['spread']:7.0%} {result['mean']:10.1f} {result['p50']:10.1f} "
+              f"{result['p90']:10.1f} {result['p99']:10.1f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new in regressions:
+            print(f"Regression: {name} dropped from {old:.0f} to {new:.0f} ops/sec")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} compared to {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
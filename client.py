@@ -0,0 +1,128 @@
+# Game server client and load generator
+# GameClient talks to server.py over one connection. Run this file to benchmark a server: it starts many bots at once,
+# each with its own connection and game, which play random legal moves (one per request, or in batches) and start a new
+# game whenever theirs ends. It reports moves and requests per second and the request latency.
+
+import argparse
+import asyncio
+import time
+from random import Random
+
+from replay import encodeMoves
+from server import ServerError, batchFormat, newGameFormat, requestHeader, responseHeader, seedFormat, unpackState
+
+
+class GameClient:
+    '''A connection to the game server. Each call sends one request and waits for its response'''
+
+    def __init__(self, reader, writer):
+        '''Use an open connection, connect() is normally used instead'''
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=2048, path=None):
+        '''Connect to a server on a TCP port, or on a Unix socket if a path is given'''
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, operation, sessionId, payload=b""):
+        '''Send a request and return (session id, response payload), raising ServerError if the server sent an error'''
+        self.writer.write(requestHeader.pack(operation, sessionId, len(payload)) + payload)
+        status, sessionId, length = responseHeader.unpack(await self.reader.readexactly(responseHeader.size))
+        response = await self.reader.readexactly(length) if length > 0 else b""
+        if status == b"E":
+            raise ServerError(response.decode())
+        return sessionId, response
+
+    async def newGame(self, size=(4, 4), seed=None):
+        '''Start a game, returning (session id, state)'''
+        payload = newGameFormat.pack(*size) + (seedFormat.pack(seed) if seed is not None else b"")
+        sessionId, response = await self.request(b"N", 0, payload)
+        return sessionId, unpackState(response)
+
+    async def move(self, sessionId, direction):
+        '''Make one move and return the new state'''
+        return unpackState((await self.request(b"M", sessionId, bytes((direction,))))[1])
+
+    async def moves(self, sessionId, directions):
+        '''Make a list of moves in one request and return the state after them'''
+        payload = batchFormat.pack(len(directions)) + encodeMoves(directions)
+        return unpackState((await self.request(b"B", sessionId, payload))[1])
+
+    async def state(self, sessionId):
+        '''Return the state of a game'''
+        return unpackState((await self.request(b"S", sessionId))[1])
+
+    async def undo(self, sessionId):
+        '''Undo the last move and return the state'''
+        return unpackState((await self.request(b"U", sessionId))[1])
+
+    async def closeGame(self, sessionId):
+        '''End a game, freeing its session on the server'''
+        await self.request(b"C", sessionId)
+
+    async def close(self):
+        '''Close the connection'''
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def runBot(client, rng, size, moves, batch, latencies):
+    '''Play random legal moves until moves have been made, returning the number of moves made'''
+    sessionId, state = await client.newGame(size, rng.getrandbits(63))
+    made = 0
+    while made < moves:
+        if state["gameOver"]:
+            await client.closeGame(sessionId)
+            sessionId, state = await client.newGame(size, rng.getrandbits(63))
+        requestStart = time.perf_counter()
+        if batch > 1:
+            # The legal moves are only known for the first move of a batch, the server skips any that don't move
+            state = await client.moves(sessionId, [rng.randrange(4) for i in range(batch)])
+        else:
+            legal = [direction for direction in range(4) if state["legal"] >> direction & 1]
+            state = await client.move(sessionId, rng.choice(legal))
+        latencies.append(time.perf_counter() - requestStart)
+        made += state["applied"]
+    await client.closeGame(sessionId)
+    return made
+
+
+async def runLoad(bots, moves, size, batch, seed, host, port, path):
+    '''Run bots at once, each on its own connection, returning (moves made, requests, seconds taken, request latencies)'''
+    clients = [await GameClient.connect(host, port, path) for i in range(bots)]
+    latencies = []
+    startTime = time.perf_counter()
+    made = await asyncio.gather(*[runBot(clients[i], Random(f"{seed} {i}"), size, moves, batch, latencies) for i in range(bots)])
+    elapsed = time.perf_counter() - startTime
+    for client in clients:
+        await client.close()
+    return sum(made), len(latencies), elapsed, latencies
+
+
+def main():
+    '''Run the load generator from the command line and print a summary'''
+    parser = argparse.ArgumentParser(description="Benchmark a running game server with many bots playing at once")
+    parser.add_argument("--bots", type=int, default=200, help="number of bots, each with its own connection and game")
+    parser.add_argument("--moves", type=int, default=500, help="moves made by each bot")
+    parser.add_argument("--size", type=int, default=4, help="width and height of the boards")
+    parser.add_argument("--batch", type=int, default=1, help="moves sent in each request, 1 sends a move at a time")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the bots' moves and games")
+    parser.add_argument("--host", default="127.0.0.1", help="server address")
+    parser.add_argument("--port", type=int, default=2048, help="server TCP port")
+    parser.add_argument("--unix", default=None, help="connect to this Unix socket path instead of a TCP port")
+    args = parser.parse_args()
+
+    made, requests, elapsed, latencies = asyncio.run(
+        runLoad(args.bots, args.moves, (args.size, args.size), args.batch, args.seed, args.host, args.port, args.unix))
+    latencies.sort()
+    print(f"Moves: {made} in {elapsed:.2f}s ({made / elapsed:.0f} moves/s, {requests / elapsed:.0f} requests/s)")
+    print(f"Latency: p50 {latencies[len(latencies) // 2] * 1000:.2f}ms, p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
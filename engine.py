@@ -0,0 +1,501 @@
+# Headless move engine for the game
+# Boards are stored as a single packed integer, with 4 bits per cell holding the log2 exponent of the tile value
+# (0 = empty, 1 = a 2 tile, 2 = a 4 tile, ...), so a 4x4 board fits inside 64 bits.
+# Cell (row, column) is stored at bit 4 * (row * columns + column), so the top left tile is in the lowest 4 bits.
+# Nothing in here depends on pygame, so games, AI search and simulations can all share the same code.
+
+import re
+from functools import lru_cache
+
+# Directions, these match the numbers used by Board.moveTiles and main()
+UP = 0
+RIGHT = 1
+DOWN = 2
+LEFT = 3
+
+# The largest exponent a cell can hold, two tiles of this value (32768) will not merge
+maxExponent = 15
+
+# The exponent of the tile needed to win, 2048
+winExponent = 11
+
+rowMask = 0xFFFF
+
+# Lines with at most this many possible states get full lookup tables, 4 cells wide is 65536 states
+defaultTableLimit = 1 << 16
+# The number of line results remembered for each width that is too wide for a table
+defaultCacheSize = 1 << 16
+# Boards with more cells than this are moved as a string of cells (see moveCells) rather than line by line
+cellsLimit = 36
+
+
+def slideLine(line):
+    '''Slide a list of exponents towards index 0, merging equal pairs once. Returns the new line and the score gained'''
+    tiles = [exponent for exponent in line if exponent > 0]
+    result = []
+    gained = 0
+    i = 0
+    while i < len(tiles):
+        # Merge this tile with the next one if they match, each tile can only merge once per move
+        if i + 1 < len(tiles) and tiles[i] == tiles[i + 1] and tiles[i] < maxExponent:
+            result.append(tiles[i] + 1)
+            gained += 1 << (tiles[i] + 1)
+            i += 2
+        else:
+            result.append(tiles[i])
+            i += 1
+    result += [0] * (len(line) - len(result))
+    return result, gained
+
+
+def packLine(line):
+    '''Pack a list of exponents into an integer, with the first exponent in the lowest 4 bits'''
+    packed = 0
+    for i in range(len(line)):
+        packed |= line[i] << (4 * i)
+    return packed
+
+
+def unpackLine(packed, length):
+    '''Unpack an integer into a list of exponents, the reverse of packLine'''
+    return [(packed >> (4 * i)) & 0xF for i in range(length)]
+
+
+class LineMover:
+    '''Moves packed lines of a fixed width. Narrow lines use tables holding every possible line,
+    wider lines have too many states to enumerate, so their results are memoized in an LRU cache instead'''
+
+    def __init__(self, width, tableLimit=None, cacheSize=None):
+        '''Build the lookup tables for this width, or set up the cache if the tables would be too large'''
+        self.width = width
+        self.mask = (1 << (4 * width)) - 1
+        self.tableLimit = tableLimit if tableLimit is not None else defaultTableLimit
+        self.cacheSize = cacheSize if cacheSize is not None else defaultCacheSize
+        self.leftTable = None
+        self.rightTable = None
+        self.scoreTable = None
+        self.infoTable = None
+
+        if self.mask + 1 <= self.tableLimit:
+            self.buildTables()
+        else:
+            self.lookup = lru_cache(maxsize=self.cacheSize)(self.computeLine)
+            self.info = lru_cache(maxsize=self.cacheSize)(self.computeInfo)
+
+    def computeLine(self, line):
+        '''Work out the result of moving a single packed line left and right, and the score gained'''
+        cells = unpackLine(line, self.width)
+        left, gained = slideLine(cells)
+        right = slideLine(cells[::-1])[0][::-1]
+        # Moving a line left or right always merges the same tiles, so the score is shared
+        return packLine(left), packLine(right), gained
+
+    def buildTables(self):
+        '''Precompute the result of moving every possible line of this width. Each line is worked out from the results for
+        the line without its first cell, which are already in the tables, rather than sliding every line cell by cell'''
+        size = self.mask + 1
+        width = self.width
+        topShift = 4 * (width - 1)
+        leftTable = self.leftTable = [0] * size
+        scoreTable = self.scoreTable = [0] * size
+        # The first tile in a line, and the cells after it
+        firstTile = [0] * size
+        afterFirst = [0] * size
+        for line in range(1, size):
+            cell = line & 0xF
+            rest = line >> 4
+            if cell == 0:
+                # An empty first cell makes no difference to where the tiles end up
+                leftTable[line] = leftTable[rest]
+                scoreTable[line] = scoreTable[rest]
+                firstTile[line] = firstTile[rest]
+                afterFirst[line] = afterFirst[rest]
+                continue
+            firstTile[line] = cell
+            afterFirst[line] = rest
+            if firstTile[rest] == cell and cell < maxExponent:
+                # The first tile merges with the next one, then everything after those two slides up behind it
+                after = afterFirst[rest]
+                leftTable[line] = (cell + 1) | (leftTable[after] << 4)
+                scoreTable[line] = (1 << (cell + 1)) + scoreTable[after]
+            else:
+                leftTable[line] = cell | (leftTable[rest] << 4)
+                scoreTable[line] = scoreTable[rest]
+
+        # A line's cells in reverse order, built up from the line without its first cell
+        reverseTable = [0] * size
+        for line in range(1, size):
+            reverseTable[line] = (reverseTable[line >> 4] >> 4) | ((line & 0xF) << topShift)
+
+        # Moving right is moving the reversed line left, then reversing the result
+        leftTable = self.leftTable
+        self.rightTable = [reverseTable[leftTable[reverseTable[line]]] for line in range(size)]
+        self.lookup = self.tableLookup
+
+        # The number of tiles and the largest exponent, also built up from the line without its first cell
+        tileCounts = [0] * size
+        largest = [0] * size
+        for line in range(1, size):
+            tileCounts[line] = tileCounts[line >> 4] + (line & 0xF != 0)
+            largest[line] = max(largest[line >> 4], line & 0xF)
+        rightTable = self.rightTable
+        self.infoTable = [((leftTable[line] != line) | ((rightTable[line] != line) << 1), width - tileCounts[line], largest[line])
+                          for line in range(size)]
+        self.info = self.infoTable.__getitem__
+
+    def tableLookup(self, line):
+        '''Read the result of moving a line from the precomputed tables'''
+        return self.leftTable[line], self.rightTable[line], self.scoreTable[line]
+
+    def computeInfo(self, line):
+        '''Work out which ways a packed line can move (bit 0 for left, bit 1 for right), how many cells are empty and the largest exponent'''
+        left, right, gained = self.lookup(line)
+        cells = unpackLine(line, self.width)
+        return (left != line) | ((right != line) << 1), cells.count(0), max(cells)
+
+    def moveLines(self, lines, reverse):
+        '''Move a list of packed lines towards index 0, or towards the end if reverse is set. Returns the new lines and score'''
+        newLines = []
+        gained = 0
+        for line in lines:
+            left, right, lineScore = self.lookup(line)
+            newLines.append(right if reverse else left)
+            gained += lineScore
+        return newLines, gained
+
+
+lineMovers = {}
+
+
+def getLineMover(width):
+    '''Return the shared LineMover for a width, creating it the first time it is needed'''
+    if width not in lineMovers:
+        lineMovers[width] = LineMover(width)
+    return lineMovers[width]
+
+
+rowMover = getLineMover(4)
+rowLeftTable = rowMover.leftTable
+rowRightTable = rowMover.rightTable
+rowScoreTable = rowMover.scoreTable
+
+
+def transpose(board):
+    '''Transpose a packed 4x4 board, so that rows become columns'''
+    # Swap the tiles inside each 2x2 block
+    a1 = board & 0xF0F00F0FF0F00F0F
+    a2 = board & 0x0000F0F00000F0F0
+    a3 = board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    # Then swap the top right and bottom left 2x2 blocks
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def moveRows(board, table):
+    '''Apply a row table to each of the 4 rows of a packed 4x4 board'''
+    newBoard = 0
+    gained = 0
+    for shift in (0, 16, 32, 48):
+        row = (board >> shift) & rowMask
+        newBoard |= table[row] << shift
+        gained += rowScoreTable[row]
+    return newBoard, gained
+
+
+def move(board, direction):
+    '''Move a packed 4x4 board in a direction. Returns the new board, the score gained and whether anything moved'''
+    if direction == LEFT:
+        newBoard, gained = moveRows(board, rowLeftTable)
+    elif direction == RIGHT:
+        newBoard, gained = moveRows(board, rowRightTable)
+    # Up and down are done by transposing the board, so columns can use the same row tables
+    elif direction == UP:
+        newBoard, gained = moveRows(transpose(board), rowLeftTable)
+        newBoard = transpose(newBoard)
+    elif direction == DOWN:
+        newBoard, gained = moveRows(transpose(board), rowRightTable)
+        newBoard = transpose(newBoard)
+    else:
+        raise ValueError(f"Invalid direction: {direction}")
+    return newBoard, gained, newBoard != board
+
+
+def getRows(board, size):
+    '''Split a packed board of (rows, columns) into a list of packed rows'''
+    rows, columns = size
+    width = 4 * columns
+    mask = (1 << width) - 1
+    return [(board >> (width * r)) & mask for r in range(rows)]
+
+
+def joinRows(lines, columns):
+    '''Join a list of packed rows back into a packed board, the reverse of getRows'''
+    board = 0
+    width = 4 * columns
+    for r in range(len(lines)):
+        board |= lines[r] << (width * r)
+    return board
+
+
+def transposeBoard(board, size):
+    '''Transpose a packed board of any (rows, columns) size, the result is a (columns, rows) board'''
+    rows, columns = size
+    if rows == 4 and columns == 4:
+        return transpose(board)
+    lines = [0] * columns
+    for r, row in enumerate(getRows(board, size)):
+        # Each tile in this row becomes tile r of the line for its column
+        shift = 4 * r
+        for c in range(columns):
+            lines[c] |= ((row >> (4 * c)) & 0xF) << shift
+    return joinRows(lines, rows)
+
+
+# Large boards
+# Lines on wide boards have too many states for tables, and too few repeats for a cache, so large boards are handled as a
+# bytes string with one cell (an exponent) per byte. Rows are joined with a separator byte, and then every row is moved
+# at once using bytes methods, which run in C: removing the zeros slides the tiles, and replacing each equal pair with
+# the next exponent, from the largest exponent down so a new tile can't merge again, does the merges.
+rowSeparator = b"\xff"
+mergePairs = [(bytes((exponent, exponent)), bytes((exponent + 1,)), 1 << (exponent + 1)) for exponent in range(maxExponent - 1, 0, -1)]
+toHexDigits = bytes.maketrans(bytes(range(16)), b"0123456789abcdef")
+fromHexDigits = bytes.maketrans(b"0123456789abcdef", bytes(range(16)))
+# A row can slide towards its start if an empty cell comes before a tile, or towards its end if a tile comes before an empty cell
+slideStartPattern = re.compile(b"\x00[\x01-\x0f]")
+slideEndPattern = re.compile(b"[\x01-\x0f]\x00")
+mergePattern = re.compile(b"([\x01-\x0e])\\1")
+
+
+def boardToCells(board, size):
+    '''Convert a packed board into bytes holding one exponent per cell, in the same row-major order'''
+    return f"{board:0{size[0] * size[1]}x}".encode()[::-1].translate(fromHexDigits)
+
+
+def cellsToBoard(cells):
+    '''Convert bytes of exponents back into a packed board, the reverse of boardToCells'''
+    return int(bytes(cells).translate(toHexDigits)[::-1], 16)
+
+
+def transposeCells(cells, columns):
+    '''Transpose bytes of cells with the number of columns given, each column becomes a row'''
+    return b"".join([cells[column::columns] for column in range(columns)])
+
+
+def joinCellRows(cells, columns):
+    '''Join the rows of bytes of cells with the separator, so nothing can move or merge from one row into the next'''
+    return rowSeparator.join([cells[start:start + columns] for start in range(0, len(cells), columns)])
+
+
+def slideCells(cells, columns, reverse):
+    '''Slide every row of bytes of cells towards its start, or its end if reverse is set. Returns the new cells and score'''
+    if reverse:
+        cells = cells[::-1]
+    joined = joinCellRows(cells, columns).replace(b"\x00", b"")
+    gained = 0
+    for pair, merged, value in mergePairs:
+        if pair in joined:
+            gained += joined.count(pair) * value
+            joined = joined.replace(pair, merged)
+    cells = b"".join([row.ljust(columns, b"\x00") for row in joined.split(rowSeparator)])
+    if reverse:
+        cells = cells[::-1]
+    return cells, gained
+
+
+def moveCells(cells, direction, size):
+    '''Move bytes of cells of any (rows, columns) size. Returns the new cells, the score gained and whether anything moved'''
+    rows, columns = size
+    if direction == LEFT or direction == RIGHT:
+        newCells, gained = slideCells(cells, columns, direction == RIGHT)
+    elif direction == UP or direction == DOWN:
+        newCells, gained = slideCells(transposeCells(cells, columns), rows, direction == DOWN)
+        newCells = transposeCells(newCells, rows)
+    else:
+        raise ValueError(f"Invalid direction: {direction}")
+    return newCells, gained, newCells != cells
+
+
+def cellsStatus(cells, size):
+    '''Return the legal moves bitmask, the number of empty cells and the largest exponent for bytes of cells, like boardStatus'''
+    rows, columns = size
+    moves = 0
+    joined = joinCellRows(cells, columns)
+    merges = mergePattern.search(joined) is not None
+    if merges or slideStartPattern.search(joined):
+        moves |= 1 << LEFT
+    if merges or slideEndPattern.search(joined):
+        moves |= 1 << RIGHT
+
+    joined = joinCellRows(transposeCells(cells, columns), rows)
+    merges = mergePattern.search(joined) is not None
+    if merges or slideStartPattern.search(joined):
+        moves |= 1 << UP
+    if merges or slideEndPattern.search(joined):
+        moves |= 1 << DOWN
+    return moves, cells.count(0), max(cells)
+
+
+def moveBoard(board, direction, size):
+    '''Move a packed board of any (rows, columns) size, square or rectangular. Returns the new board, the score gained and whether anything moved'''
+    if size == (4, 4):
+        return move(board, direction)
+
+    rows, columns = size
+    if rows * columns > cellsLimit:
+        newCells, gained, moved = moveCells(boardToCells(board, size), direction, size)
+        return cellsToBoard(newCells), gained, moved
+    if direction == LEFT or direction == RIGHT:
+        newLines, gained = getLineMover(columns).moveLines(getRows(board, size), direction == RIGHT)
+        newBoard = joinRows(newLines, columns)
+    elif direction == UP or direction == DOWN:
+        # Columns are moved as rows of the transposed board, which is (columns, rows) in size
+        transposed = transposeBoard(board, size)
+        newLines, gained = getLineMover(rows).moveLines(getRows(transposed, (columns, rows)), direction == DOWN)
+        newBoard = transposeBoard(joinRows(newLines, rows), (columns, rows))
+    else:
+        raise ValueError(f"Invalid direction: {direction}")
+    return newBoard, gained, newBoard != board
+
+
+def moveTracks(board, direction, size):
+    '''Return (from cell, to cell, merged) for every tile on a packed board when it is moved in a direction, which is used to
+    animate the move. Both tiles in a merge end up in the same cell and are marked as merged'''
+    rows, columns = size
+    # Each line of cells, in the order the tiles pile up
+    if direction == LEFT or direction == RIGHT:
+        lines = [[row * columns + column for column in range(columns)] for row in range(rows)]
+    else:
+        lines = [[row * columns + column for row in range(rows)] for column in range(columns)]
+    if direction == RIGHT or direction == DOWN:
+        lines = [cells[::-1] for cells in lines]
+
+    tracks = []
+    for cells in lines:
+        target = 0
+        # The track of the last tile placed on this line, if it can still be merged into
+        previous = None
+        previousExponent = 0
+        for cell in cells:
+            exponent = (board >> (4 * cell)) & 0xF
+            if exponent == 0:
+                continue
+            if previous is not None and exponent == previousExponent and exponent < maxExponent:
+                tracks[previous] = (tracks[previous][0], tracks[previous][1], True)
+                tracks.append((cell, tracks[previous][1], True))
+                previous = None
+            else:
+                tracks.append((cell, cells[target], False))
+                target += 1
+                previous = len(tracks) - 1
+                previousExponent = exponent
+    return tracks
+
+
+def packBoard(values, size):
+    '''Convert a row-major list of tile values (0, 2, 4, 8 ...) into a packed board'''
+    if len(values) != size[0] * size[1]:
+        raise ValueError(f"Expected {size[0] * size[1]} values, got {len(values)}")
+    exponents = [value.bit_length() - 1 if value > 0 else 0 for value in values]
+    if max(exponents) > maxExponent:
+        raise ValueError(f"Tile values above {1 << maxExponent} cannot be packed")
+    return packLine(exponents)
+
+
+def unpackBoard(board, size):
+    '''Convert a packed board back into a row-major list of tile values'''
+    return [1 << exponent if exponent > 0 else 0 for exponent in unpackLine(board, size[0] * size[1])]
+
+
+def emptyCells(board, size):
+    '''Return the index of every empty cell in a packed board'''
+    return [i for i in range(size[0] * size[1]) if (board >> (4 * i)) & 0xF == 0]
+
+
+def spawnTile(board, size, rng):
+    '''Place a 2 (90% of the time) or a 4 (10% of the time) in a random empty cell, using the random.Random given'''
+    empty = emptyCells(board, size)
+    if len(empty) == 0:
+        return board
+    cell = empty[rng.randrange(len(empty))]
+    exponent = 1 if rng.randrange(10) < 9 else 2
+    return board | (exponent << (4 * cell))
+
+
+def maxTile(board, size):
+    '''Return the value of the largest tile on a packed board'''
+    exponent = max(unpackLine(board, size[0] * size[1]))
+    return 1 << exponent if exponent > 0 else 0
+
+
+def boardStatus(board, size):
+    '''Return a bitmask of the legal moves (bit n is set if direction n moves a tile), the number of empty cells and the largest
+    exponent on a packed board. Each row and column is a single lookup, rather than trying every move'''
+    rows, columns = size
+    if rows * columns > cellsLimit:
+        return cellsStatus(boardToCells(board, size), size)
+    legal = 0
+    empty = 0
+    largest = 0
+
+    # Rows tell us about left and right moves, as well as the empty cells and largest tile
+    lineInfo = getLineMover(columns).info
+    for line in getRows(board, size):
+        lineLegal, lineEmpty, lineLargest = lineInfo(line)
+        legal |= lineLegal
+        empty += lineEmpty
+        if lineLargest > largest:
+            largest = lineLargest
+    moves = (1 << LEFT if legal & 1 else 0) | (1 << RIGHT if legal & 2 else 0)
+
+    # Columns are rows of the transposed board, and tell us about up and down moves
+    legal = 0
+    lineInfo = getLineMover(rows).info
+    for line in getRows(transposeBoard(board, size), (columns, rows)):
+        legal |= lineInfo(line)[0]
+        if legal == 3:
+            break
+    moves |= (1 << UP if legal & 1 else 0) | (1 << DOWN if legal & 2 else 0)
+    return moves, empty, largest
+
+
+def canMove(board, size):
+    '''Check if any direction would move a tile on a packed board'''
+    return boardStatus(board, size)[0] != 0
+
+
+class BoardStatus:
+    '''Keeps track of the legal moves, empty cell count and max tile of a board. It is updated once whenever the board
+    changes, so checking for a win or game over doesn't need to look at the board again'''
+
+    def __init__(self, size, board=0):
+        '''Work out the status of the board given, an empty board by default'''
+        self.size = tuple(size)
+        self.update(board)
+
+    def update(self, board):
+        '''Work out the status again after the board has changed'''
+        self.board = board
+        self.legal, self.emptyCount, self.maxExponent = boardStatus(board, self.size)
+
+    def canMove(self, direction):
+        '''Check if moving in a direction would move a tile'''
+        return (self.legal >> direction) & 1 == 1
+
+    def legalMoves(self):
+        '''Return a list of the directions that would move a tile'''
+        return [direction for direction in (UP, RIGHT, DOWN, LEFT) if (self.legal >> direction) & 1]
+
+    def isGameOver(self):
+        '''Check if there are no moves left'''
+        return self.legal == 0
+
+    def hasWon(self):
+        '''Check if there is a 2048 tile (or higher) on the board'''
+        return self.maxExponent >= winExponent
+
+    def maxTile(self):
+        '''Return the value of the largest tile'''
+        return 1 << self.maxExponent if self.maxExponent > 0 else 0
@@ -0,0 +1,222 @@
+# Reinforcement learning environments
+# GameEnv and VectorGameEnv follow the Gym reset/step interface, so agents written for Gym can play 2048 without a
+# display. GameEnv plays one game on the packed engine with a seeded SpawnStream, and VectorGameEnv steps many games at
+# once with the NumPy batch engine, starting a new game as soon as one ends.
+#
+# Observations are either the raw exponent of each cell, shaped (rows, columns), or one-hot planes shaped
+# (planes, rows, columns) where plane n is 1 for cells holding exponent n. They are written into arrays that are created
+# once, so stepping doesn't allocate new observations; copy an observation if it needs to be kept after the next step.
+# Actions are the engine directions, 0 = Up, 1 = Right, 2 = Down, 3 = Left. An action that doesn't move anything leaves
+# the game as it is with no reward, and info["actionMask"] shows which actions will move.
+
+import argparse
+import time
+from random import Random
+
+import numpy as np
+
+import batch
+import engine
+from spawns import SpawnStream
+
+observationTypes = ["raw", "onehot"]
+actionCount = 4
+# One plane for empty cells and one for each exponent up to the largest tile
+planeCount = engine.maxExponent + 1
+
+# The action mask for every 4 bit legal moves bitmask from the engine
+maskTable = np.array([[legal >> action & 1 for action in range(actionCount)] for legal in range(16)], dtype=bool)
+
+
+def getObservationShape(size, observation):
+    '''Return the shape of one observation of the type given on a board of (rows, columns)'''
+    if observation not in observationTypes:
+        raise ValueError(f"Observation type must be one of {observationTypes}, not {observation!r}")
+    return tuple(size) if observation == "raw" else (planeCount,) + tuple(size)
+
+
+class GameEnv:
+    '''One game of 2048, stepped one move at a time'''
+
+    def __init__(self, size=(4, 4), observation="raw", maxSteps=None, seed=None):
+        '''Create the environment, maxSteps truncates a game after that many steps if it is set'''
+        self.size = tuple(size)
+        self.observationType = observation
+        self.observationShape = getObservationShape(self.size, observation)
+        self.actionCount = actionCount
+        self.maxSteps = maxSteps
+        self.seed = seed
+
+        # The arrays handed back by reset and step, refilled in place every time
+        self.raw = np.zeros(self.size, dtype=np.uint8)
+        self.planes = np.zeros(self.observationShape, dtype=np.float32) if observation == "onehot" else None
+        self.planeIndex = np.arange(planeCount, dtype=np.uint8).reshape(planeCount, 1, 1)
+        self.actionMask = np.zeros(actionCount, dtype=bool)
+
+        self.spawns = None
+        self.status = engine.BoardStatus(self.size)
+        self.score = 0
+        self.steps = 0
+
+    def writeObservation(self):
+        '''Copy the board into the observation arrays and the legal moves into the action mask, returning the observation'''
+        self.raw.reshape(-1)[:] = np.frombuffer(engine.boardToCells(self.status.board, self.size), dtype=np.uint8)
+        self.actionMask[:] = maskTable[self.status.legal]
+        if self.planes is None:
+            return self.raw
+        np.equal(self.raw, self.planeIndex, out=self.planes, casting="unsafe")
+        return self.planes
+
+    def getInfo(self):
+        '''Return the extra information given with each observation'''
+        return {"actionMask": self.actionMask, "score": self.score, "maxTile": self.status.maxTile()}
+
+    def reset(self, seed=None):
+        '''Start a new game, returning (observation, info). Without a seed the next game of the environment's seed is played'''
+        if seed is not None:
+            self.seed = seed
+        # Each reset carries on from the same spawn stream, so a seeded environment plays the same sequence of games
+        if self.spawns is None or seed is not None:
+            self.spawns = SpawnStream(self.seed)
+        board = 0
+        for i in range(2):
+            board = self.spawns.spawn(board, self.size)[0]
+        self.status.update(board)
+        self.score = 0
+        self.steps = 0
+        return self.writeObservation(), self.getInfo()
+
+    def step(self, action):
+        '''Make a move, returning (observation, reward, terminated, truncated, info). The reward is the score gained'''
+        reward = 0
+        if self.status.canMove(action):
+            board, reward, moved = engine.moveBoard(self.status.board, action, self.size)
+            self.status.update(self.spawns.spawn(board, self.size)[0])
+            self.score += reward
+        self.steps += 1
+        terminated = self.status.isGameOver()
+        truncated = self.maxSteps is not None and self.steps >= self.maxSteps and not terminated
+        return self.writeObservation(), reward, terminated, truncated, self.getInfo()
+
+
+class VectorGameEnv:
+    '''Many games of 2048 stepped together, each game starts again by itself once it is over'''
+
+    def __init__(self, count, size=(4, 4), observation="raw", maxSteps=None, seed=None):
+        '''Create count games, maxSteps truncates a game after that many steps if it is set'''
+        self.count = count
+        self.size = tuple(size)
+        self.observationType = observation
+        self.observationShape = (count,) + getObservationShape(self.size, observation)
+        self.actionCount = actionCount
+        self.maxSteps = maxSteps
+        self.engine = batch.BatchEngine(count, self.size, seed)
+
+        # The arrays handed back by reset and step, refilled in place every time
+        self.raw = np.zeros((count,) + self.size, dtype=np.uint8)
+        self.planes = np.zeros(self.observationShape, dtype=np.float32) if observation == "onehot" else None
+        self.planeIndex = np.arange(planeCount, dtype=np.uint8).reshape(1, planeCount, 1, 1)
+        self.rewards = np.zeros(count, dtype=np.int64)
+        self.terminated = np.zeros(count, dtype=bool)
+        self.truncated = np.zeros(count, dtype=bool)
+        self.actionMask = np.zeros((count, actionCount), dtype=bool)
+        self.scores = np.zeros(count, dtype=np.int64)
+        self.steps = np.zeros(count, dtype=np.int64)
+        # The score and step count of each game that ended on the last step, for the games where terminated or truncated is set
+        self.finalScores = np.zeros(count, dtype=np.int64)
+        self.finalSteps = np.zeros(count, dtype=np.int64)
+        self.info = {"actionMask": self.actionMask, "score": self.scores, "finalScore": self.finalScores, "finalSteps": self.finalSteps}
+
+    def writeObservation(self):
+        '''Copy the boards into the observation arrays, returning the observations'''
+        np.copyto(self.raw, self.engine.boards)
+        if self.planes is None:
+            return self.raw
+        np.equal(self.raw[:, np.newaxis], self.planeIndex, out=self.planes, casting="unsafe")
+        return self.planes
+
+    def reset(self, seed=None):
+        '''Start every game again, returning (observations, info)'''
+        if seed is not None:
+            self.engine.rng = np.random.default_rng(seed)
+        self.engine.reset()
+        self.scores[:] = 0
+        self.steps[:] = 0
+        self.actionMask[:] = batch.legalMoves(self.engine.boards)
+        return self.writeObservation(), self.info
+
+    def step(self, actions):
+        '''Make one move in every game, returning (observations, rewards, terminated, truncated, info). Games that end are
+        started again straight away, so their observation is the start of the next game and info holds the final score'''
+        boards, rewards, moved = batch.moveBatch(self.engine.boards, actions)
+        batch.spawnBatch(boards, self.engine.rng, moved)
+        self.engine.boards = boards
+        self.rewards[:] = rewards
+        self.scores += rewards
+        self.steps += 1
+
+        legal = batch.legalMoves(boards)
+        np.logical_not(legal.any(axis=1), out=self.terminated)
+        if self.maxSteps is not None:
+            np.greater_equal(self.steps, self.maxSteps, out=self.truncated)
+            self.truncated &= ~self.terminated
+        ended = self.terminated | self.truncated
+
+        # Keep the results of the games that ended, then start them again
+        if ended.any():
+            self.finalScores[ended] = self.scores[ended]
+            self.finalSteps[ended] = self.steps[ended]
+            self.engine.reset(ended)
+            self.scores[ended] = 0
+            self.steps[ended] = 0
+            legal[ended] = batch.legalMoves(boards[ended])
+        self.actionMask[:] = legal
+        return self.writeObservation(), self.rewards, self.terminated, self.truncated, self.info
+
+
+def randomActions(actionMask, rng):
+    '''Pick a random legal action for each game from a (games, 4) action mask, using any action where none are legal'''
+    keys = rng.random(actionMask.shape)
+    keys[~actionMask] -= 1.0
+    return keys.argmax(axis=1)
+
+
+def main():
+    '''Time random play in both environments from the command line'''
+    parser = argparse.ArgumentParser(description="Measure how many steps per second the environments run at with random legal moves")
+    parser.add_argument("--steps", type=int, default=200000, help="steps to take in each environment, counting every game in the vector")
+    parser.add_argument("--count", type=int, default=1024, help="number of games in the vector environment")
+    parser.add_argument("--size", type=int, default=4, help="width and height of the board")
+    parser.add_argument("--observation", choices=observationTypes, default="raw", help="type of observation")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the games and the moves")
+    args = parser.parse_args()
+    size = (args.size, args.size)
+    rng = np.random.default_rng(args.seed)
+
+    env = GameEnv(size, args.observation, seed=args.seed)
+    observation, info = env.reset()
+    actionRng = Random(args.seed)
+    legalActions = [[action for action in range(actionCount) if legal >> action & 1] or [0] for legal in range(16)]
+    games = 0
+    startTime = time.perf_counter()
+    for i in range(args.steps):
+        observation, reward, terminated, truncated, info = env.step(actionRng.choice(legalActions[env.status.legal]))
+        if terminated or truncated:
+            games += 1
+            observation, info = env.reset()
+    elapsed = time.perf_counter() - startTime
+    print(f"GameEnv: {args.steps / elapsed:.0f} steps/s, {games} games finished")
+
+    vectorEnv = VectorGameEnv(args.count, size, args.observation, seed=args.seed)
+    observations, info = vectorEnv.reset()
+    games = 0
+    startTime = time.perf_counter()
+    for i in range(max(1, args.steps // args.count)):
+        observations, rewards, terminated, truncated, info = vectorEnv.step(randomActions(info["actionMask"], rng))
+        games += int(terminated.sum() + truncated.sum())
+    elapsed = time.perf_counter() - startTime
+    print(f"VectorGameEnv: {max(1, args.steps // args.count) * args.count / elapsed:.0f} steps/s over {args.count} games, {games} games finished")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,991 @@
+# Import necessary modules
+# To see sources for these modules, and what I use from them see "Project Documentation.docx"
+import pygame
+import os
+import time
+import engine
+import solver
+from scheduler import FrameScheduler
+from profiler import FrameProfiler
+from leaderboard import Leaderboard, appendRecord, formatDuration
+from analytics import AnalyticsWriter, GameAnalytics
+from autosave import Autosaver, loadSave
+from replay import ReplayRecorder, ReplayWriter
+from spawns import SpawnStream
+from history import History
+from animation import MoveAnimation
+from assets import assets, initPygame
+from viewport import Viewport, getWindowSize
+import styles
+from itertools import compress
+from bisect import bisect_left, insort
+
+# Nothing in this file opens a window or touches a file until startup() is called (2048.py does this),
+# so other scripts can import the game without side effects
+
+# Define the window width/height
+windowSize = (450, 450)
+
+# Variables
+moveCount = 0
+score = 0
+gameBoardSize = None
+gameRunning = True
+
+# The leaderboard keeps the high scores and best times indexed, so the menu doesn't need to read every game played.
+# It is opened by startup()
+leaderboard = None
+
+# Running statistics for each board size, updated as each game ends and shown on the menu with S. It is opened by startup(),
+# and the games log and saved statistics are written by analyticsWriter on a background thread
+analytics = None
+analyticsWriter = None
+
+# Variables used by the AI, aiPlaying is toggled with P and hintDirection is set by pressing H
+aiPlaying = False
+hintDirection = None
+directionNames = ["Up", "Right", "Down", "Left"]
+
+# The AI used for hints and AI play, chosen on the menu with N. The n-tuple player can only be chosen once a network
+# has been trained with "python ntuple.py train", which saves it to ntupleWeightsPath
+aiPlayerName = "Expectimax"
+ntupleWeightsPath = "ntuple.npy"
+
+# The AI is turned off on boards with more cells than this, where it can't search even one move ahead within its time
+# budget and every AI move would hold up a frame
+aiCellLimit = 64
+
+# This variable is used when the game ends to store the total time taken, in milliseconds
+finalTime = 0
+
+# The game in progress is saved in the background after each move, so it can be resumed from the menu with R after the
+# game is closed or crashes. resumeSnapshot is set when the menu resumes a saved game
+autosaver = None
+resumeSnapshot = None
+
+# The scheduler sleeps until there is input to handle, and only runs at a fixed framerate while the AI is playing
+scheduler = FrameScheduler(frameRate=60)
+# If set, the scheduler's report of busy time and frame times is printed when the game closes (2048.py --report)
+printReport = False
+
+# The profiler times each part of a frame, F3 shows it on screen, F4 saves a Chrome trace and F5 runs cProfile for 300 frames
+profiler = FrameProfiler()
+
+class Button:
+    def __init__(self, color, rect, caption):
+        '''Initialize variables for the button'''
+        self.color = color
+        self.rect = rect
+        self.caption = caption
+        # Set default Color so the button can be returned to this Color
+        self.defaultColor = self.color
+        # Create a new colour, by taking the default colour and darkening each RGB value by 10
+        self.darkColor = (self.color[0] - 10, self.color[1] - 10, self.color[2] - 10)
+    
+    def draw(self):
+        '''Draw a rectangle to the screen with the button text displayed on top'''
+        pygame.draw.rect(screen, self.color, self.rect, border_radius=10)
+        text = assets.text(self.caption, 30, (247, 248, 242))
+        textRect = text.get_rect(center=(self.rect[0] + (self.rect[2] / 2), self.rect[1] + (self.rect[3] / 2)))
+        screen.blit(text, textRect)
+    
+    def click(self):
+        '''Check if a mouse button has been pressed within the bounds of the button'''
+        buttons = pygame.mouse.get_pressed()
+        if buttons[0]:
+            mousePos = pygame.mouse.get_pos()
+            if mousePos[0] >= self.rect[0] - 5 and mousePos[0] <= self.rect[0] + self.rect[2] + 4:
+                if mousePos[1] >= self.rect[1] - 5 and mousePos[1] <= self.rect[1] + self.rect[3] + 4:
+                    return True
+        return False
+
+    def hover(self):
+        '''If the mouse is hovering within the bounds of the button, replace the default colour with the dark colour, otherwise display the normal colour'''
+        mousePos = pygame.mouse.get_pos()
+        if mousePos[0] >= self.rect[0] - 5 and mousePos[0] <= self.rect[0] + self.rect[2] + 4:
+            if mousePos[1] >= self.rect[1] - 5 and mousePos[1] <= self.rect[1] + self.rect[3] + 4:
+                self.color = self.darkColor
+                return
+        self.color = self.defaultColor
+        return
+
+
+
+# Game menu class, used to display the Menu/High Scores at the start of the game
+class Menu:
+    # Used to check if the user has started the game
+    gameStarted = False
+
+    def __init__(self, size):
+        '''Initialize the screen size correctly for the menu'''
+        global screen
+        self.size = size
+        screen = pygame.display.set_mode(self.size)
+
+        # Initialize the buttons in the main menu
+        self.buttons = [
+            Button((237, 207, 115), (5, 5, 190, 90), "4 x 4"),
+            Button((237, 200, 80), (5, 105, 190, 90), "5 x 5"),
+            Button((237, 194, 45), (5, 205, 190, 90), "6 x 6"),
+        ]
+
+        # The AI players that can be chosen, the n-tuple player needs a trained network
+        self.aiPlayerNames = ["Expectimax"]
+        if os.path.exists(ntupleWeightsPath):
+            self.aiPlayerNames.append("N-tuple")
+
+        # S switches between the menu and the statistics screen
+        self.showingStats = False
+
+        # The game that was being played last time, if it didn't end, which R resumes
+        self.savedGame = loadSave()
+    
+    def getScores(self):
+        '''Return the top 3 high scores from the leaderboard'''
+        return leaderboard.topScores(3)
+
+    def getTimes(self):
+        '''Return the top 3 best times from the leaderboard'''
+        return leaderboard.bestTimes(3)
+
+    def drawTimes(self):
+        '''Print each of the high scores on screen'''
+
+        bestTimes = self.getTimes()
+
+        # Print the text "best times" on screen
+        titleText = assets.text("Best Times:", 20, (119, 110, 101))
+        screen.blit(titleText, (210, 10))
+
+        # If the bestTimes list isn't empty, for each item display the time, moves and board size
+        if bestTimes:
+            for i in range(len(bestTimes)):
+                timeText = assets.text(f"Time: {formatDuration(bestTimes[i][0])}", 20, (119, 110, 101))
+                screen.blit(timeText, (220, 40 + 80 * i))
+                movesText = assets.text(f"Moves: {bestTimes[i][1]}", 20, (119, 110, 101))
+                screen.blit(movesText, (220,60 + 80 * i))
+                boardText = assets.text(f"Board: {bestTimes[i][2]}", 20, (119, 110, 101))
+                screen.blit(boardText, (220, 80 + 80 * i))
+        # Else display the text "none to display" on screen
+        else:
+            noneText = assets.text("None to display", 20, (119, 110, 101))
+            screen.blit(noneText, (220, 40))
+
+
+    def drawScores(self):
+        '''Print each of the best times on screen'''
+
+        highScores = self.getScores()
+
+        # Print the text "high scores" on screen
+        titleText = assets.text("High Scores:", 20, (119, 110, 101))
+        screen.blit(titleText, (410, 10))
+
+        # If the bestTimes list isn't empty, for each item display the time, moves and board size
+        if highScores:
+            for i in range(len(highScores)):
+                timeText = assets.text(f"Score: {highScores[i][0]}", 20, (119, 110, 101))
+                screen.blit(timeText, (420, 40 + 60 * i))
+                movesText = assets.text(f"Board: {highScores[i][1]}", 20, (119, 110, 101))
+                screen.blit(movesText, (420, 60 + 60 * i))
+        # Else display the text "none to display" on screen
+        else:
+            noneText = assets.text("None to display", 20, (119, 110, 101))
+            screen.blit(noneText, (420, 40))
+    
+    def drawStats(self):
+        '''Draw the statistics screen, with a column for each of the 3 most played board sizes'''
+        screen.fill((205, 193, 181))
+        self.drawText("Statistics", 20)
+
+        names = analytics.boardSizes()[:3]
+        if not names:
+            self.drawText("No finished games yet", 60)
+        for i in range(len(names)):
+            stats = analytics.sizes[names[i]]
+            lines = [
+                f"Board: {names[i]}",
+                f"Games: {stats.games}",
+                f"Mean score: {stats.scores.mean:.0f}",
+                f"Std dev: {stats.scores.stdev():.0f}",
+                f"Median: {stats.scorePercentile(0.5):.0f}",
+                f"90th pct: {stats.scorePercentile(0.9):.0f}",
+                f"Best score: {stats.scores.maximum}",
+                f"Mean moves: {stats.moves.mean:.0f}",
+                f"Reached 2048: {stats.winRate():.0%}",
+                f"To 2048: {formatDuration(int(stats.winTimes.mean)) if stats.winTimes.count else '-'}",
+                "Max tiles:",
+            ]
+            # The 4 largest max tiles reached, with how many games ended on each
+            for exponent in sorted(stats.maxTiles, reverse=True)[:4]:
+                lines.append(f"  {1 << exponent if exponent else 0}: {stats.maxTiles[exponent]}")
+
+            for j in range(len(lines)):
+                text = assets.text(lines[j], 18, (119, 110, 101))
+                screen.blit(text, (10 + 200 * i, 45 + 22 * j))
+
+        self.drawText("S or Backspace: Back   Escape: Quit", 405)
+
+    def drawText(self, text, yPos):
+        '''Draw text at the horizontal center of the screen at the y position given'''
+        textContent = assets.text(text, 20, (119, 110, 101))
+        textRect = textContent.get_rect(center=(290, yPos))
+        screen.blit(textContent, textRect)
+
+    def drawWindow(self):
+        '''A function used to draw the main menu, buttons and high scores to the screen'''
+        # Define global variables being used within the function
+        global gameRunning
+        global gameBoardSize
+        global aiPlayerName
+        global resumeSnapshot
+
+        buttons = []
+
+        # Only runs when the game hasn't been started (before a button on the menu is clicked)
+        while not self.gameStarted:
+            for event in scheduler.wait():
+                # If the user closes the window or presses the Escape key, quit the program
+                if event.type == pygame.QUIT or pygame.key.get_pressed()[pygame.K_ESCAPE]:
+                    gameRunning = False
+                    return
+                # N switches to the next AI player
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_n:
+                    index = self.aiPlayerNames.index(aiPlayerName) if aiPlayerName in self.aiPlayerNames else -1
+                    aiPlayerName = self.aiPlayerNames[(index + 1) % len(self.aiPlayerNames)]
+                # S shows or hides the statistics, Backspace goes back to the menu
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_s:
+                    self.showingStats = not self.showingStats
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_BACKSPACE:
+                    self.showingStats = False
+                # R carries on with the saved game, on the board size it was played on
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_r and self.savedGame:
+                    resumeSnapshot = self.savedGame
+                    gameBoardSize = tuple(self.savedGame["size"])
+                    self.gameStarted = True
+                    return
+
+            # The statistics screen replaces the whole menu, so the buttons can't be clicked while it is showing
+            if self.showingStats:
+                pygame.mouse.set_cursor()
+                self.drawStats()
+                pygame.display.flip()
+                continue
+            
+            screen.fill((205, 193, 181))
+
+            mousePos = pygame.mouse.get_pos()
+            if mousePos[0] <= 200 and mousePos[1] <= 300:
+                pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_HAND)
+            else: pygame.mouse.set_cursor()
+            
+            # Check if a button has been clicked, if it has then do something different depending on which button
+            for i in range(len(self.buttons)):
+                self.buttons[i].draw()
+                self.buttons[i].hover()
+                if self.buttons[i].click():
+                    if i == 0:
+                        gameBoardSize = (4, 4)
+                    elif i == 1:
+                        gameBoardSize = (5, 5)
+                    elif i == 2:
+                        gameBoardSize = (6, 6)
+                    self.gameStarted = True
+
+            self.drawTimes()
+            self.drawScores()
+            self.drawText("Controls:", 300)
+            self.drawText("W A S D or Arrow Keys: Move Tiles", 325)
+            self.drawText("H: Hint   P: AI Play   Z: Undo   Y: Redo", 350)
+            self.drawText("S: Statistics   Escape: Quit", 375)
+            self.drawText(f"AI Player: {aiPlayerName}   N: Change AI", 405)
+            if self.savedGame:
+                size = self.savedGame["size"]
+                self.drawText(f"R: Resume {size[0]} x {size[1]} game (score {self.savedGame['score']})", 435)
+
+            pygame.display.flip()
+
+class Tile:
+    '''A view of one tile on screen. Everything about how it looks comes from the style tables in styles.py, so a tile only
+    holds its value and position'''
+    __slots__ = ("value", "xPos", "yPos", "x", "y")
+
+    tileSize = 100
+    tileGap = 10
+
+    def __init__(self, value, xPos, yPos):
+        '''Initialize the values of the class, doing some math to figure out the actual x/y of the tile instead of the 0-3 based positions'''
+        self.value = value
+        self.xPos = xPos * self.tileSize + ((xPos + 1) * self.tileGap)
+        self.yPos = yPos * self.tileSize + ((yPos + 1) * self.tileGap)
+        self.x = self.xPos
+        self.y = self.yPos
+
+    def getPos(self):
+        '''Set the current Tile x and y coordinates to the calculated xPos and yPos'''
+        self.x = self.xPos
+        self.y = self.yPos
+
+    def getExponent(self):
+        '''Return the exponent of the tile value, which indexes the style tables'''
+        return self.value.bit_length() - 1 if self.value > 0 else 0
+
+    def getColor(self):
+        '''Return the correct background Color for the tile depending on the value'''
+        return styles.tileColors[self.getExponent()]
+
+    def getFontColor(self):
+        '''Return the correct text Color for the tile depending on the value'''
+        return styles.fontColors[self.getExponent()]
+
+    def getFontSize(self):
+        '''Return the size of the font depending on the tile value, scaled down along with the tile size'''
+        return styles.getFontSize(self.getExponent(), self.tileSize)
+
+    @classmethod
+    def surfaceFor(cls, value):
+        '''Return the pre-rendered surface for a tile value, without needing a tile with that value'''
+        return styles.getSurfaces(cls.tileSize)[value.bit_length() - 1 if value > 0 else 0]
+
+    def getSurface(self):
+        '''Return the pre-rendered surface for this tile's value and size'''
+        return styles.getSurfaces(self.tileSize)[self.getExponent()]
+
+    def draw(self):
+        '''Draw the tile on screen, returning the area of the screen that was changed'''
+        return screen.blit(self.getSurface(), (self.x, self.y))
+
+class Board:
+    placeableTiles = []
+    hasWon = False
+    isGameOver = False
+    hasWonPreviously = False
+    gotFinalTime = False
+    # Set once the score has been saved. It isn't part of the undo history, so a game that ends, is undone and ends again
+    # is only saved once
+    gotFinalScore = False
+    # The time in milliseconds and the number of moves it took to reach 2048, 0 if it hasn't been reached
+    winTime = 0
+    winMoves = 0
+    # What the game looked like when it was last autosaved, so the same game isn't saved again
+    savedKey = None
+    # The tile values and overlays that were on screen after the last draw, used to work out what needs to be redrawn
+    drawnValues = None
+    drawnOverlay = None
+    # The animation of the last move, None when nothing is animating
+    animation = None
+    # Boards with more cells than this are drawn without animation, tracking every tile would take longer than a frame
+    animationLimit = 256
+    # Used with bytearray.translate to turn each cell into 1 if it is empty and 0 if it holds a tile
+    emptyFlags = bytes([1]) + bytes(255)
+    # Used with translate to turn each byte of the difference between two boards into 1 if the cell changed
+    changedFlags = bytes(1) + bytes([1]) * 255
+    # Updating the empty cells one at a time costs about as much per changed cell as finding them all again in C costs for
+    # 32 cells, so they are only updated one at a time when fewer than 1 in 32 cells change, such as on a large board with few tiles
+    rescanRatio = 32
+
+    def __init__(self, boardSize, seed=None, historyDepth=1000):
+        '''Initialize the game board, with every cell empty'''
+        self.size = boardSize
+        # The exponent of the tile in each cell (0 if it is empty) in row-major order, one byte per cell however big the board is
+        self.cells = bytearray(boardSize[0] * boardSize[1])
+        # The empty cells in order, a spawn takes one from here instead of looking over the board
+        self.placeableTiles = list(range(len(self.cells)))
+
+        # Each game draws its spawns from its own stream, so a game can be recreated from its seed
+        self.spawns = SpawnStream(seed)
+        self.seed = self.spawns.seed
+
+        # If a recorder is set, every spawn and move is saved to the replay log
+        self.recorder = None
+
+        # The legal moves, empty cell count and max tile, updated once after each move instead of looking over the board again
+        self.status = engine.BoardStatus(self.size)
+
+        # Snapshots of the game after each move, used by undo and redo
+        self.history = History(historyDepth)
+
+        # The part of the board shown in the window, with tiles scaled down so large boards fit. Only one board is shown at
+        # a time, so the tile size is set for every tile
+        self.viewport = Viewport(boardSize, windowSize)
+        Tile.tileSize = self.viewport.tileSize
+        Tile.tileGap = self.viewport.tileGap
+
+    def updateStatus(self):
+        '''Work out the legal moves, empty cells and max tile again, this must be done whenever the cells are changed'''
+        self.status.update(self.getPackedBoard())
+        self.getPlaceableTiles()
+
+    def getState(self, move=None):
+        '''Return a snapshot of the game for the undo history. move is the (direction, cell, exponent) of the move and spawn
+        that led to this state, which is recorded again if the move is redone'''
+        return (self.status.board, score, moveCount, self.hasWon, self.hasWonPreviously, self.isGameOver, move)
+
+    def setState(self, state):
+        '''Put the game back to a snapshot from getState'''
+        global score
+        global moveCount
+
+        board, score, moveCount, self.hasWon, self.hasWonPreviously, self.isGameOver, move = state
+        self.cells[:] = engine.boardToCells(board, self.size)
+        self.status.update(board)
+        self.getPlaceableTiles()
+        self.animation = None
+
+    def undo(self):
+        '''Go back one move, returning False if there is nothing to undo'''
+        state = self.history.undo()
+        if state is None:
+            return False
+        self.setState(state)
+        if self.recorder:
+            self.recorder.rewind(self.recorder.moveCount - 1)
+        return True
+
+    def redo(self):
+        '''Make an undone move again, returning False if there is nothing to redo'''
+        state = self.history.redo()
+        if state is None:
+            return False
+        self.setState(state)
+        if self.recorder:
+            direction, cell, exponent = state[-1]
+            self.recorder.recordMove(direction, cell, exponent, self.status.board, score)
+        return True
+
+    def getPackedBoard(self):
+        '''Return the board as a packed integer, in the format used by the engine and the AI'''
+        return engine.cellsToBoard(self.cells)
+
+    def getPlaceableTiles(self):
+        '''Find the empty cells again, this is needed whenever the cells are replaced. The cells are checked in C, not one at a time in Python'''
+        self.placeableTiles = list(compress(range(len(self.cells)), self.cells.translate(self.emptyFlags)))
+
+    def updatePlaceableTiles(self, newCells):
+        '''Update the empty cells for new cells that are about to replace the current ones, only looking at the cells that change'''
+        cellCount = len(self.cells)
+        # The cells that change are found in C, by comparing the two boards as integers
+        difference = int.from_bytes(self.cells, "little") ^ int.from_bytes(newCells, "little")
+        changed = difference.to_bytes(cellCount, "little").translate(self.changedFlags)
+        if changed.count(1) * self.rescanRatio > cellCount:
+            self.placeableTiles = list(compress(range(cellCount), newCells.translate(self.emptyFlags)))
+            return
+
+        # The empty cells are kept in order, so each change is a binary search
+        for cell in compress(range(cellCount), changed):
+            if newCells[cell] == 0:
+                insort(self.placeableTiles, cell)
+            elif self.cells[cell] == 0:
+                del self.placeableTiles[bisect_left(self.placeableTiles, cell)]
+
+    def spawnRandomPiece(self):
+        '''Spawn a random tile in an empty position, returning the position used (or None if the board is full)'''
+        # Get a random empty cell, and put either a 2 tile or a 4 tile in it (weighted 9:1)
+        if len(self.placeableTiles) > 0:
+            index, exponent = self.spawns.next(len(self.placeableTiles))
+            # The empty cells stay in order, so the same seed spawns the same tiles as SpawnStream.spawn
+            cell = self.placeableTiles.pop(index)
+            self.cells[cell] = exponent
+            return cell
+        return None
+
+    def saveScore(self, score, boardSize):
+        '''Save the score and game board size to the file "high_scores"'''
+        appendRecord("high_scores.bin", [score, boardSize])
+        leaderboard.addScore(score, boardSize)
+
+
+    def saveTime(self, durationMs, moves, boardSize, maxTile):
+        '''Save the time in milliseconds, move count, board size and max tile to the file "best_times"'''
+        appendRecord("best_times.bin", [durationMs, moves, boardSize, maxTile])
+        leaderboard.addTime(durationMs, moves, boardSize, maxTile)
+
+    def saveGame(self, score, durationMs):
+        '''Add the finished game to the running statistics, then queue it for the games log along with the new statistics'''
+        record = (self.size[0], self.size[1], score, moveCount, self.status.maxExponent, durationMs, self.winTime, self.winMoves)
+        analytics.addGame(record)
+        analyticsWriter.write(record, analytics.toDict())
+
+    def getMaxTile(self):
+        '''Return the value of the largest tile on the board'''
+        return self.status.maxTile()
+
+    def getElapsedTime(self):
+        '''Return the number of milliseconds since the game started'''
+        return int((time.monotonic() - startTime) * 1000)
+    
+    def checkGamestate(self):
+        '''Check to see if the board is full, or if the player has won'''
+        # Global variables from outside of the function
+        global finalTime
+
+        # If the board has a 2048 tile, and the player hasn't already won then display the win screen
+        if self.status.hasWon() and not self.hasWonPreviously:
+            self.hasWon = True
+
+            # If the final time hasn't been calculated, then calculate it
+            if not self.gotFinalTime:
+                self.gotFinalTime = True
+                finalTime = self.getElapsedTime()
+                self.winTime = finalTime
+                self.winMoves = moveCount
+                self.saveTime(finalTime, moveCount, f"{self.size[0]} x {self.size[1]}", self.getMaxTile())
+
+        # Check if the game is over, if it is then save the score and the final time for the game over screen
+        if self.isGameOver and not self.gotFinalScore:
+            self.gotFinalScore = True
+            self.saveScore(score, f"{self.size[0]} x {self.size[1]}")
+            if self.recorder:
+                self.recorder.finish(score)
+            finalTime = self.getElapsedTime()
+            self.saveGame(score, finalTime)
+
+    def drawOverlay(self):
+        '''Draw the win or game over screen on top of the board, if either should be shown'''
+        # If the player has won, they can continue playing, though they will be notified that they won, as well as their score
+        if self.hasWon and not self.hasWonPreviously:
+            # Display a surface over the game, with a transparent background
+            winSurface = pygame.Surface((windowSize[0], windowSize[1]))
+            winSurface.set_alpha(128)
+            winSurface.fill((237, 207, 115))
+            screen.blit(winSurface, (0, 0))
+
+            # Define lines of text to be displayed on screen
+            text = [
+                "You Win!",
+                f"Score: {score}",
+                f"Moves: {moveCount}",
+                f"Time: {formatDuration(finalTime)}",
+                "",
+                "Press any direction",
+                "to continue"
+            ]
+
+            # Get the required font position for each line of text from above, display it on screen
+            for label in self.getFontPos(text, 60):
+                screen.blit(label[0], label[1])
+
+        # If the game is over, display thr game over screen
+        elif self.isGameOver:
+            # Display surface over the game, with a transparent background
+            loseSurface = pygame.Surface((windowSize[0], windowSize[1]))
+            loseSurface.set_alpha(128)
+            loseSurface.fill((0, 0, 0))
+            screen.blit(loseSurface, (0, 0))
+
+            # Define lines of text to be displayed on screen
+            text = [
+                "Game Over!",
+                f"Score: {score}",
+                f"Moves: {moveCount}",
+                f"Time: {formatDuration(finalTime)}",
+            ]
+
+            # Get the required font position for each line of text from above, display it on screen
+            for label in self.getFontPos(text, 30):
+                screen.blit(label[0], label[1])
+        
+    def getFontPos(self, text, offset):
+        '''Get horizontally centered lines of text at the vertical offset provided'''
+        label = []
+        for line in range(len(text)):
+            textSurface = assets.text(text[line], 30, (255, 255, 255))
+            fontRect = textSurface.get_rect(center=(windowSize[0]/2, windowSize[1]/2+((line-1.5)*50)-offset))
+            label.append([textSurface, fontRect])
+        return label
+
+    def drawHint(self, direction):
+        '''Display the direction suggested by the AI at the top of the screen'''
+        textSurface = assets.text(f"Hint: {directionNames[direction]}", 30, (255, 255, 255))
+        fontRect = textSurface.get_rect(center=(windowSize[0]/2, 30))
+
+        # Draw a dark box behind the text so it can be read on top of any tile
+        hintSurface = pygame.Surface((fontRect[2] + 20, fontRect[3] + 10))
+        hintSurface.set_alpha(160)
+        hintSurface.fill((0, 0, 0))
+        screen.blit(hintSurface, (fontRect[0] - 10, fontRect[1] - 5))
+        screen.blit(textSurface, fontRect)
+
+    def setup(self):
+        '''Ran at the start of the game, spawns 2 random tiles'''
+        for i in range(2):
+            cell = self.spawnRandomPiece()
+            if self.recorder:
+                self.recorder.recordSpawn(cell, self.cells[cell])
+        self.updateStatus()
+        self.history.reset(self.getState())
+
+    def getSnapshot(self):
+        '''Return everything needed to carry on with this game later, for the autosave'''
+        return {
+            "version": 1, "size": self.size, "board": self.status.board, "score": score, "moveCount": moveCount,
+            "elapsedTime": self.getElapsedTime(), "spawns": self.spawns.getState(), "hasWon": self.hasWon,
+            "hasWonPreviously": self.hasWonPreviously, "gotFinalTime": self.gotFinalTime, "gotFinalScore": self.gotFinalScore,
+            "winTime": self.winTime, "winMoves": self.winMoves,
+        }
+
+    def restore(self, snapshot):
+        '''Carry on with a game from a snapshot made by getSnapshot, instead of starting a new one with setup'''
+        global score
+        global moveCount
+        global finalTime
+
+        score = snapshot["score"]
+        moveCount = snapshot["moveCount"]
+        self.hasWon = snapshot["hasWon"]
+        self.hasWonPreviously = snapshot["hasWonPreviously"]
+        self.gotFinalTime = snapshot["gotFinalTime"]
+        self.gotFinalScore = snapshot.get("gotFinalScore", False)
+        self.winTime = snapshot["winTime"]
+        self.winMoves = snapshot["winMoves"]
+        # The win screen shows the time 2048 was reached, so it needs to be set if the game was saved with it showing
+        finalTime = self.winTime
+
+        # The spawn stream carries on from where it was, so the game spawns the same tiles it would have without the break
+        self.spawns.setState(snapshot["spawns"])
+        self.seed = self.spawns.seed
+        self.cells[:] = engine.boardToCells(snapshot["board"], self.size)
+        self.updateStatus()
+        self.history.reset(self.getState())
+
+    def autosave(self):
+        '''Queue a snapshot of the game if it has changed since the last one, or delete the save once the game is over'''
+        key = (self.status.board, score, self.hasWonPreviously, self.isGameOver)
+        if key == self.savedKey:
+            return
+        self.savedKey = key
+        if self.isGameOver:
+            autosaver.clear()
+        else:
+            autosaver.save(self.getSnapshot())
+
+    def moveTiles(self, direction, animate=True):
+        '''Depending on which key has been pressed, move all tiles in the board in the correct direction.
+        If animate is set the tiles slide to their new cells, otherwise they are drawn in them straight away'''
+        # Global variables from outside of the function
+        global score
+        global moveCount
+
+        # 0 = Up
+        # 1 = Right
+        # 2 = Down
+        # 3 = Left
+
+        # Check if the player has the "win" screen open, if they do then pressing a button will remove it
+        # and allow them to continue playing
+        if self.hasWon and not self.hasWonPreviously:
+            self.hasWonPreviously = True
+            self.history.replace(self.getState(self.history.current()[-1]))
+
+        # Else if the game isn't over and the move would move a tile, then continue as normal
+        elif not self.isGameOver and self.status.canMove(direction):
+            # Each time a valid move is made, increment the move count
+            if not self.hasWon:
+                moveCount += 1
+
+            # Pack the tile values into an integer and let the engine move them, this works the same for every direction
+            oldBoard = self.status.board
+            packedBoard, gained, hasMoved = engine.moveBoard(oldBoard, direction, self.size)
+
+            # Copy the new board into the cells, add the score and spawn a random piece
+            newCells = engine.boardToCells(packedBoard, self.size)
+            self.updatePlaceableTiles(newCells)
+            self.cells[:] = newCells
+            score += gained
+            cell = self.spawnRandomPiece()
+            exponent = self.cells[cell]
+            packedBoard |= exponent << (4 * cell)
+            self.status.update(packedBoard)
+            if self.recorder:
+                self.recorder.recordMove(direction, cell, exponent, packedBoard, score)
+
+            # The game is over as soon as no move would move a tile, whether or not the board is full
+            if self.status.isGameOver():
+                self.isGameOver = True
+            self.history.push(self.getState((direction, cell, exponent)))
+
+            # Any animation still running is skipped, and the new one starts from where the tiles are now
+            if animate and len(self.cells) <= self.animationLimit:
+                self.animation = MoveAnimation(engine.moveTracks(oldBoard, direction, self.size), engine.unpackBoard(oldBoard, self.size),
+                                               engine.unpackBoard(packedBoard, self.size), cell)
+            else:
+                self.animation = None
+    
+    def generateTestTiles(self):
+        '''Fill the board with a set of tiles for testing'''
+        # Each cell holds double the tile before it, up to the largest tile the board can hold
+        for i in range(len(self.cells)):
+            self.cells[i] = min(i + 1, engine.maxExponent)
+        self.updateStatus()
+
+    def getSurfaces(self):
+        '''Return the tile surface for each exponent, so drawing a cell is a single list lookup'''
+        return styles.getSurfaces(self.viewport.tileSize)
+    
+    def draw(self, hint=None):
+        '''Draw any tiles that have changed since the last frame, returning a list of the areas of the screen that were changed.
+        The whole board is redrawn when an overlay (the win/lose screen or a hint) appears, disappears or has tiles change underneath it'''
+        # While a move is animating the whole board is drawn every frame, the overlays are shown once it has finished
+        if self.animation is not None:
+            now = time.perf_counter()
+            if not self.animation.isFinished(now):
+                return self.drawAnimation(now)
+            self.animation = None
+            self.drawnValues = None
+
+        overlay = (self.hasWon and not self.hasWonPreviously, self.isGameOver, hint)
+        # A copy of the cells, comparing it with the last one drawn is a single bytes comparison
+        values = bytes(self.cells)
+
+        # If nothing has changed, there is nothing to draw
+        if values == self.drawnValues and overlay == self.drawnOverlay:
+            return []
+
+        # Only the cells inside the window are drawn, which is every cell unless the board is too big to fit
+        surfaces = self.getSurfaces()
+        positions = self.viewport.positions
+        visibleCells = self.viewport.visibleCells
+
+        # Overlays are see-through, so drawing them again on top of themselves would make them darker. Redraw everything instead
+        if self.drawnValues is None or overlay != self.drawnOverlay or overlay != (False, False, None):
+            pygame.draw.rect(screen, styles.boardColor, (0, 0, windowSize[0], windowSize[1]))
+            screen.blits([(surfaces[values[cell]], positions[cell]) for cell in visibleCells], doreturn=False)
+            self.drawOverlay()
+            if hint is not None:
+                self.drawHint(hint)
+            self.drawnValues = values
+            self.drawnOverlay = overlay
+            return [pygame.Rect(0, 0, windowSize[0], windowSize[1])]
+
+        # Otherwise only draw the tiles whose values have changed
+        rects = []
+        drawnValues = self.drawnValues
+        for cell in visibleCells:
+            if values[cell] != drawnValues[cell]:
+                rects.append(screen.blit(surfaces[values[cell]], positions[cell]))
+        self.drawnValues = values
+        return rects
+
+    def drawAnimation(self, now):
+        '''Draw one frame of the move animation, with every tile drawn in a single batch'''
+        emptySurface = Tile.surfaceFor(0)
+        positions = self.viewport.positions
+        blits = [(emptySurface, positions[cell]) for cell in self.viewport.visibleCells]
+        blits += self.animation.getBlits(now, positions, Tile.tileSize, Tile.surfaceFor)
+
+        pygame.draw.rect(screen, styles.boardColor, (0, 0, windowSize[0], windowSize[1]))
+        screen.blits(blits, doreturn=False)
+        # Once the animation is over the whole board needs to be drawn again
+        self.drawnValues = None
+        return [pygame.Rect(0, 0, windowSize[0], windowSize[1])]
+
+def setStatus(text):
+    '''Show a message in the window title, where it doesn't cover the board'''
+    pygame.display.set_caption(f"2048 - {text}" if text else "2048")
+
+def makeAiPlayer(name, boardSize):
+    '''Return the AI player chosen on the menu. The n-tuple player needs a network trained for the board size, if there
+    isn't one the expectimax AI is used instead. Boards over aiCellLimit cells have no AI, so None is returned'''
+    if boardSize[0] * boardSize[1] > aiCellLimit:
+        setStatus("Hints and AI play are off on boards this big")
+        return None
+    if name == "N-tuple":
+        # NumPy is only loaded when the n-tuple player is used, so it doesn't slow down starting the game
+        import ntuple
+        try:
+            return ntuple.NTuplePlayer(ntuple.NTupleNetwork.load(ntupleWeightsPath), boardSize)
+        except (OSError, ValueError) as error:
+            # Shown in the window title, the game carries on with the expectimax AI
+            setStatus(f"N-tuple network can't be used ({error}), using Expectimax")
+    return solver.Solver(boardSize, timeLimit=100)
+
+def gameSetup():
+    '''If the user didn't quit the game in the menu, run this'''
+    global startTime
+    global screen
+    global gameBoard
+    global aiPlayer
+    global replayWriter
+    global windowSize
+    global autosaver
+    global analyticsWriter
+
+    # The window fits the board, shrinking the tiles if the board is too big for 100 pixel tiles
+    windowSize = getWindowSize(gameBoardSize)
+    screen = pygame.display.set_mode(windowSize)
+    pygame.mouse.set_cursor()
+
+    # Make sure the board is drawn straight away, without waiting for any input
+    scheduler.requestFrame()
+
+    # Create the AI for this board size, it is used for hints and for AI play
+    aiPlayer = makeAiPlayer(aiPlayerName, gameBoardSize)
+
+    # After the game has started (the player has exited the main menu) then generate the game board
+    gameBoard = Board(gameBoardSize)
+
+    # Record every move to the replay log, the writer saves it on a background thread so frames don't wait for the disk.
+    # A replay has to start from the first move, so a resumed game isn't recorded
+    replayWriter = ReplayWriter("replays.bin")
+    if resumeSnapshot:
+        gameBoard.restore(resumeSnapshot)
+    else:
+        gameBoard.recorder = ReplayRecorder(replayWriter, gameBoard.seed, gameBoardSize)
+        gameBoard.setup()
+
+    # Save the game in the background as it is played, along with the statistics once it ends
+    autosaver = Autosaver()
+    analyticsWriter = AnalyticsWriter()
+
+    # Start the game timer to be used for high scores, a resumed game carries on from the time it had been played for
+    startTime = time.monotonic() - (resumeSnapshot["elapsedTime"] / 1000 if resumeSnapshot else 0)
+
+def main():
+    '''Main game loop, runs every frame'''
+    global gameRunning
+    global gameBoard
+    global aiPlaying
+    global hintDirection
+
+    while gameRunning:
+        # While a move is animating, the AI is playing or the profiler is showing it needs a new frame at a steady rate, otherwise sleep until there is input
+        scheduler.setAnimating(aiPlaying or profiler.enabled or gameBoard.animation is not None)
+
+        events = scheduler.wait()
+        profiler.beginFrame()
+
+        with profiler.section("events"):
+            for event in events:
+                # If the escape key is pressed, or the window is closed, quit the application
+                if event.type == pygame.QUIT or pygame.key.get_pressed()[pygame.K_ESCAPE]:
+                    gameRunning = False
+
+                # If the window has been covered up or restored, the whole board needs to be drawn again
+                elif event.type == pygame.WINDOWEXPOSED or event.type == pygame.VIDEOEXPOSE:
+                    gameBoard.drawnValues = None
+
+                # The mouse wheel scrolls around boards that are too big to fit in the window
+                elif event.type == pygame.MOUSEWHEEL:
+                    if gameBoard.viewport.scroll(-event.y, event.x):
+                        gameBoard.drawnValues = None
+
+                # Depending on the direction the user presses, call a function to move all tiles in the board with different inputs
+                elif event.type == pygame.KEYDOWN:
+                    direction = None
+                    if event.key == pygame.K_w or event.key == pygame.K_UP: direction = 0
+                    elif event.key == pygame.K_d or event.key == pygame.K_RIGHT: direction = 1
+                    elif event.key == pygame.K_s or event.key == pygame.K_DOWN: direction = 2
+                    elif event.key == pygame.K_a or event.key == pygame.K_LEFT: direction = 3
+                    # H asks the AI for the best move, P turns AI play on or off. Large boards have no AI, so both do nothing
+                    elif event.key == pygame.K_h and aiPlayer: hintDirection = aiPlayer.bestMove(gameBoard.status.board)
+                    elif event.key == pygame.K_p and aiPlayer: aiPlaying = not aiPlaying
+                    # Z undoes the last move and Y redoes it, the hint is for the old board so it is cleared
+                    elif event.key == pygame.K_z:
+                        if gameBoard.undo(): hintDirection = None
+                    elif event.key == pygame.K_y:
+                        if gameBoard.redo(): hintDirection = None
+                    # F3 shows or hides the profiler, F4 saves the recorded frames and F5 starts a cProfile capture
+                    elif event.key == pygame.K_F3:
+                        profiler.toggle()
+                        gameBoard.drawnValues = None
+                    elif event.key == pygame.K_F4: profiler.exportTrace("trace.json")
+                    elif event.key == pygame.K_F5: profiler.startCapture(300, "profile")
+
+                    # Any move makes the old hint out of date
+                    if direction is not None:
+                        hintDirection = None
+                        with profiler.section("moveTiles"):
+                            gameBoard.moveTiles(direction)
+
+        # If AI play is on, let the AI make one move each frame. The game is over once it has no moves left, so AI play stops
+        # The AI moves every frame, which is faster than a move can be animated, so its moves are drawn straight away
+        if aiPlaying and not gameBoard.isGameOver:
+            direction = aiPlayer.bestMove(gameBoard.status.board)
+            if direction is None:
+                aiPlaying = False
+            else:
+                hintDirection = None
+                with profiler.section("moveTiles"):
+                    gameBoard.moveTiles(direction, animate=False)
+
+        # Check if the player has won, or lost
+        with profiler.section("checkGamestate"):
+            gameBoard.checkGamestate()
+
+        # Queue a snapshot for the autosave if a move has been made, it is written on the autosaver's thread
+        gameBoard.autosave()
+
+        # Draw any tiles that have changed, along with the win/lose screen and hint. The profiler is drawn on top of the board,
+        # so while it is showing the whole board is drawn every frame
+        with profiler.section("draw"):
+            if profiler.enabled:
+                gameBoard.drawnValues = None
+            rects = gameBoard.draw(hintDirection)
+            if profiler.enabled:
+                profiler.drawOverlay(screen)
+
+        # Update only the parts of the display that have changed
+        with profiler.section("display"):
+            pygame.display.update(rects)
+        profiler.endFrame()
+
+    # Save the end of the replay, even if the game was quit before it was over
+    if gameBoard.recorder:
+        gameBoard.recorder.finish(score)
+    replayWriter.close()
+
+    # Save the game one last time, so the time played is up to date, then wait for the save to be written
+    if not gameBoard.isGameOver:
+        autosaver.save(gameBoard.getSnapshot())
+    autosaver.close()
+    analyticsWriter.close()
+
+    # Print how much of the time the game spent working, and how long frames took, if it was asked for
+    if printReport:
+        print(scheduler.report())
+
+# Initialize empty variables to be used later
+gameBoard = None
+aiPlayer = None
+replayWriter = None
+screen = None
+startTime = None
+
+def startup():
+    '''Start the parts of pygame the game needs, set up the window and open the leaderboard'''
+    global leaderboard
+    global analytics
+
+    initPygame()
+
+    # Set window properties of the pygame window
+    pygame.display.set_caption("2048")
+    pygame.display.set_icon(assets.icon())
+
+    # Opening the leaderboard the first time also converts times saved as text by older versions of the game
+    leaderboard = Leaderboard("leaderboard.db")
+    # The statistics are rebuilt from the games log if they haven't been saved yet
+    analytics = GameAnalytics.open()
+
+def run(boardSize=None, report=False):
+    '''Show the menu, then play the game on the board size chosen. If a (rows, columns) boardSize is given the menu is skipped,
+    and if report is set the frame timing report is printed when the game closes'''
+    global gameBoardSize
+    global printReport
+
+    printReport = report
+
+    startup()
+
+    # Initialize the menu at the start of the game, unless the board size has already been chosen
+    if boardSize is None:
+        m = Menu((600, 460))
+        m.drawWindow()
+    else:
+        gameBoardSize = boardSize
+
+    # Start the game
+    if gameRunning:
+        gameSetup()
+        main()
+    
\ No newline at end of file
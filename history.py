@@ -0,0 +1,58 @@
+# Undo and redo history
+# Each state of the game is saved as a small tuple holding the packed board, score, move count and flags, so a snapshot
+# costs a few ints instead of a copy of every tile. The tuples never change, so nothing is copied when one is restored.
+# States are kept in a fixed size ring: once it is full the oldest state is overwritten, so memory stays the same
+# however long the game goes on, and undo and redo only move a position around the ring.
+
+
+class History:
+    '''A bounded ring of game states, which can be stepped backwards (undo) and forwards again (redo)'''
+
+    def __init__(self, depth=1000):
+        '''Create an empty history which can undo up to depth - 1 moves'''
+        self.depth = depth
+        self.states = [None] * depth
+        self.position = 0
+        # How many states there are before and after the current one
+        self.undoCount = 0
+        self.redoCount = 0
+
+    def reset(self, state):
+        '''Forget every state, starting again from the one given'''
+        self.states[0] = state
+        self.position = 0
+        self.undoCount = 0
+        self.redoCount = 0
+
+    def push(self, state):
+        '''Add the state after a move. Anything that could have been redone is forgotten, as the game has gone a different way'''
+        self.position = (self.position + 1) % self.depth
+        self.states[self.position] = state
+        self.undoCount = min(self.undoCount + 1, self.depth - 1)
+        self.redoCount = 0
+
+    def current(self):
+        '''Return the current state'''
+        return self.states[self.position]
+
+    def replace(self, state):
+        '''Change the current state without adding a new one, for changes that aren't moves'''
+        self.states[self.position] = state
+
+    def undo(self):
+        '''Step back to the previous state and return it, or return None if there is nothing to undo'''
+        if self.undoCount == 0:
+            return None
+        self.position = (self.position - 1) % self.depth
+        self.undoCount -= 1
+        self.redoCount += 1
+        return self.states[self.position]
+
+    def redo(self):
+        '''Step forward to the next state and return it, or return None if there is nothing to redo'''
+        if self.redoCount == 0:
+            return None
+        self.position = (self.position + 1) % self.depth
+        self.redoCount -= 1
+        self.undoCount += 1
+        return self.states[self.position]
@@ -0,0 +1,228 @@
+# Leaderboard store
+# High scores and best times are kept in an indexed sqlite database, so the menu can read the top few records
+# without unpickling the whole history. The .bin pickle files are still appended to as the full history of every
+# game, and the database is built from them the first time it is opened, so it can always be rebuilt by deleting it.
+# Times are stored as whole milliseconds, and are only turned into text when they are displayed.
+
+import os
+import pickle
+import sqlite3
+from collections import Counter
+
+scoreFiles = ["high_scores.bin", "score backups/high_scores.bin"]
+timeFiles = ["best_times.bin", "score backups/best_times.bin"]
+
+# Version 1 stored times as "H:MM:SS" text, version 2 stores them as milliseconds along with the max tile
+schemaVersion = 2
+
+
+def formatDuration(milliseconds):
+    '''Turn a number of milliseconds into text in the form H:MM:SS'''
+    seconds = milliseconds // 1000
+    return f"{seconds // 3600}:{seconds // 60 % 60:02}:{seconds % 60:02}"
+
+
+def parseDuration(text):
+    '''Turn text in the form H:MM:SS (as older versions of the game saved times) into milliseconds. The times were saved
+    with str(timedelta), so games of a day or more start with "N day, " or "N days, "'''
+    days = 0
+    if ", " in text:
+        dayText, text = text.split(", ")
+        days = int(dayText.split()[0])
+    hours, minutes, seconds = text.split(":")
+    return int(((days * 24 + int(hours)) * 3600 + int(minutes) * 60 + float(seconds)) * 1000)
+
+
+def normalizeTime(record):
+    '''Convert a best time record from any version of the game into [milliseconds, moves, board size, max tile].
+    Older records saved the time as text and didn't save the max tile, which was always 2048 when the time was saved'''
+    if isinstance(record[0], str):
+        return [parseDuration(record[0]), record[1], record[2], 2048]
+    return list(record)
+
+
+def readPickles(path):
+    '''Unpickle every record in a file, returning an empty list if the file doesn't exist. A record that can't be read,
+    such as one cut short by a crash, ends the file'''
+    records = []
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return records
+
+    with f:
+        while True:
+            try:
+                records.append(pickle.load(f))
+            except Exception:
+                # Damaged bytes can fail in many ways (a bad opcode, a huge length, text that isn't UTF-8), all of which end the file
+                break
+    return records
+
+
+def findRecordsEnd(f):
+    '''Return the position just after the last record that can be read in an open pickle file'''
+    end = 0
+    while True:
+        try:
+            pickle.load(f)
+        except Exception:
+            return end
+        end = f.tell()
+
+
+def migrateTimesFile(path):
+    '''Rewrite a best times file so that every record uses the current format. The new file replaces the old one in a single step'''
+    records = readPickles(path)
+    if all(not isinstance(record[0], str) for record in records):
+        return False
+
+    temporaryPath = path + ".tmp"
+    with open(temporaryPath, "wb") as f:
+        for record in records:
+            pickle.dump(normalizeTime(record), f)
+        # Make sure the new file is on disk before it replaces the old one
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporaryPath, path)
+    return True
+
+
+# Where the last complete record ends in each file appended to this run, so each file is only checked the first time
+recordEnds = {}
+
+
+def appendRecord(path, record):
+    '''Add a record to the end of a pickle file, in one write which is flushed to disk before this returns. If a crash
+    cut the last record short, it is cut off first, so the new record never ends up behind a damaged one'''
+    key = os.path.abspath(path)
+    with open(path, "ab+") as f:
+        # Check the file the first time, or if something else has written to it since
+        size = f.seek(0, os.SEEK_END)
+        if recordEnds.get(key) != size:
+            f.seek(0)
+            end = findRecordsEnd(f)
+            if end != size:
+                f.truncate(end)
+
+        f.write(pickle.dumps(record))
+        f.flush()
+        os.fsync(f.fileno())
+        recordEnds[key] = f.seek(0, os.SEEK_END)
+
+
+def mergeRecords(files, normalize=tuple):
+    '''Read records from several files which may hold copies of the same history, such as backups.
+    A record is kept as many times as it appears in the file that has it the most, so copies are not counted twice'''
+    merged = Counter()
+    for path in files:
+        merged |= Counter(tuple(normalize(record)) for record in readPickles(path))
+    return list(merged.elements())
+
+
+class Leaderboard:
+    def __init__(self, path="leaderboard.db", scoreFiles=scoreFiles, timeFiles=timeFiles):
+        '''Open (or create) the database, importing the pickle files if this is the first time it has been opened'''
+        self.connection = sqlite3.connect(path)
+        # Results of recent queries, cleared whenever a new record is added
+        self.cache = {}
+
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS scores (id INTEGER PRIMARY KEY, score INTEGER NOT NULL, boardSize TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS scoresByScore ON scores (score DESC);
+            CREATE INDEX IF NOT EXISTS scoresBySize ON scores (boardSize, score DESC);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self.migrate()
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS times (id INTEGER PRIMARY KEY, durationMs INTEGER NOT NULL, moves INTEGER NOT NULL,
+                                              boardSize TEXT NOT NULL, maxTile INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS timesByDuration ON times (durationMs, moves);
+            CREATE INDEX IF NOT EXISTS timesBySize ON times (boardSize, durationMs, moves);
+        """)
+        self.connection.execute(f"PRAGMA user_version = {schemaVersion}")
+
+        # Older versions of the game saved times as text. The times file is converted once, so it isn't read at every start
+        if self.getMeta("timesMigrated") is None:
+            for path in timeFiles[:1]:
+                migrateTimesFile(path)
+            self.setMeta("timesMigrated", "1")
+
+        if self.getMeta("imported") is None:
+            self.importPickles(scoreFiles, timeFiles)
+
+    def migrate(self):
+        '''Convert the times table from an older version of the database, keeping every record'''
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(times)")]
+        if version >= schemaVersion or "time" not in columns:
+            return
+
+        rows = self.connection.execute("SELECT time, moves, boardSize FROM times").fetchall()
+        with self.connection:
+            self.connection.execute("DROP TABLE times")
+            self.connection.execute("""
+                CREATE TABLE times (id INTEGER PRIMARY KEY, durationMs INTEGER NOT NULL, moves INTEGER NOT NULL,
+                                    boardSize TEXT NOT NULL, maxTile INTEGER NOT NULL)
+            """)
+            self.connection.executemany("INSERT INTO times (durationMs, moves, boardSize, maxTile) VALUES (?, ?, ?, ?)",
+                                        [normalizeTime(row) for row in rows])
+
+    def getMeta(self, key):
+        '''Return a value from the meta table, or None if it hasn't been set'''
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def setMeta(self, key, value):
+        '''Set a value in the meta table'''
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def importPickles(self, scoreFiles, timeFiles):
+        '''Copy every record from the pickle files into the database. This is only done once, when the database is created'''
+        with self.connection:
+            self.connection.executemany("INSERT INTO scores (score, boardSize) VALUES (?, ?)", mergeRecords(scoreFiles))
+            self.connection.executemany("INSERT INTO times (durationMs, moves, boardSize, maxTile) VALUES (?, ?, ?, ?)",
+                                        mergeRecords(timeFiles, normalizeTime))
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('imported', '1')")
+        self.cache.clear()
+
+    def addScore(self, score, boardSize):
+        '''Add a score to the leaderboard'''
+        with self.connection:
+            self.connection.execute("INSERT INTO scores (score, boardSize) VALUES (?, ?)", (score, boardSize))
+        self.cache.clear()
+
+    def addTime(self, durationMs, moves, boardSize, maxTile):
+        '''Add a time, in milliseconds, to the leaderboard'''
+        with self.connection:
+            self.connection.execute("INSERT INTO times (durationMs, moves, boardSize, maxTile) VALUES (?, ?, ?, ?)",
+                                    (durationMs, moves, boardSize, maxTile))
+        self.cache.clear()
+
+    def query(self, key, sql, parameters):
+        '''Run a query, or return the cached result if it has been run since the last record was added'''
+        if key not in self.cache:
+            self.cache[key] = [list(row) for row in self.connection.execute(sql, parameters)]
+        return self.cache[key]
+
+    def topScores(self, count=3, boardSize=None):
+        '''Return the highest scores as [score, board size] lists, for every board size or only the one given'''
+        if boardSize is None:
+            return self.query(("scores", count, None), "SELECT score, boardSize FROM scores ORDER BY score DESC LIMIT ?", (count,))
+        return self.query(("scores", count, boardSize),
+                          "SELECT score, boardSize FROM scores WHERE boardSize = ? ORDER BY score DESC LIMIT ?", (boardSize, count))
+
+    def bestTimes(self, count=3, boardSize=None):
+        '''Return the best times as [milliseconds, moves, board size, max tile] lists, for every board size or only the one given.
+        Equal times are ranked by the number of moves'''
+        if boardSize is None:
+            return self.query(("times", count, None),
+                              "SELECT durationMs, moves, boardSize, maxTile FROM times ORDER BY durationMs, moves LIMIT ?", (count,))
+        return self.query(("times", count, boardSize),
+                          "SELECT durationMs, moves, boardSize, maxTile FROM times WHERE boardSize = ? ORDER BY durationMs, moves LIMIT ?",
+                          (boardSize, count))
+
+    def close(self):
+        '''Close the database connection'''
+        self.connection.close()
@@ -0,0 +1,351 @@
+# N-tuple network evaluator
+# An n-tuple network values a board by looking at small groups of cells (tuples), such as a row or a 2 x 2 square. The
+# exponents in a tuple's cells form an index into that tuple's table of weights, and the value of the board is the sum
+# of the weights found. Every tuple is also looked up on each reflection and rotation of the board, sharing the same
+# table, so the network values symmetric boards the same and learns from every orientation at once.
+#
+# The weights are learnt by temporal difference learning on afterstates (the board after a move, before the spawn) from
+# self-play, with many games played at once on the NumPy batch engine. They are kept in one flat float32 array saved as a
+# .npy file, with the board size and tuples in a small .json file next to it. Players load the weights memory-mapped and
+# read only, so every process playing with the same file shares one copy of it.
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import batch
+import engine
+from spawns import SpawnStream
+
+# Tuples as (row, column) cells. Each is used with every symmetry of the board, so these cover every row, column and square
+tupleSets = {
+    # Two straight lines and two squares, 4 tables of 65536 weights (1MB)
+    "4": [
+        [(0, 0), (0, 1), (0, 2), (0, 3)],
+        [(1, 0), (1, 1), (1, 2), (1, 3)],
+        [(0, 0), (0, 1), (1, 0), (1, 1)],
+        [(0, 1), (0, 2), (1, 1), (1, 2)],
+    ],
+    # Larger tuples which learn much more, 4 tables of 16.7 million weights (256MB)
+    "6": [
+        [(0, 0), (0, 1), (0, 2), (0, 3), (1, 0), (1, 1)],
+        [(1, 0), (1, 1), (1, 2), (1, 3), (2, 0), (2, 1)],
+        [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2)],
+        [(1, 0), (1, 1), (1, 2), (2, 0), (2, 1), (2, 2)],
+    ],
+}
+
+defaultWeightsPath = "ntuple.npy"
+
+
+def getSymmetries(size):
+    '''Return functions mapping a (row, column) cell onto each symmetry of a board. Square boards have 8 (4 rotations, each
+    of them flipped or not), other boards only have 4 as they can't be turned by a quarter'''
+    rows, columns = size
+    symmetries = [
+        lambda row, column: (row, column),
+        lambda row, column: (row, columns - 1 - column),
+        lambda row, column: (rows - 1 - row, column),
+        lambda row, column: (rows - 1 - row, columns - 1 - column),
+    ]
+    if rows == columns:
+        symmetries += [
+            lambda row, column: (column, row),
+            lambda row, column: (column, rows - 1 - row),
+            lambda row, column: (rows - 1 - column, row),
+            lambda row, column: (rows - 1 - column, rows - 1 - row),
+        ]
+    return symmetries
+
+
+def boardsToCells(boards, size):
+    '''Convert a list of packed boards into a (boards, cells) uint8 array of exponents'''
+    data = b"".join([engine.boardToCells(board, size) for board in boards])
+    return np.frombuffer(data, dtype=np.uint8).reshape(len(boards), size[0] * size[1])
+
+
+class NTupleNetwork:
+    def __init__(self, size=(4, 4), tuples=None, weights=None):
+        '''Create a network for boards of (rows, columns), with weights of zero unless a weights array is given'''
+        self.size = tuple(size)
+        self.tuples = [[tuple(cell) for cell in cells] for cells in (tuples or tupleSets["4"])]
+        self.tupleLength = len(self.tuples[0])
+        if any(len(cells) != self.tupleLength for cells in self.tuples):
+            raise ValueError("Every tuple must have the same number of cells")
+        if any(row >= self.size[0] or column >= self.size[1] for cells in self.tuples for row, column in cells):
+            raise ValueError(f"The tuples don't fit on a {self.size[0]} x {self.size[1]} board")
+        self.tableSize = 16 ** self.tupleLength
+
+        # One feature for each tuple on each symmetry, holding the cell indexes it reads and where its table starts
+        featureCells = []
+        featureOffsets = []
+        for index, cells in enumerate(self.tuples):
+            for symmetry in getSymmetries(self.size):
+                featureCells.append([row * self.size[1] + column for row, column in (symmetry(*cell) for cell in cells)])
+                featureOffsets.append(index * self.tableSize)
+        self.featureCells = np.array(featureCells, dtype=np.intp)
+        self.featureOffsets = np.array(featureOffsets, dtype=np.int32)
+
+        if weights is None:
+            weights = np.zeros(len(self.tuples) * self.tableSize, dtype=np.float32)
+        if weights.shape != (len(self.tuples) * self.tableSize,):
+            raise ValueError("The weights don't match the tuples")
+        self.weights = weights
+
+    def getIndexes(self, cells):
+        '''Return the index into the weights of every feature, as a (boards, features) array, for a (boards, cells) array of exponents'''
+        # The first cell of a tuple is the lowest 4 bits of its index. Each step works on one cell of every feature at once
+        indexes = cells[:, self.featureCells[:, 0]].astype(np.int32)
+        for position in range(1, self.tupleLength):
+            indexes |= cells[:, self.featureCells[:, position]].astype(np.int32) << (4 * position)
+        indexes += self.featureOffsets
+        return indexes
+
+    def evaluateCells(self, cells):
+        '''Return the value of each board in a (boards, cells) array of exponents'''
+        return np.take(self.weights, self.getIndexes(cells)).sum(axis=1)
+
+    def evaluateBoards(self, boards):
+        '''Return the value of each packed board in a list'''
+        return self.evaluateCells(boardsToCells(boards, self.size))
+
+    def evaluate(self, board):
+        '''Return the value of one packed board'''
+        return float(self.evaluateBoards([board])[0])
+
+    def update(self, cells, errors, alpha):
+        '''Move the values of a (boards, cells) array of exponents towards their targets. errors is target minus value for
+        each board, and alpha is the learning rate, shared between the features'''
+        indexes = self.getIndexes(cells)
+        steps = (errors * (alpha / indexes.shape[1])).astype(np.float32)
+        np.add.at(self.weights, indexes, steps[:, np.newaxis])
+
+    def save(self, path):
+        '''Save the weights to path (a .npy file) and the size and tuples to path.json. Each file is written to a temporary
+        file first and then renamed, so a reader never sees half a file'''
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, self.weights)
+        os.replace(path + ".tmp", path)
+        with open(path + ".json.tmp", "w") as f:
+            json.dump({"size": self.size, "tuples": self.tuples}, f)
+        os.replace(path + ".json.tmp", path + ".json")
+
+    @classmethod
+    def load(cls, path, writable=False):
+        '''Load a network saved by save. Unless writable is set the weights are memory-mapped read only, so processes
+        loading the same file share it'''
+        with open(path + ".json") as f:
+            settings = json.load(f)
+        weights = np.load(path) if writable else np.load(path, mmap_mode="r")
+        return cls(settings["size"], settings["tuples"], weights)
+
+
+class NTuplePlayer:
+    '''Picks moves with an n-tuple network. With depth 1 it takes the move with the best score plus afterstate value, with
+    depth 2 it also looks at every tile that could spawn after the move and the best move after that'''
+
+    def __init__(self, network, size=None, depth=2):
+        '''Create a player for a network, size must match the size the network was trained for'''
+        if size is not None and tuple(size) != network.size:
+            raise ValueError(f"The network is for {network.size[0]} x {network.size[1]} boards")
+        self.network = network
+        self.size = network.size
+        self.depth = depth
+
+    def getMoves(self, board):
+        '''Return a list of (direction, afterstate, score gained) for every move that changes the board'''
+        moves = []
+        for direction in (engine.UP, engine.RIGHT, engine.DOWN, engine.LEFT):
+            afterstate, gained, moved = engine.moveBoard(board, direction, self.size)
+            if moved:
+                moves.append((direction, afterstate, gained))
+        return moves
+
+    def bestMove(self, board):
+        '''Return the best direction for a packed board, or None if no move is possible'''
+        moves = self.getMoves(board)
+        if len(moves) == 0:
+            return None
+        if self.depth <= 1 or len(moves) == 1:
+            values = self.network.evaluateBoards([afterstate for direction, afterstate, gained in moves])
+            values += [gained for direction, afterstate, gained in moves]
+            return moves[int(values.argmax())][0]
+
+        # Collect every board reachable through a spawn and a second move, so they can all be valued in one call
+        nextBoards = []
+        nextGains = []
+        # For each first move, a list of (probability, start, end) giving the second moves after each spawn
+        outcomes = []
+        for direction, afterstate, gained in moves:
+            empty = engine.emptyCells(afterstate, self.size)
+            spawns = []
+            for cell in empty:
+                for exponent, probability in ((1, 0.9), (2, 0.1)):
+                    start = len(nextBoards)
+                    for nextDirection, nextAfterstate, nextGained in self.getMoves(afterstate | (exponent << (4 * cell))):
+                        nextBoards.append(nextAfterstate)
+                        nextGains.append(nextGained)
+                    spawns.append((probability / len(empty), start, len(nextBoards)))
+            outcomes.append(spawns)
+
+        values = np.array(nextGains, dtype=np.float64)
+        if nextBoards:
+            values += self.network.evaluateBoards(nextBoards)
+
+        # A spawn that leaves no moves ends the game, which is worth nothing
+        bestValue = None
+        best = moves[0][0]
+        for (direction, afterstate, gained), spawns in zip(moves, outcomes):
+            value = gained + sum(probability * values[start:end].max() for probability, start, end in spawns if end > start)
+            if bestValue is None or value > bestValue:
+                bestValue = value
+                best = direction
+        return best
+
+
+def train(network, games, batchSize=256, alpha=0.05, seed=0, report=None):
+    '''Train a network by TD(0) learning on afterstates, playing self-play games batchSize at a time with the
+    network's own greedy choices. report is called with (games finished, moves made, mean score of the last games)'''
+    size = network.size
+    cellCount = size[0] * size[1]
+    engineBatch = batch.BatchEngine(batchSize, size, seed)
+    directions = [np.full(batchSize, direction) for direction in (engine.UP, engine.RIGHT, engine.DOWN, engine.LEFT)]
+
+    # The last afterstate of each game, which is learnt from once the value of the next afterstate is known
+    previous = np.zeros((batchSize, cellCount), dtype=np.uint8)
+    hasPrevious = np.zeros(batchSize, dtype=bool)
+    scores = np.zeros(batchSize, dtype=np.int64)
+    finishedScores = []
+    finished = 0
+    moves = 0
+
+    while finished < games:
+        boards = engineBatch.boards
+        # Try every move on every board, valuing each one as its score plus the value of its afterstate
+        afterstates = []
+        gains = np.empty((4, batchSize), dtype=np.int64)
+        values = np.empty((4, batchSize), dtype=np.float64)
+        for direction in range(4):
+            afterstate, gained, moved = batch.moveBatch(boards, directions[direction])
+            afterstate = afterstate.reshape(batchSize, cellCount)
+            afterstates.append(afterstate)
+            gains[direction] = gained
+            values[direction] = np.where(moved, gained + network.evaluateCells(afterstate), -np.inf)
+        best = values.argmax(axis=0)
+        bestValue = values[best, np.arange(batchSize)]
+        over = np.isneginf(bestValue)
+
+        # The previous afterstate's target is the value of the move made now, or nothing if the game is over
+        if hasPrevious.any():
+            target = np.where(over, 0.0, bestValue)[hasPrevious]
+            learn = previous[hasPrevious]
+            network.update(learn, target - network.evaluateCells(learn), alpha)
+
+        # Finished games start again, the rest make their move and get a new tile
+        playing = ~over
+        chosen = np.stack(afterstates)[best, np.arange(batchSize)]
+        previous[playing] = chosen[playing]
+        hasPrevious = playing.copy()
+        scores[playing] += gains[best, np.arange(batchSize)][playing]
+        moves += int(playing.sum())
+        engineBatch.boards = chosen.reshape(boards.shape).copy()
+        batch.spawnBatch(engineBatch.boards, engineBatch.rng, playing)
+        if over.any():
+            finishedScores += scores[over].tolist()
+            finished += int(over.sum())
+            scores[over] = 0
+            engineBatch.reset(over)
+            if report:
+                report(finished, moves, finishedScores[-1000:])
+    return finishedScores
+
+
+def evaluatePlayer(player, games, seed=0):
+    '''Play games headless with a player, returning a list of (score, max tile, moves) for each game. Game n is seeded
+    with seed + n'''
+    results = []
+    for index in range(games):
+        spawns = SpawnStream(seed + index)
+        board = 0
+        score = 0
+        moves = 0
+        for i in range(2):
+            board = spawns.spawn(board, player.size)[0]
+        while True:
+            direction = player.bestMove(board)
+            if direction is None:
+                break
+            board, gained, moved = engine.moveBoard(board, direction, player.size)
+            board = spawns.spawn(board, player.size)[0]
+            score += gained
+            moves += 1
+        results.append((score, engine.maxTile(board, player.size), moves))
+    return results
+
+
+def main():
+    '''Train or evaluate a network from the command line'''
+    parser = argparse.ArgumentParser(description="Train an n-tuple network by self-play, or measure how well it plays")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    trainParser = commands.add_parser("train", help="train a network, carrying on from the weights file if it exists")
+    trainParser.add_argument("--games", type=int, default=10000, help="number of self-play games to learn from")
+    trainParser.add_argument("--batch", type=int, default=256, help="games played at once")
+    trainParser.add_argument("--alpha", type=float, default=0.05, help="learning rate")
+    trainParser.add_argument("--tuples", choices=sorted(tupleSets), default="4", help="tuple set for a new network")
+    trainParser.add_argument("--size", type=int, default=4, help="width and height of the board for a new network")
+    trainParser.add_argument("--seed", type=int, default=0, help="seed for the self-play games")
+    trainParser.add_argument("--weights", default=defaultWeightsPath, help="weights file to load and save")
+
+    evalParser = commands.add_parser("eval", help="play games with a trained network and print how it did")
+    evalParser.add_argument("--games", type=int, default=100, help="number of games to play")
+    evalParser.add_argument("--depth", type=int, default=2, help="1 for greedy play, 2 to also look at every spawn")
+    evalParser.add_argument("--seed", type=int, default=0, help="base seed for the games")
+    evalParser.add_argument("--weights", default=defaultWeightsPath, help="weights file to play with")
+    evalParser.add_argument("--speed", action="store_true", help="also measure how many positions per second are valued")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        if os.path.exists(args.weights):
+            network = NTupleNetwork.load(args.weights, writable=True)
+        else:
+            network = NTupleNetwork((args.size, args.size), tupleSets[args.tuples])
+        startTime = time.perf_counter()
+        lastReport = [0]
+
+        def report(finished, moves, recentScores):
+            if finished - lastReport[0] >= 1000 or finished >= args.games:
+                lastReport[0] = finished
+                elapsed = time.perf_counter() - startTime
+                print(f"Games: {finished}, moves/s: {moves / elapsed:.0f}, mean score of the last {len(recentScores)}: {np.mean(recentScores):.0f}")
+
+        train(network, args.games, args.batch, args.alpha, args.seed, report)
+        network.save(args.weights)
+        print(f"Saved to {args.weights}")
+
+    else:
+        network = NTupleNetwork.load(args.weights)
+        if args.speed:
+            cells = np.random.default_rng(args.seed).integers(0, 12, (100000, network.size[0] * network.size[1]), dtype=np.uint8)
+            startTime = time.perf_counter()
+            network.evaluateCells(cells)
+            print(f"Positions valued per second: {len(cells) / (time.perf_counter() - startTime):.0f}")
+
+        startTime = time.perf_counter()
+        results = evaluatePlayer(NTuplePlayer(network, depth=args.depth), args.games, args.seed)
+        elapsed = time.perf_counter() - startTime
+        scores = sorted(score for score, tile, moves in results)
+        tiles = {}
+        for score, tile, moves in results:
+            tiles[tile] = tiles.get(tile, 0) + 1
+        print(f"Games: {len(results)} in {elapsed:.1f}s ({sum(moves for score, tile, moves in results) / elapsed:.0f} moves/s)")
+        print(f"Score: mean {np.mean(scores):.0f}, median {scores[len(scores) // 2]}, max {scores[-1]}")
+        print("Max tiles: " + ", ".join(f"{tile}: {count}" for tile, count in sorted(tiles.items())))
+        print(f"Reached 2048: {sum(count for tile, count in tiles.items() if tile >= 2048) / len(results):.1%}")
+
+
+if __name__ == "__main__":
+    main()
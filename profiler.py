@@ -0,0 +1,208 @@
+# Frame profiler
+# Records how long each part of a frame takes into a fixed-size ring buffer, and can show the results on screen.
+# The buffer can be exported as a Chrome trace (open it at chrome://tracing or https://ui.perfetto.dev), and a
+# cProfile/tracemalloc capture can be taken over a number of frames to find out where the time and memory go.
+# Sections can be nested, and the time spent in an inner section is only counted in the inner one, so the sections of a
+# frame add up to no more than the frame.
+
+import cProfile
+import json
+import sys
+import time
+import tracemalloc
+from array import array
+
+import pygame
+
+from assets import assets
+
+sectionNames = ["events", "moveTiles", "checkGamestate", "draw", "display"]
+
+
+class Section:
+    '''Times a block of code with a "with" statement, adding the time to the current frame'''
+    __slots__ = ("profiler", "index", "start", "innerTime")
+
+    def __init__(self, profiler, index):
+        '''Store which profiler and which section the time is added to'''
+        self.profiler = profiler
+        self.index = index
+        self.start = 0.0
+        # Time spent in sections nested inside this one, which is taken off this section's time
+        self.innerTime = 0.0
+
+    def __enter__(self):
+        self.innerTime = 0.0
+        self.profiler.openSections.append(self)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exception):
+        duration = time.perf_counter() - self.start
+        openSections = self.profiler.openSections
+        openSections.pop()
+        if openSections:
+            openSections[-1].innerTime += duration
+        if self.profiler.enabled:
+            self.profiler.addTime(self.index, self.start, duration - self.innerTime)
+
+
+class FrameProfiler:
+    def __init__(self, capacity=600):
+        '''Create the ring buffer, which holds the timings of the last capacity frames'''
+        self.capacity = capacity
+        self.enabled = False
+        self.count = 0
+        self.slot = 0
+        self.origin = time.perf_counter()
+
+        # One entry per frame for each of these, the slot for the current frame is overwritten as the buffer wraps around
+        self.frameStarts = array("d", [0.0]) * capacity
+        self.frameTimes = array("d", [0.0]) * capacity
+        self.frameBlocks = array("q", [0]) * capacity
+        self.sectionStarts = [array("d", [0.0]) * capacity for name in sectionNames]
+        self.sectionTimes = [array("d", [0.0]) * capacity for name in sectionNames]
+        self.sections = {name: Section(self, i) for i, name in enumerate(sectionNames)}
+        # The sections that have been entered and not exited yet, innermost last
+        self.openSections = []
+
+        # The overlay's text is only worked out again every overlayInterval seconds, so in between the rendered text
+        # comes from the text cache
+        self.overlayInterval = 0.5
+        self.overlayLines = None
+        self.overlayTime = 0.0
+        self.overlayBackground = None
+
+        self.frameStart = time.perf_counter()
+        self.blocks = sys.getallocatedblocks()
+
+        # Used while a cProfile/tracemalloc capture is running
+        self.profile = None
+        self.captureFrames = 0
+        self.capturePath = None
+
+    def toggle(self):
+        '''Turn recording and the overlay on or off'''
+        self.enabled = not self.enabled
+
+    def section(self, name):
+        '''Return a context manager which times a section of the frame'''
+        return self.sections[name]
+
+    def addTime(self, index, start, duration):
+        '''Add time spent in a section to the current frame, a section can run more than once per frame'''
+        if self.sectionTimes[index][self.slot] == 0.0:
+            self.sectionStarts[index][self.slot] = start
+        self.sectionTimes[index][self.slot] += duration
+
+    def beginFrame(self):
+        '''Start timing a new frame, clearing its slot in the ring buffer'''
+        self.frameStart = time.perf_counter()
+        self.blocks = sys.getallocatedblocks()
+        for i in range(len(sectionNames)):
+            self.sectionTimes[i][self.slot] = 0.0
+
+    def endFrame(self):
+        '''Finish timing the current frame, and move on to the next slot in the ring buffer'''
+        if self.profile is not None:
+            self.captureFrames -= 1
+            if self.captureFrames <= 0:
+                self.stopCapture()
+
+        if not self.enabled:
+            return
+        self.frameStarts[self.slot] = self.frameStart
+        self.frameTimes[self.slot] = time.perf_counter() - self.frameStart
+        self.frameBlocks[self.slot] = sys.getallocatedblocks() - self.blocks
+        self.slot = (self.slot + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def recordedSlots(self):
+        '''Return the ring buffer slots that hold recorded frames, oldest first'''
+        start = (self.slot - self.count) % self.capacity
+        return [(start + i) % self.capacity for i in range(self.count)]
+
+    def getStats(self):
+        '''Return frames per second, frame time percentiles and section means in milliseconds, and allocations per frame'''
+        slots = self.recordedSlots()
+        if len(slots) < 2:
+            return None
+        frameTimes = sorted(self.frameTimes[slot] for slot in slots)
+        elapsed = self.frameStarts[slots[-1]] - self.frameStarts[slots[0]]
+        return {
+            "fps": (len(slots) - 1) / elapsed if elapsed > 0 else 0.0,
+            "p50": frameTimes[len(frameTimes) // 2] * 1000,
+            "p99": frameTimes[min(len(frameTimes) - 1, int(len(frameTimes) * 0.99))] * 1000,
+            "sections": {name: sum(self.sectionTimes[i][slot] for slot in slots) / len(slots) * 1000 for i, name in enumerate(sectionNames)},
+            "blocks": sum(self.frameBlocks[slot] for slot in slots) / len(slots),
+        }
+
+    def getOverlayLines(self):
+        '''Return the lines of text the overlay shows'''
+        stats = self.getStats()
+        if stats is None:
+            lines = ["Profiling..."]
+        else:
+            lines = [f"FPS: {stats['fps']:.1f}", f"Frame p50: {stats['p50']:.2f}ms  p99: {stats['p99']:.2f}ms"]
+            lines += [f"{name}: {value:.3f}ms" for name, value in stats["sections"].items()]
+            lines.append(f"Allocated blocks: {stats['blocks']:+.0f}/frame")
+        if self.profile is not None:
+            lines.append(f"Capturing: {self.captureFrames} frames left")
+        return lines
+
+    def drawOverlay(self, surface):
+        '''Draw the statistics in the top left corner, returning the area drawn over'''
+        now = time.perf_counter()
+        if self.overlayLines is None or now - self.overlayTime >= self.overlayInterval:
+            self.overlayLines = self.getOverlayLines()
+            # Until enough frames have been recorded for statistics, check again on the next frame
+            self.overlayTime = now if self.count >= 2 else 0.0
+        lines = self.overlayLines
+
+        # Draw a dark box behind the text so it can be read on top of any tile, it is only made again if the number of lines changes
+        height = 10 + 20 * len(lines)
+        if self.overlayBackground is None or self.overlayBackground.get_height() != height:
+            self.overlayBackground = pygame.Surface((260, height))
+            self.overlayBackground.set_alpha(190)
+            self.overlayBackground.fill((0, 0, 0))
+        rect = surface.blit(self.overlayBackground, (5, 5))
+        for i in range(len(lines)):
+            surface.blit(assets.text(lines[i], 16, (255, 255, 255)), (12, 10 + 20 * i))
+        return rect
+
+    def exportTrace(self, path):
+        '''Save the recorded frames in the Chrome trace event format'''
+        events = []
+        for slot in self.recordedSlots():
+            # Chrome traces use microseconds
+            events.append({"name": "frame", "ph": "X", "pid": 1, "tid": 1,
+                           "ts": (self.frameStarts[slot] - self.origin) * 1e6, "dur": self.frameTimes[slot] * 1e6,
+                           "args": {"allocatedBlocks": self.frameBlocks[slot]}})
+            for i, name in enumerate(sectionNames):
+                if self.sectionTimes[i][slot] > 0:
+                    events.append({"name": name, "ph": "X", "pid": 1, "tid": 1,
+                                   "ts": (self.sectionStarts[i][slot] - self.origin) * 1e6, "dur": self.sectionTimes[i][slot] * 1e6})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+    def startCapture(self, frames=300, path="profile"):
+        '''Run cProfile and tracemalloc for a number of frames, the results are saved to path.prof and path_memory.txt'''
+        if self.profile is not None:
+            return
+        self.captureFrames = frames
+        self.capturePath = path
+        tracemalloc.start()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stopCapture(self):
+        '''Stop a capture and save the results'''
+        self.profile.disable()
+        self.profile.dump_stats(self.capturePath + ".prof")
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        with open(self.capturePath + "_memory.txt", "w") as f:
+            for stat in snapshot.statistics("lineno")[:50]:
+                f.write(f"{stat}\n")
+        self.profile = None
+        print(f"Saved profile to {self.capturePath}.prof and {self.capturePath}_memory.txt")
@@ -0,0 +1,393 @@
+# Game replay logs
+# Every game is saved as its seed and board size, the tiles spawned at the start, and then for each move the
+# direction (packed 2 bits per move) and the tile that spawned after it (1 byte, or 2 on boards over 128 cells).
+# A keyframe holding the whole packed board is saved every so often, so a replay can jump to any move quickly.
+#
+# A log file is a header followed by chunks, each starting with a one byte tag:
+#   G  a new game starts: seed, rows, columns, number of starting spawns, then the starting spawns
+#   M  a chunk of moves: number of moves, the packed directions, then one spawn for each move
+#   K  a keyframe: the move number, the score, then the packed board after that move
+#   E  the game ended: the final score and the number of moves
+#   U  moves were undone: the number of moves the game carries on from, later moves replace the ones undone
+# Chunks are only ever added to the end of the file, so a file can hold any number of games.
+
+import argparse
+import queue
+import struct
+import threading
+import time
+
+import engine
+import symmetry
+
+header = b"2048RPL\x01"
+
+# Training data files are a header followed by records of rows, columns, the move made, then the packed board it was made on
+datasetHeader = b"2048DAT\x01"
+datasetRecord = struct.Struct("<BBB")
+
+
+class ReplayError(Exception):
+    '''Raised when a log file is damaged, or when a replay contains a move that isn't possible'''
+
+
+def spawnSize(size):
+    '''Return the number of bytes used to store each spawn on a board of this size'''
+    return 1 if size[0] * size[1] <= 128 else 2
+
+
+def encodeSpawns(spawns, size):
+    '''Pack a list of (cell, exponent) spawns into bytes, using the lowest bit for 2 (0) or 4 (1)'''
+    values = [cell * 2 + (exponent - 1) for cell, exponent in spawns]
+    if spawnSize(size) == 1:
+        return bytes(values)
+    return struct.pack(f"<{len(values)}H", *values)
+
+
+def decodeSpawns(data, size):
+    '''Unpack bytes from encodeSpawns back into a list of (cell, exponent) spawns'''
+    if spawnSize(size) == 1:
+        values = data
+    else:
+        values = struct.unpack(f"<{len(data) // 2}H", data)
+    return [(value >> 1, (value & 1) + 1) for value in values]
+
+
+def encodeMoves(moves):
+    '''Pack a list of directions into bytes, 4 moves to a byte with the first move in the lowest 2 bits'''
+    data = bytearray((len(moves) + 3) // 4)
+    for i in range(len(moves)):
+        data[i >> 2] |= moves[i] << (2 * (i & 3))
+    return bytes(data)
+
+
+# Every possible byte of packed moves, unpacked into its 4 directions
+movesTable = [tuple((byte >> shift) & 3 for shift in (0, 2, 4, 6)) for byte in range(256)]
+
+
+def decodeMoves(data, count):
+    '''Unpack bytes from encodeMoves back into a list of count directions'''
+    moves = []
+    for byte in data:
+        moves += movesTable[byte]
+    return moves[:count]
+
+
+class ReplayWriter:
+    '''Writes chunks to a log file on a background thread, so the game never waits for the disk'''
+
+    def __init__(self, path):
+        '''Open the log file, writing the header if it is new, and start the writing thread'''
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(header)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, data):
+        '''Queue some bytes to be written, this returns straight away'''
+        self.queue.put(data)
+
+    def run(self):
+        '''Write queued chunks to the file until None is queued'''
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            self.file.write(data)
+            # Only flush once everything waiting has been written
+            if self.queue.empty():
+                self.file.flush()
+        self.file.close()
+
+    def close(self):
+        '''Write everything still queued, then close the file'''
+        self.queue.put(None)
+        self.thread.join()
+
+
+class ReplayRecorder:
+    '''Records one game, buffering moves in memory and sending them to a ReplayWriter in chunks'''
+
+    def __init__(self, writer, seed, size, keyframeInterval=256, chunkSize=256):
+        '''Start recording a new game'''
+        self.writer = writer
+        self.size = tuple(size)
+        self.keyframeInterval = keyframeInterval
+        self.chunkSize = chunkSize
+        self.seed = seed
+        self.startSpawns = []
+        self.moves = []
+        self.spawns = []
+        self.moveCount = 0
+        self.started = False
+        self.finished = False
+
+    def recordSpawn(self, cell, exponent):
+        '''Record one of the tiles spawned at the start of the game'''
+        self.startSpawns.append((cell, exponent))
+
+    def recordMove(self, direction, cell, exponent, board, score):
+        '''Record a move and the tile spawned after it. board is the packed board after the spawn, used for keyframes'''
+        if not self.started:
+            self.writeStart()
+        self.moves.append(direction)
+        self.spawns.append((cell, exponent))
+        self.moveCount += 1
+
+        if self.moveCount % self.keyframeInterval == 0:
+            # Keyframes go after the moves leading up to them
+            self.flush()
+            boardBytes = board.to_bytes((self.size[0] * self.size[1] + 1) // 2, "little")
+            self.writer.write(b"K" + struct.pack("<IQ", self.moveCount, score) + boardBytes)
+        elif len(self.moves) >= self.chunkSize:
+            self.flush()
+
+    def writeStart(self):
+        '''Send the start of game chunk to the writer'''
+        self.started = True
+        data = struct.pack("<QBBB", self.seed, self.size[0], self.size[1], len(self.startSpawns))
+        self.writer.write(b"G" + data + encodeSpawns(self.startSpawns, self.size))
+
+    def flush(self):
+        '''Send any buffered moves to the writer'''
+        if self.moves:
+            data = struct.pack("<H", len(self.moves)) + encodeMoves(self.moves) + encodeSpawns(self.spawns, self.size)
+            self.writer.write(b"M" + data)
+            self.moves = []
+            self.spawns = []
+
+    def rewind(self, moveIndex):
+        '''Record that the game has gone back to the board after moveIndex moves, for undo. A game can carry on after it ended'''
+        if not self.started:
+            self.writeStart()
+        self.flush()
+        self.writer.write(b"U" + struct.pack("<I", moveIndex))
+        self.moveCount = moveIndex
+        self.finished = False
+
+    def finish(self, score):
+        '''Send the rest of the game to the writer, this is done once when the game ends'''
+        if self.finished:
+            return
+        if not self.started:
+            self.writeStart()
+        self.flush()
+        self.writer.write(b"E" + struct.pack("<QI", score, self.moveCount))
+        self.finished = True
+
+
+class Replay:
+    '''A game read back from a log file, which can rebuild the board at any move'''
+
+    def __init__(self, seed, size, startSpawns):
+        '''Create a replay from the start of game chunk, moves and keyframes are added as they are read'''
+        self.seed = seed
+        self.size = size
+        self.startSpawns = startSpawns
+        self.moves = []
+        self.spawns = []
+        # Keyframes are (move number, score, packed board), the start of the game is always the first one
+        self.keyframes = []
+        self.finalScore = None
+
+        board = 0
+        for cell, exponent in startSpawns:
+            board |= exponent << (4 * cell)
+        self.keyframes.append((0, 0, board))
+
+    def boardAt(self, moveIndex=None):
+        '''Return the (packed board, score) after a number of moves, or after the last move if no number is given.
+        The board is rebuilt from the nearest keyframe before the move, rather than from the start of the game'''
+        if moveIndex is None:
+            moveIndex = len(self.moves)
+        if moveIndex < 0 or moveIndex > len(self.moves):
+            raise IndexError(f"This game only has {len(self.moves)} moves")
+
+        keyframe = self.keyframes[0]
+        for frame in self.keyframes:
+            if frame[0] <= moveIndex:
+                keyframe = frame
+        start, score, board = keyframe
+        return self.playMoves(board, score, start, moveIndex)
+
+    def playMoves(self, board, score, start, end):
+        '''Apply the moves and spawns from start up to end, checking each one is possible'''
+        size = self.size
+        moves = self.moves
+        spawns = self.spawns
+        # 4x4 boards can skip straight to the table driven move
+        if size == (4, 4):
+            move = engine.move
+        else:
+            move = lambda board, direction: engine.moveBoard(board, direction, size)
+
+        for i in range(start, end):
+            board, gained, moved = move(board, moves[i])
+            cell, exponent = spawns[i]
+            shift = 4 * cell
+            if not moved or (board >> shift) & 0xF:
+                raise ReplayError(f"Move {i + 1} is not possible")
+            board |= exponent << shift
+            score += gained
+        return board, score
+
+    def positions(self):
+        '''Yield (packed board, direction) for every move of the game, with the board the move was made on'''
+        board, score = self.keyframes[0][2], 0
+        for i in range(len(self.moves)):
+            yield board, self.moves[i]
+            board, score = self.playMoves(board, score, i, i + 1)
+
+    def verify(self):
+        '''Replay the whole game from the start and check it matches the keyframes and the final score'''
+        board, score, position = self.keyframes[0][2], 0, 0
+        for moveIndex, keyframeScore, keyframeBoard in self.keyframes[1:]:
+            board, score = self.playMoves(board, score, position, moveIndex)
+            position = moveIndex
+            if board != keyframeBoard or score != keyframeScore:
+                return False
+        board, score = self.playMoves(board, score, position, len(self.moves))
+        return self.finalScore is None or score == self.finalScore
+
+
+def readReplays(path):
+    '''Read every game from a log file, returning a list of Replay objects'''
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(header):
+        raise ReplayError(f"{path} is not a replay log")
+
+    replays = []
+    replay = None
+    position = len(header)
+    try:
+        while position < len(data):
+            tag = data[position:position + 1]
+            position += 1
+            if tag == b"G":
+                seed, rows, columns, count = struct.unpack_from("<QBBB", data, position)
+                position += 11
+                size = (rows, columns)
+                length = count * spawnSize(size)
+                replay = Replay(seed, size, decodeSpawns(data[position:position + length], size))
+                replays.append(replay)
+                position += length
+            elif tag == b"M":
+                count = struct.unpack_from("<H", data, position)[0]
+                position += 2
+                moveBytes = (count + 3) // 4
+                replay.moves += decodeMoves(data[position:position + moveBytes], count)
+                position += moveBytes
+                length = count * spawnSize(replay.size)
+                replay.spawns += decodeSpawns(data[position:position + length], replay.size)
+                position += length
+            elif tag == b"K":
+                moveIndex, score = struct.unpack_from("<IQ", data, position)
+                position += 12
+                length = (replay.size[0] * replay.size[1] + 1) // 2
+                replay.keyframes.append((moveIndex, score, int.from_bytes(data[position:position + length], "little")))
+                position += length
+            elif tag == b"E":
+                replay.finalScore = struct.unpack_from("<QI", data, position)[0]
+                position += 12
+            elif tag == b"U":
+                moveIndex = struct.unpack_from("<I", data, position)[0]
+                position += 4
+                # Forget the undone moves, along with any keyframes after them and the end of the game if it had ended
+                del replay.moves[moveIndex:]
+                del replay.spawns[moveIndex:]
+                replay.keyframes = [frame for frame in replay.keyframes if frame[0] <= moveIndex]
+                replay.finalScore = None
+            else:
+                raise ReplayError(f"Unknown chunk at byte {position - 1}")
+    except (struct.error, AttributeError):
+        raise ReplayError(f"{path} is damaged at byte {position}")
+    return replays
+
+
+def countPositions(replays):
+    '''Return (moves, distinct boards, distinct canonical boards) over a list of replays, counting each board size separately'''
+    moves = 0
+    boards = set()
+    canonicalBoards = set()
+    for replay in replays:
+        for board, direction in replay.positions():
+            moves += 1
+            boards.add((replay.size, board))
+            canonicalBoards.add((replay.size, symmetry.canonicalBoard(board, replay.size)))
+    return moves, len(boards), len(canonicalBoards)
+
+
+def writeDataset(replays, path, canonical=True):
+    '''Write every (board, move) from a list of replays to a training data file, returning the number of records written.
+    With canonical set each board is turned into its canonical board and the move along with it, so a position seen in
+    several orientations is only written once'''
+    seen = set()
+    written = 0
+    with open(path, "wb") as f:
+        f.write(datasetHeader)
+        for replay in replays:
+            boardBytes = (replay.size[0] * replay.size[1] + 1) // 2
+            for board, direction in replay.positions():
+                if canonical:
+                    board, transform = symmetry.canonicalize(board, replay.size)
+                    direction = symmetry.transformDirection(direction, transform)
+                key = (replay.size, board, direction)
+                if key in seen:
+                    continue
+                seen.add(key)
+                f.write(datasetRecord.pack(replay.size[0], replay.size[1], direction) + board.to_bytes(boardBytes, "little"))
+                written += 1
+    return written
+
+
+def main():
+    '''Print the games in a log file, showing the board at a move or checking each game is possible'''
+    parser = argparse.ArgumentParser(description="Read back game replay logs")
+    parser.add_argument("path", nargs="?", default="replays.bin", help="replay log to read")
+    parser.add_argument("--game", type=int, default=None, help="only look at this game (counting from 1)")
+    parser.add_argument("--move", type=int, default=None, help="show the board after this many moves")
+    parser.add_argument("--verify", action="store_true", help="replay every game and check its final score")
+    parser.add_argument("--positions", action="store_true", help="count the distinct positions in the games, with and without symmetry")
+    parser.add_argument("--dataset", default=None, help="write each distinct (canonical board, move) in the games to this file")
+    args = parser.parse_args()
+
+    replays = readReplays(args.path)
+    games = range(len(replays)) if args.game is None else [args.game - 1]
+    startTime = time.perf_counter()
+    movesPlayed = 0
+
+    for i in games:
+        replay = replays[i]
+        print(f"Game {i + 1}: {replay.size[0]} x {replay.size[1]}, seed {replay.seed}, {len(replay.moves)} moves, final score {replay.finalScore}")
+        if args.verify:
+            try:
+                print("  Verified" if replay.verify() else "  Final score does not match the moves")
+            except ReplayError as error:
+                print(f"  {error}")
+            movesPlayed += len(replay.moves)
+        if args.move is not None:
+            board, score = replay.boardAt(args.move)
+            values = engine.unpackBoard(board, replay.size)
+            print(f"  Score after move {args.move}: {score}")
+            for row in range(replay.size[0]):
+                print("  " + " ".join(f"{value:5}" for value in values[row * replay.size[1]:(row + 1) * replay.size[1]]))
+
+    if args.verify and movesPlayed:
+        elapsed = time.perf_counter() - startTime
+        print(f"Replayed {movesPlayed} moves at {movesPlayed / elapsed:.0f} moves per second")
+
+    # Positions and datasets cover the same games as everything else
+    selected = [replays[i] for i in games]
+    if args.positions:
+        moves, boards, canonicalBoards = countPositions(selected)
+        print(f"Positions: {moves} moves, {boards} distinct boards, {canonicalBoards} distinct up to symmetry")
+    if args.dataset:
+        written = writeDataset(selected, args.dataset)
+        print(f"Wrote {written} records to {args.dataset}")
+
+
+if __name__ == "__main__":
+    main()
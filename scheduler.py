@@ -0,0 +1,91 @@
+# Event-driven frame scheduler
+# Instead of redrawing at a fixed rate, the game sleeps in pygame.event.wait until there is input to handle.
+# While something is animating the scheduler switches to a fixed frame rate, and goes back to sleeping afterwards.
+# It also keeps track of how long is spent idle and busy, and how long each frame takes.
+
+import time
+from collections import deque
+
+import pygame
+
+
+class FrameScheduler:
+    def __init__(self, frameRate=60, historySize=1000):
+        '''Set up the scheduler, frameRate is only used while animating'''
+        self.frameTime = 1 / frameRate
+        self.animating = False
+        self.frameRequested = True
+
+        # Statistics, frameTimes holds the time spent working on each of the most recent frames
+        self.frameTimes = deque(maxlen=historySize)
+        self.frames = 0
+        self.busyTime = 0.0
+        self.idleTime = 0.0
+        self.lastWake = None
+        self.nextFrame = 0.0
+
+    def setAnimating(self, animating):
+        '''Switch between sleeping until input arrives and running at the fixed frame rate'''
+        if animating and not self.animating:
+            self.nextFrame = time.perf_counter()
+        self.animating = animating
+
+    def requestFrame(self):
+        '''Make the next call to wait return straight away, so the screen can be drawn without waiting for input'''
+        self.frameRequested = True
+
+    def wait(self):
+        '''Sleep until there is something to do, then return a list of every event waiting to be handled'''
+        startTime = time.perf_counter()
+
+        # Everything since the last wait was time spent working on a frame
+        if self.lastWake is not None:
+            self.busyTime += startTime - self.lastWake
+            self.frameTimes.append(startTime - self.lastWake)
+            self.frames += 1
+
+        events = []
+        if self.frameRequested:
+            self.frameRequested = False
+        elif self.animating:
+            # Sleep until the next frame is due, waking early if an event comes in
+            timeout = int((self.nextFrame - startTime) * 1000)
+            if timeout > 0:
+                events.append(pygame.event.wait(timeout))
+            self.nextFrame = max(self.nextFrame + self.frameTime, time.perf_counter())
+        else:
+            # Nothing is happening, so sleep until there is input
+            events.append(pygame.event.wait())
+
+        events = [event for event in events if event.type != pygame.NOEVENT] + pygame.event.get()
+
+        self.lastWake = time.perf_counter()
+        self.idleTime += self.lastWake - startTime
+        return events
+
+    def getStats(self):
+        '''Return the idle and busy ratios and frame time statistics in milliseconds'''
+        totalTime = self.busyTime + self.idleTime
+        frameTimes = sorted(self.frameTimes)
+        stats = {
+            "frames": self.frames,
+            "busyRatio": self.busyTime / totalTime if totalTime > 0 else 0.0,
+            "idleRatio": self.idleTime / totalTime if totalTime > 0 else 0.0,
+            "frameMean": 0.0,
+            "frameP50": 0.0,
+            "frameP99": 0.0,
+            "frameMax": 0.0,
+        }
+        if frameTimes:
+            stats["frameMean"] = sum(frameTimes) / len(frameTimes) * 1000
+            stats["frameP50"] = frameTimes[len(frameTimes) // 2] * 1000
+            stats["frameP99"] = frameTimes[min(len(frameTimes) - 1, int(len(frameTimes) * 0.99))] * 1000
+            stats["frameMax"] = frameTimes[-1] * 1000
+        return stats
+
+    def report(self):
+        '''Return the statistics as a line of text'''
+        stats = self.getStats()
+        return (f"Frames: {stats['frames']}, busy {stats['busyRatio']:.1%}, idle {stats['idleRatio']:.1%}, "
+                f"frame time mean {stats['frameMean']:.2f}ms, p50 {stats['frameP50']:.2f}ms, "
+                f"p99 {stats['frameP99']:.2f}ms, max {stats['frameMax']:.2f}ms")
@@ -0,0 +1,275 @@
+# Headless game server
+# Hosts many games at once in one process, so bots and test harnesses can play without a window. Games use the same
+# engine, spawn streams and undo history as the game itself, and are played over a TCP socket on localhost or a Unix
+# socket. Every game is a session with a bounded history, and sessions that haven't been used for a while are evicted.
+#
+# Requests and responses are small binary messages. A request is a one byte operation, the session id and the payload
+# length, followed by the payload:
+#   N  start a new game: rows, columns and optionally a seed. The session id sent is ignored
+#   M  make a move: one byte direction
+#   B  make a batch of moves: the number of moves, then the directions packed 2 bits per move (as in replay logs)
+#   S  get the state of a game
+#   U  undo the last move
+#   C  close the session
+# A response is a one byte status (K for ok, E for an error), the session id and the payload length, then the payload.
+# Every ok response except C holds the game state: rows, columns, score, moves, flags (bit 0 game over, bit 1 won, bits 4
+# to 7 the legal moves), how many moves the request made, then the packed board in little endian bytes. An error
+# response holds the error message.
+
+import argparse
+import asyncio
+import struct
+import time
+from collections import OrderedDict
+
+import engine
+from history import History
+from replay import decodeMoves
+from spawns import SpawnStream
+
+requestHeader = struct.Struct("<cIH")
+responseHeader = struct.Struct("<cII")
+stateHeader = struct.Struct("<BBQIBH")
+newGameFormat = struct.Struct("<BB")
+seedFormat = struct.Struct("<Q")
+batchFormat = struct.Struct("<H")
+
+
+class ServerError(Exception):
+    '''Raised when a request can't be carried out, the message is sent back to the client'''
+
+
+def packState(session, applied):
+    '''Return the state payload for a session, applied is the number of moves the request made'''
+    board = session.status.board
+    flags = session.status.legal << 4
+    if session.isGameOver:
+        flags |= 1
+    if session.status.hasWon():
+        flags |= 2
+    rows, columns = session.size
+    return stateHeader.pack(rows, columns, session.score, session.moveCount, flags, applied) + board.to_bytes((rows * columns + 1) // 2, "little")
+
+
+def unpackState(data):
+    '''Turn a state payload back into a dictionary, with the board as a packed integer'''
+    rows, columns, score, moveCount, flags, applied = stateHeader.unpack_from(data)
+    return {
+        "size": (rows, columns),
+        "score": score,
+        "moveCount": moveCount,
+        "gameOver": bool(flags & 1),
+        "won": bool(flags & 2),
+        "legal": flags >> 4,
+        "applied": applied,
+        "board": int.from_bytes(data[stateHeader.size:], "little"),
+    }
+
+
+class Session:
+    '''One game hosted by the server, played by the same rules as Board but with nothing to draw'''
+    __slots__ = ("size", "spawns", "status", "history", "score", "moveCount", "isGameOver", "lastUsed")
+
+    def __init__(self, size, seed=None, historyDepth=64):
+        '''Start a game on a board of (rows, columns) with two tiles spawned, keeping up to historyDepth states for undo'''
+        self.size = size
+        # A small block size keeps each session's spawn stream small, the spawns are the same whatever the block size
+        self.spawns = SpawnStream(seed, blockSize=64)
+        self.status = engine.BoardStatus(size)
+        self.history = History(historyDepth)
+        self.score = 0
+        self.moveCount = 0
+        self.isGameOver = False
+        self.lastUsed = time.monotonic()
+
+        board = 0
+        for i in range(2):
+            board = self.spawns.spawn(board, size)[0]
+        self.status.update(board)
+        self.history.reset((board, self.score, self.moveCount))
+
+    def move(self, direction):
+        '''Make a move and spawn a tile, returning False if the move doesn't move anything or the game is over'''
+        if self.isGameOver or not self.status.canMove(direction):
+            return False
+        board, gained, moved = engine.moveBoard(self.status.board, direction, self.size)
+        board = self.spawns.spawn(board, self.size)[0]
+        self.status.update(board)
+        self.score += gained
+        self.moveCount += 1
+        self.isGameOver = self.status.isGameOver()
+        self.history.push((board, self.score, self.moveCount))
+        return True
+
+    def undo(self):
+        '''Go back one move, returning False if there is nothing to undo'''
+        state = self.history.undo()
+        if state is None:
+            return False
+        board, self.score, self.moveCount = state
+        self.status.update(board)
+        self.isGameOver = self.status.isGameOver()
+        return True
+
+
+class GameServer:
+    def __init__(self, maxSessions=10000, maxCells=4096, historyDepth=64, maxBatch=4096, idleTimeout=300):
+        '''Set the limits on the sessions hosted. Each session holds at most historyDepth states on a board of at most
+        maxCells cells, and is evicted once it hasn't been used for idleTimeout seconds'''
+        self.maxSessions = maxSessions
+        self.maxCells = maxCells
+        self.historyDepth = historyDepth
+        self.maxBatch = maxBatch
+        self.idleTimeout = idleTimeout
+        # Sessions in the order they were last used, so the idle ones are always at the start
+        self.sessions = OrderedDict()
+        self.nextId = 1
+        self.movesMade = 0
+        self.requests = 0
+        self.evicted = 0
+
+    def getSession(self, sessionId):
+        '''Return a session and mark it as just used'''
+        session = self.sessions.get(sessionId)
+        if session is None:
+            raise ServerError(f"No session {sessionId}, it may have been closed or evicted")
+        session.lastUsed = time.monotonic()
+        self.sessions.move_to_end(sessionId)
+        return session
+
+    def newSession(self, payload):
+        '''Start a new game from an N request, returning its id'''
+        if len(payload) not in (newGameFormat.size, newGameFormat.size + seedFormat.size):
+            raise ServerError("A new game needs rows, columns and optionally a seed")
+        rows, columns = newGameFormat.unpack_from(payload)
+        seed = seedFormat.unpack_from(payload, newGameFormat.size)[0] if len(payload) > newGameFormat.size else None
+        if rows < 2 or columns < 2 or rows * columns > self.maxCells:
+            raise ServerError(f"Board size must be at least 2 x 2 and at most {self.maxCells} cells")
+
+        # Make room by evicting idle sessions first, only refusing the game if every session is still in use
+        if len(self.sessions) >= self.maxSessions:
+            self.evictIdle()
+            if len(self.sessions) >= self.maxSessions:
+                raise ServerError("Too many sessions")
+
+        sessionId = self.nextId
+        self.nextId += 1
+        self.sessions[sessionId] = Session((rows, columns), seed, self.historyDepth)
+        return sessionId
+
+    def handle(self, operation, sessionId, payload):
+        '''Carry out one request, returning (session id, response payload)'''
+        self.requests += 1
+        if operation == b"N":
+            sessionId = self.newSession(payload)
+            return sessionId, packState(self.sessions[sessionId], 0)
+
+        session = self.getSession(sessionId)
+        if operation == b"M":
+            if len(payload) != 1 or payload[0] > 3:
+                raise ServerError("A move needs one direction from 0 to 3")
+            applied = 1 if session.move(payload[0]) else 0
+        elif operation == b"B":
+            count = batchFormat.unpack_from(payload)[0] if len(payload) >= batchFormat.size else 0
+            if count > self.maxBatch or len(payload) != batchFormat.size + (count + 3) // 4:
+                raise ServerError(f"A batch needs a move count of at most {self.maxBatch} and the packed moves")
+            # Moves that don't move anything are skipped, and the batch stops once the game is over
+            applied = 0
+            for direction in decodeMoves(payload[batchFormat.size:], count):
+                if session.isGameOver:
+                    break
+                if session.move(direction):
+                    applied += 1
+        elif operation == b"S":
+            applied = 0
+        elif operation == b"U":
+            applied = 1 if session.undo() else 0
+        elif operation == b"C":
+            del self.sessions[sessionId]
+            return sessionId, b""
+        else:
+            raise ServerError(f"Unknown operation {operation!r}")
+        self.movesMade += applied
+        return sessionId, packState(session, applied)
+
+    def evictIdle(self):
+        '''Remove every session that hasn't been used for idleTimeout seconds, returning how many were removed'''
+        cutoff = time.monotonic() - self.idleTimeout
+        count = 0
+        # The least recently used sessions are first, so this stops at the first one still in use
+        while self.sessions:
+            sessionId, session = next(iter(self.sessions.items()))
+            if session.lastUsed > cutoff:
+                break
+            del self.sessions[sessionId]
+            count += 1
+        self.evicted += count
+        return count
+
+    async def evictLoop(self):
+        '''Evict idle sessions every few seconds'''
+        while True:
+            await asyncio.sleep(max(1, self.idleTimeout / 10))
+            self.evictIdle()
+
+    async def serveClient(self, reader, writer):
+        '''Answer requests from one connection until it closes. Requests are answered in the order they arrive, so a client
+        can send many requests before reading the responses'''
+        try:
+            while True:
+                operation, sessionId, length = requestHeader.unpack(await reader.readexactly(requestHeader.size))
+                payload = await reader.readexactly(length) if length > 0 else b""
+                try:
+                    sessionId, response = self.handle(operation, sessionId, payload)
+                    writer.write(responseHeader.pack(b"K", sessionId, len(response)) + response)
+                except ServerError as error:
+                    message = str(error).encode()
+                    writer.write(responseHeader.pack(b"E", sessionId, len(message)) + message)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def report(self):
+        '''Return a one line summary of the sessions and requests handled'''
+        return f"Sessions: {len(self.sessions)}, requests: {self.requests}, moves: {self.movesMade}, evicted: {self.evicted}"
+
+
+async def serve(server, host="127.0.0.1", port=2048, path=None):
+    '''Run the server on a TCP port on localhost, or on a Unix socket if a path is given, until it is cancelled'''
+    if path:
+        listener = await asyncio.start_unix_server(server.serveClient, path)
+    else:
+        listener = await asyncio.start_server(server.serveClient, host, port)
+    evictTask = asyncio.create_task(server.evictLoop())
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        evictTask.cancel()
+
+
+def main():
+    '''Run the server from the command line until it is stopped with Ctrl+C'''
+    parser = argparse.ArgumentParser(description="Host many headless games over a local socket")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on, only localhost is intended")
+    parser.add_argument("--port", type=int, default=2048, help="TCP port to listen on")
+    parser.add_argument("--unix", default=None, help="listen on this Unix socket path instead of a TCP port")
+    parser.add_argument("--sessions", type=int, default=10000, help="most sessions hosted at once")
+    parser.add_argument("--max-cells", type=int, default=4096, help="most cells on a board, 4096 allows 64 x 64")
+    parser.add_argument("--history", type=int, default=64, help="states kept by each session for undo")
+    parser.add_argument("--idle", type=float, default=300, help="seconds a session can go unused before it is evicted")
+    args = parser.parse_args()
+
+    server = GameServer(args.sessions, args.max_cells, args.history, idleTimeout=args.idle)
+    print(f"Serving on {args.unix or f'{args.host}:{args.port}'}")
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    print(server.report())
+
+
+if __name__ == "__main__":
+    main()
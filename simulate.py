@@ -0,0 +1,227 @@
+# Headless self-play simulator
+# Plays complete games with a chosen policy across a pool of worker processes, streaming each result back
+# to the parent as soon as the game finishes. Each game is seeded from the base seed and its game number,
+# so a run gives the same results no matter how many workers are used or which worker plays which game.
+# The parent only keeps running counts of the results rather than the results themselves, so a run of any length fits in memory.
+
+import argparse
+import json
+import math
+import multiprocessing
+import time
+from collections import Counter
+from random import Random
+
+import engine
+import solver
+from spawns import SpawnStream
+
+policyNames = ["random", "greedy", "corner", "expectimax"]
+
+# The order the corner policy tries moves in, this keeps the largest tiles in the bottom left corner
+cornerOrder = (engine.DOWN, engine.LEFT, engine.RIGHT, engine.UP)
+
+
+def legalMoves(board, size):
+    '''Return a list of (direction, new board, score gained) for every move that changes the board'''
+    moves = []
+    for direction in (engine.UP, engine.RIGHT, engine.DOWN, engine.LEFT):
+        newBoard, gained, moved = engine.moveBoard(board, direction, size)
+        if moved:
+            moves.append((direction, newBoard, gained))
+    return moves
+
+
+def makePolicy(name, size, rng, timeLimit=10):
+    '''Return a function which takes a packed board and returns a direction, or None if there are no moves'''
+    if name == "random":
+        # Only the legal moves are needed, not the boards they lead to, so read them from the line tables
+        def policy(board):
+            legal = engine.boardStatus(board, size)[0]
+            moves = [direction for direction in (engine.UP, engine.RIGHT, engine.DOWN, engine.LEFT) if (legal >> direction) & 1]
+            return moves[rng.randrange(len(moves))] if moves else None
+
+    elif name == "greedy":
+        # Take the move which scores the most, using the number of empty cells to break ties
+        def policy(board):
+            best = None
+            bestKey = None
+            for direction, newBoard, gained in legalMoves(board, size):
+                key = (gained, len(engine.emptyCells(newBoard, size)))
+                if bestKey is None or key > bestKey:
+                    best = direction
+                    bestKey = key
+            return best
+
+    elif name == "corner":
+        def policy(board):
+            legal = engine.boardStatus(board, size)[0]
+            for direction in cornerOrder:
+                if (legal >> direction) & 1:
+                    return direction
+            return None
+
+    elif name == "expectimax":
+        ai = solver.Solver(size, timeLimit=timeLimit)
+        policy = ai.bestMove
+
+    else:
+        raise ValueError(f"Unknown policy: {name}")
+    return policy
+
+
+def gameSeed(seed, index):
+    '''Return the seed for one game, worked out from the base seed and the game number. Both are hashed together, so
+    runs with different base seeds never share games however many games they play'''
+    return Random(f"{seed} {index}").getrandbits(63)
+
+
+def playGame(policy, size, spawns):
+    '''Play one game to the end, drawing the spawns from a SpawnStream. Returns the score, the max tile and the number of moves'''
+    board = 0
+    score = 0
+    moves = 0
+    for i in range(2):
+        board = spawns.spawn(board, size)[0]
+
+    while True:
+        direction = policy(board)
+        if direction is None:
+            break
+        board, gained, moved = engine.moveBoard(board, direction, size)
+        score += gained
+        moves += 1
+        board = spawns.spawn(board, size)[0]
+    return score, engine.maxTile(board, size), moves
+
+
+# Settings for the current worker process, set once by initWorker so they aren't sent with every game
+workerSettings = None
+
+
+def initWorker(policyName, size, seed, timeLimit):
+    '''Store the settings for this worker process'''
+    global workerSettings
+    workerSettings = (policyName, tuple(size), seed, timeLimit)
+
+
+def runGame(index):
+    '''Play game number index in a worker, returning a tuple of (index, score, max tile, moves, wall time)'''
+    policyName, size, seed, timeLimit = workerSettings
+    # The spawns and the random policy get separate generators, so changing the policy doesn't change the spawns
+    spawns = SpawnStream(gameSeed(seed, index))
+    policy = makePolicy(policyName, size, Random(f"policy {spawns.seed}"), timeLimit)
+
+    startTime = time.perf_counter()
+    score, tile, moves = playGame(policy, size, spawns)
+    return index, score, tile, moves, time.perf_counter() - startTime
+
+
+def simulate(games, policyName="random", size=(4, 4), seed=0, workers=None, timeLimit=10, chunkSize=None):
+    '''Play games across a process pool, yielding a result dictionary for each game as it finishes'''
+    if policyName not in policyNames:
+        raise ValueError(f"Unknown policy: {policyName}")
+    workers = workers or multiprocessing.cpu_count()
+
+    # Send games to the workers in chunks, so the cost of talking to the pool is spread over several games
+    if chunkSize is None:
+        chunkSize = max(1, min(64, games // (workers * 8)))
+
+    with multiprocessing.Pool(workers, initializer=initWorker, initargs=(policyName, size, seed, timeLimit)) as pool:
+        for index, score, tile, moves, wallTime in pool.imap_unordered(runGame, range(games), chunkSize):
+            yield {"game": index, "seed": gameSeed(seed, index), "score": score, "maxTile": tile, "moves": moves, "time": wallTime}
+
+
+class ResultCounts:
+    '''Running counts of game results, so the statistics for a run don't need every result kept in memory'''
+
+    def __init__(self):
+        '''Start with no games counted'''
+        self.games = 0
+        self.moves = 0
+        # How many games ended on each score and on each max tile. Scores repeat often, so these stay small however many games are played
+        self.scores = Counter()
+        self.maxTiles = Counter()
+
+    def add(self, result):
+        '''Count one game result'''
+        self.games += 1
+        self.moves += result["moves"]
+        self.scores[result["score"]] += 1
+        self.maxTiles[result["maxTile"]] += 1
+
+
+def percentile(sortedCounts, total, fraction):
+    '''Return the value at a fraction (0 to 1) of the way through a sorted list of (value, count) pairs holding total values'''
+    position = min(total - 1, int(fraction * total))
+    for value, count in sortedCounts:
+        if position < count:
+            return value
+        position -= count
+    return sortedCounts[-1][0]
+
+
+def summarize(counts, wallTime):
+    '''Work out throughput and distribution statistics from the ResultCounts of a run. With no games there is no
+    distribution, so only the game count and the time are returned'''
+    games = counts.games
+    if games == 0:
+        return {"games": 0, "wallTime": wallTime, "gamesPerSecond": 0.0, "movesPerSecond": 0.0}
+    scores = sorted(counts.scores.items())
+    mean = sum(score * count for score, count in scores) / games
+    variance = sum(count * (score - mean) ** 2 for score, count in scores) / games
+
+    return {
+        "games": games,
+        "wallTime": wallTime,
+        "gamesPerSecond": games / wallTime if wallTime > 0 else 0.0,
+        "movesPerSecond": counts.moves / wallTime if wallTime > 0 else 0.0,
+        "scoreMean": mean,
+        "scoreStdev": math.sqrt(variance),
+        "scoreMin": scores[0][0],
+        "scoreMedian": percentile(scores, games, 0.5),
+        "scoreP90": percentile(scores, games, 0.9),
+        "scoreP99": percentile(scores, games, 0.99),
+        "scoreMax": scores[-1][0],
+        "movesMean": counts.moves / games,
+        "maxTiles": dict(sorted(counts.maxTiles.items())),
+    }
+
+
+def main():
+    '''Run a simulation from the command line and print a summary'''
+    parser = argparse.ArgumentParser(description="Play many headless games with a policy across all CPU cores")
+    parser.add_argument("games", type=int, help="number of games to play")
+    parser.add_argument("--policy", choices=policyNames, default="random", help="policy used to pick moves")
+    parser.add_argument("--size", type=int, default=4, help="width and height of the board")
+    parser.add_argument("--seed", type=int, default=0, help="base seed, each game is seeded from this and its number")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes, defaults to the CPU count")
+    parser.add_argument("--time", type=int, default=10, help="time budget per move for the expectimax policy, in milliseconds")
+    parser.add_argument("--output", default=None, help="file to write each game result to, one JSON object per line")
+    args = parser.parse_args()
+
+    counts = ResultCounts()
+    output = open(args.output, "w") if args.output else None
+    startTime = time.perf_counter()
+    try:
+        for result in simulate(args.games, args.policy, (args.size, args.size), args.seed, args.workers, args.time):
+            counts.add(result)
+            if output:
+                output.write(json.dumps(result) + "\n")
+    finally:
+        if output:
+            output.close()
+
+    summary = summarize(counts, time.perf_counter() - startTime)
+    if summary["games"] == 0:
+        print("Games: 0, nothing to summarize")
+        return
+    print(f"Games: {summary['games']} in {summary['wallTime']:.2f}s ({summary['gamesPerSecond']:.1f} games/s, {summary['movesPerSecond']:.0f} moves/s)")
+    print(f"Score: mean {summary['scoreMean']:.1f}, stdev {summary['scoreStdev']:.1f}, min {summary['scoreMin']}, "
+          f"median {summary['scoreMedian']}, p90 {summary['scoreP90']}, p99 {summary['scoreP99']}, max {summary['scoreMax']}")
+    print(f"Moves per game: {summary['movesMean']:.1f}")
+    print("Max tiles: " + ", ".join(f"{tile}: {count}" for tile, count in summary["maxTiles"].items()))
+
+
+if __name__ == "__main__":
+    main()
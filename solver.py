@@ -0,0 +1,253 @@
+# Expectimax AI player for the game
+# The search runs on packed boards from engine.py, so it doesn't need pygame and can be used headless.
+# Player moves are max nodes, the random 2/4 spawns are chance nodes, and leaves are scored with a heuristic.
+
+import argparse
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import engine
+import symmetry
+from spawns import SpawnStream
+
+# Heuristic weights, a line scores well when it has empty cells and merges available and is monotonic
+lostPenalty = 200000.0
+emptyWeight = 270.0
+mergesWeight = 700.0
+monotonicityPower = 4.0
+monotonicityWeight = 47.0
+sumPower = 3.5
+sumWeight = 11.0
+
+# The chance of each spawn, a 2 tile (exponent 1) 90% of the time and a 4 tile (exponent 2) 10% of the time
+spawnChances = ((1, 0.9), (2, 0.1))
+
+
+class SearchTimeout(Exception):
+    '''Raised inside the search when the time budget for a move has run out'''
+
+
+@lru_cache(maxsize=1 << 17)
+def lineHeuristic(line, width):
+    '''Score a single packed line, rows and columns are scored the same way'''
+    cells = engine.unpackLine(line, width)
+    empty = 0
+    merges = 0
+    total = 0.0
+    previous = 0
+    counter = 0
+
+    for exponent in cells:
+        total += exponent ** sumPower
+        if exponent == 0:
+            empty += 1
+        else:
+            # Count runs of equal tiles, since each run can be merged
+            if previous == exponent:
+                counter += 1
+            elif counter > 0:
+                merges += 1 + counter
+                counter = 0
+            previous = exponent
+    if counter > 0:
+        merges += 1 + counter
+
+    # Penalise lines which go up and down, rather than increasing towards one side
+    monotonicityLeft = 0.0
+    monotonicityRight = 0.0
+    for i in range(1, width):
+        if cells[i - 1] > cells[i]:
+            monotonicityLeft += cells[i - 1] ** monotonicityPower - cells[i] ** monotonicityPower
+        else:
+            monotonicityRight += cells[i] ** monotonicityPower - cells[i - 1] ** monotonicityPower
+
+    return (lostPenalty + emptyWeight * empty + mergesWeight * merges
+            - monotonicityWeight * min(monotonicityLeft, monotonicityRight) - sumWeight * total)
+
+
+def evaluate(board, size):
+    '''Score a packed board by adding up the heuristic for every row and every column'''
+    rows, columns = size
+    value = 0.0
+    for line in engine.getRows(board, size):
+        value += lineHeuristic(line, columns)
+    for line in engine.getRows(engine.transposeBoard(board, size), (columns, rows)):
+        value += lineHeuristic(line, rows)
+    return value
+
+
+class Solver:
+    '''Picks moves with an iteratively deepened expectimax search, within a time budget per move'''
+
+    def __init__(self, size=(4, 4), timeLimit=100, maxDepth=8, tableSize=500000, probabilityCutoff=0.0001, symmetric=False):
+        '''Set up the search settings. timeLimit is in milliseconds, symmetric shares table entries between symmetric boards'''
+        self.size = tuple(size)
+        self.cells = self.size[0] * self.size[1]
+        self.timeLimit = timeLimit
+        self.maxDepth = maxDepth
+        self.tableSize = tableSize
+        self.probabilityCutoff = probabilityCutoff
+        # The time is checked every checkMask + 1 nodes, a node costs more on a bigger board so it is checked more often.
+        # 4x4 boards check every 1024 nodes, and the biggest boards every node
+        self.checkMask = (1 << max(0, min(10, (16384 // self.cells).bit_length() - 1))) - 1
+
+        # The transposition table maps a (board, depth) to its value, the oldest entries are evicted first. The value of a
+        # board doesn't change when it is turned or flipped, so with symmetric set every copy of a position is stored under
+        # its canonical board. That saves entries, but symmetric copies rarely meet in one search, so it is off by default
+        self.table = OrderedDict()
+        self.symmetric = symmetric
+
+        # Statistics, used to report how deep and how fast the search has been
+        self.lastDepth = 0
+        self.movesSearched = 0
+        self.totalDepth = 0
+        self.totalTime = 0.0
+        self.nodes = 0
+        self.tableHits = 0
+
+    def getStats(self):
+        '''Return a dictionary of search statistics, averaged over every move searched so far'''
+        moves = max(self.movesSearched, 1)
+        return {
+            "moves": self.movesSearched,
+            "movesPerSecond": self.movesSearched / self.totalTime if self.totalTime > 0 else 0.0,
+            "averageDepth": self.totalDepth / moves,
+            "lastDepth": self.lastDepth,
+            "nodes": self.nodes,
+            "tableHits": self.tableHits,
+            "tableEntries": len(self.table),
+        }
+
+    def bestMove(self, board):
+        '''Return the best direction for a packed board, or None if no move is possible'''
+        startTime = time.perf_counter()
+        self.deadline = startTime + self.timeLimit / 1000
+
+        # Only consider moves that actually change the board
+        moves = []
+        for direction in (engine.UP, engine.RIGHT, engine.DOWN, engine.LEFT):
+            newBoard, gained, moved = engine.moveBoard(board, direction, self.size)
+            if moved:
+                moves.append((direction, newBoard))
+        if len(moves) == 0:
+            return None
+
+        best = moves[0][0]
+        self.lastDepth = 0
+        if len(moves) > 1:
+            # Search one level deeper each time, keeping the result of the deepest search that finished in time
+            for depth in range(1, self.maxDepth + 1):
+                try:
+                    best = self.searchRoot(moves, depth)
+                    self.lastDepth = depth
+                except SearchTimeout:
+                    break
+                if time.perf_counter() >= self.deadline:
+                    break
+
+        self.movesSearched += 1
+        self.totalDepth += self.lastDepth
+        self.totalTime += time.perf_counter() - startTime
+        return best
+
+    def searchRoot(self, moves, depth):
+        '''Return the direction with the highest expected value at the given depth'''
+        bestValue = -1.0
+        best = moves[0][0]
+        for direction, newBoard in moves:
+            value = self.chanceNode(newBoard, depth, 1.0)
+            if value > bestValue:
+                bestValue = value
+                best = direction
+        return best
+
+    def maxNode(self, board, depth, probability):
+        '''Return the value of the best move from this board, a board with no moves is worth nothing'''
+        best = 0.0
+        for direction in (engine.UP, engine.RIGHT, engine.DOWN, engine.LEFT):
+            newBoard, gained, moved = engine.moveBoard(board, direction, self.size)
+            if moved:
+                value = self.chanceNode(newBoard, depth, probability)
+                if value > best:
+                    best = value
+        return best
+
+    def chanceNode(self, board, depth, probability):
+        '''Return the expected value of a board over every tile that could spawn on it'''
+        self.nodes += 1
+        if self.nodes & self.checkMask == 0 and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+        # Stop searching when the depth runs out, or when this position is too unlikely to matter
+        if depth <= 0 or probability < self.probabilityCutoff:
+            return evaluate(board, self.size)
+
+        key = (symmetry.canonicalBoard(board, self.size) if self.symmetric else board, depth)
+        if key in self.table:
+            self.tableHits += 1
+            self.table.move_to_end(key)
+            return self.table[key]
+
+        empty = engine.emptyCells(board, self.size)
+        if len(empty) == 0:
+            return evaluate(board, self.size)
+
+        value = 0.0
+        for cell in empty:
+            shift = 4 * cell
+            for exponent, chance in spawnChances:
+                value += chance * self.maxNode(board | (exponent << shift), depth - 1, probability * chance / len(empty))
+        value /= len(empty)
+
+        self.table[key] = value
+        if len(self.table) > self.tableSize:
+            self.table.popitem(last=False)
+        return value
+
+
+def playGame(solver, seed=None):
+    '''Play a full game with the solver, without a window. Returns the score, the max tile and the number of moves'''
+    spawns = SpawnStream(seed)
+    board = 0
+    score = 0
+    moves = 0
+    for i in range(2):
+        board = spawns.spawn(board, solver.size)[0]
+
+    while True:
+        direction = solver.bestMove(board)
+        if direction is None:
+            break
+        board, gained, moved = engine.moveBoard(board, direction, solver.size)
+        score += gained
+        moves += 1
+        board = spawns.spawn(board, solver.size)[0]
+    return score, engine.maxTile(board, solver.size), moves
+
+
+def main():
+    '''Play games headless with the solver and print the results and search statistics'''
+    parser = argparse.ArgumentParser(description="Play games with the expectimax AI, without opening a window")
+    parser.add_argument("--games", type=int, default=1, help="number of games to play")
+    parser.add_argument("--size", type=int, default=4, help="width and height of the board")
+    parser.add_argument("--time", type=int, default=50, help="time budget per move in milliseconds")
+    parser.add_argument("--depth", type=int, default=8, help="maximum search depth")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the tile spawns")
+    parser.add_argument("--symmetric", action="store_true", help="share transposition table entries between symmetric boards")
+    args = parser.parse_args()
+
+    solver = Solver((args.size, args.size), timeLimit=args.time, maxDepth=args.depth, symmetric=args.symmetric)
+    for game in range(args.games):
+        seed = None if args.seed is None else args.seed + game
+        score, tile, moves = playGame(solver, seed)
+        print(f"Game {game + 1}: score {score}, max tile {tile}, moves {moves}")
+
+    stats = solver.getStats()
+    print(f"Moves per second: {stats['movesPerSecond']:.1f}")
+    print(f"Average depth: {stats['averageDepth']:.2f}")
+    print(f"Nodes searched: {stats['nodes']}, table hits: {stats['tableHits']} ({stats['tableHits'] / max(stats['nodes'], 1):.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Spawn random number streams
+# Every game draws its spawns from its own SpawnStream, created from an explicit seed, so a game (or a simulator
+# worker) never shares random numbers with anything else and can be played again exactly from its seed.
+# Spawn decisions are generated in blocks: one getrandbits call fills an array with the random numbers for a whole
+# block of spawns, so each spawn only costs a couple of array reads. The numbers drawn only depend on the seed and
+# how many spawns have been taken, never on how they were taken, so single spawns and bulk arrays give the same game.
+
+import sys
+from array import array
+from random import Random
+
+import engine
+
+# A 4 is spawned when the exponent draw is below this, which is 10% of the 32 bit range
+fourThreshold = (1 << 32) // 10
+
+
+def randomSeed():
+    '''Return a new seed, for games that weren't given one'''
+    return Random().getrandbits(63)
+
+
+class SpawnStream:
+    '''The spawn decisions for one game. Each decision is a pair of 32 bit random numbers, one picks which empty cell is used
+    and the other picks between a 2 (90%) and a 4 (10%)'''
+
+    def __init__(self, seed=None, blockSize=1024):
+        '''Start a stream from a seed, or from a random seed if none is given'''
+        self.seed = seed if seed is not None else randomSeed()
+        self.blockSize = blockSize
+        self.random = Random(self.seed)
+        self.cellDraws = array("I")
+        self.exponentDraws = array("I")
+        # Starting at the end of an empty block makes the first spawn generate a block
+        self.position = blockSize
+        # The number of blocks generated, used along with position to save and restore the stream
+        self.blocks = 0
+
+    def refill(self):
+        '''Generate the random numbers for the next block of spawns. The numbers alternate between cell and exponent draws,
+        so the stream is the same whatever the block size'''
+        draws = array("I")
+        draws.frombytes(self.random.getrandbits(64 * self.blockSize).to_bytes(8 * self.blockSize, "little"))
+        if sys.byteorder == "big":
+            draws.byteswap()
+        self.cellDraws = draws[0::2]
+        self.exponentDraws = draws[1::2]
+        self.position = 0
+        self.blocks += 1
+
+    def next(self, emptyCount):
+        '''Return (index of the empty cell to use, exponent) for the next spawn on a board with emptyCount empty cells'''
+        if self.position == self.blockSize:
+            self.refill()
+        position = self.position
+        self.position += 1
+        exponent = 2 if self.exponentDraws[position] < fourThreshold else 1
+        # Scale the 32 bit number down to the number of empty cells, which avoids a division
+        return (self.cellDraws[position] * emptyCount) >> 32, exponent
+
+    def spawn(self, board, size):
+        '''Place the next spawn on a packed board, returning (new board, cell, exponent). The cell is None if the board is full'''
+        empty = engine.emptyCells(board, size)
+        if len(empty) == 0:
+            return board, None, 0
+        index, exponent = self.next(len(empty))
+        cell = empty[index]
+        return board | (exponent << (4 * cell)), cell, exponent
+
+    def take(self, count):
+        '''Take the next count spawn decisions in bulk, returning (cell draws, exponents). A cell draw is turned into the index
+        of an empty cell with (draw * emptyCount) >> 32, exactly as next does'''
+        cellDraws = array("I")
+        exponentDraws = array("I")
+        while len(cellDraws) < count:
+            if self.position == self.blockSize:
+                self.refill()
+            end = min(self.blockSize, self.position + count - len(cellDraws))
+            cellDraws += self.cellDraws[self.position:end]
+            exponentDraws += self.exponentDraws[self.position:end]
+            self.position = end
+        return cellDraws, bytes(2 if draw < fourThreshold else 1 for draw in exponentDraws)
+
+    def getState(self):
+        '''Return the seed and how far through the stream this is, which setState can use to carry on from the same place'''
+        return self.seed, self.blockSize, self.blocks, self.position
+
+    def setState(self, state):
+        '''Carry on from a state returned by getState, by generating the same blocks again from the seed'''
+        self.seed, self.blockSize, blocks, position = state
+        self.random = Random(self.seed)
+        self.blocks = 0
+        self.position = self.blockSize
+        for i in range(blocks):
+            self.refill()
+        self.position = position
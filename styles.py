@@ -0,0 +1,61 @@
+# Tile styles
+# How a tile looks only depends on its exponent (0 for an empty cell, 1 for a 2 tile, ...) and the size it is drawn at, so
+# the colours and font sizes are kept in tables indexed by exponent, and each tile is rendered once per size. Drawing a
+# cell is then a list lookup, with no comparisons and nothing stored per cell.
+
+import pygame
+
+from assets import assets
+from viewport import maxTileSize
+
+# Tables cover tiles up to 131072, the largest a 4 x 4 board can reach
+styleCount = 18
+
+# The colour of the board behind the tiles
+boardColor = (186, 173, 160)
+
+# Background colours up to 2048, every larger tile is dark
+tileColors = [
+    (205, 193, 181), (238, 228, 218), (236, 224, 200), (242, 177, 121), (245, 149, 99), (246, 124, 96),
+    (246, 94, 59), (237, 207, 115), (237, 204, 98), (237, 200, 80), (237, 197, 63), (237, 194, 45),
+] + [(61, 58, 51)] * (styleCount - 12)
+
+# Dark text on the 2 and 4 tiles, light text on everything else
+fontColors = [(119, 110, 101)] * 3 + [(247, 248, 242)] * (styleCount - 3)
+
+# Font sizes on a full size (maxTileSize) tile, smaller for tiles with more digits
+fontSizes = [50] * 7 + [40] * 3 + [30] * 4 + [25] * (styleCount - 14)
+
+# Lists of rendered tiles indexed by exponent, by tile size in pixels
+surfaceTables = {}
+
+
+def getValue(exponent):
+    '''Return the tile value for an exponent, 0 for an empty cell'''
+    return 1 << exponent if exponent > 0 else 0
+
+
+def getFontSize(exponent, tileSize):
+    '''Return the font size for a tile, scaled down along with smaller tiles'''
+    return max(1, fontSizes[exponent] * tileSize // maxTileSize)
+
+
+def renderTile(exponent, tileSize):
+    '''Render a tile of the size given, with its value in the middle unless it is empty'''
+    # Fill the surface with the board colour first, so the rounded corners blend into the board
+    surface = pygame.Surface((tileSize, tileSize))
+    surface.fill(boardColor)
+    pygame.draw.rect(surface, tileColors[exponent], (0, 0, tileSize, tileSize), border_radius=3)
+    if exponent > 0:
+        textSurface = assets.text(str(getValue(exponent)), getFontSize(exponent, tileSize), fontColors[exponent])
+        surface.blit(textSurface, textSurface.get_rect(center=(tileSize / 2, tileSize / 2)))
+    return surface
+
+
+def getSurfaces(tileSize):
+    '''Return the rendered tile for every exponent at the size given, rendering them the first time that size is used'''
+    surfaces = surfaceTables.get(tileSize)
+    if surfaces is None:
+        surfaces = [renderTile(exponent, tileSize) for exponent in range(styleCount)]
+        surfaceTables[tileSize] = surfaces
+    return surfaces
@@ -0,0 +1,186 @@
+# Board symmetries
+# Turning or flipping a board doesn't change how good it is, so the up to 8 copies of a position (4 rotations, each of
+# them flipped or not) can share one entry in a search cache or a dataset. canonicalize picks one copy of each position
+# to stand for all of them, the smallest packed board, and says which transform gives it so moves can be mapped across.
+#
+# A transform is a number from 0 to 7 made of 3 steps, done in this order: bit 2 transposes the board (rows become
+# columns), bit 0 flips it left to right and bit 1 flips it top to bottom. Each step undoes itself, so the inverse of a
+# transform is the same steps in the opposite order. Boards that aren't square can't be transposed, so they only have
+# transforms 0 to 3. On 4x4 boards the steps are done on the packed board, with a table of every row reversed for the left
+# to right flips, on other sizes each transform is a precomputed permutation of the board's hex digits (one digit per cell).
+
+from functools import lru_cache
+from operator import itemgetter
+
+import engine
+
+transformCount = 8
+flipColumns = 1
+flipRows = 2
+transposeCells = 4
+
+# Every 16 bit row of a 4x4 board with its cells in the opposite order
+reversedRows = [(row & 0xF) << 12 | (row >> 4 & 0xF) << 8 | (row >> 8 & 0xF) << 4 | row >> 12 for row in range(1 << 16)]
+
+# How each step changes a direction, as a (row, column) step
+directionSteps = {engine.UP: (-1, 0), engine.RIGHT: (0, 1), engine.DOWN: (1, 0), engine.LEFT: (0, -1)}
+
+
+def transformStep(transform, row, column, rows, columns):
+    '''Return where the (row, column) step or cell ends up after a transform, for a board of rows x columns (cells) or 1 x 1 (steps)'''
+    if transform & transposeCells:
+        row, column = column, row
+        rows, columns = columns, rows
+    if transform & flipColumns:
+        column = columns - 1 - column
+    if transform & flipRows:
+        row = rows - 1 - row
+    return row, column
+
+
+def buildDirectionTables():
+    '''Return, for each transform, the direction each move becomes on the transformed board, and the direction each move on
+    the transformed board was on the original'''
+    stepDirections = {step: direction for direction, step in directionSteps.items()}
+    forward = []
+    inverse = []
+    for transform in range(transformCount):
+        # A step keeps its size, so it flips about 0 rather than about the middle of a board
+        mapped = []
+        for direction in range(4):
+            row, column = directionSteps[direction]
+            if transform & transposeCells:
+                row, column = column, row
+            if transform & flipColumns:
+                column = -column
+            if transform & flipRows:
+                row = -row
+            mapped.append(stepDirections[(row, column)])
+        forward.append(mapped)
+        backward = [0] * 4
+        for direction in range(4):
+            backward[mapped[direction]] = direction
+        inverse.append(backward)
+    return forward, inverse
+
+
+transformDirections, inverseDirections = buildDirectionTables()
+
+
+def transformDirection(direction, transform):
+    '''Return the direction on the transformed board that matches a direction on the original board'''
+    return transformDirections[transform][direction]
+
+
+def inverseDirection(direction, transform):
+    '''Return the direction on the original board that matches a direction on the transformed board'''
+    return inverseDirections[transform][direction]
+
+
+def getTransforms(size):
+    '''Return the transforms a board of (rows, columns) has, all 8 if it is square and the 4 flips otherwise'''
+    return range(transformCount) if size[0] == size[1] else range(transposeCells)
+
+
+@lru_cache(maxsize=None)
+def getDigitGetters(size):
+    '''Return a function for each transform which picks a board's hex digits (one per cell, the last cell first) in their
+    transformed order'''
+    rows, columns = size
+    cells = rows * columns
+    getters = []
+    for transform in getTransforms(size):
+        # source[cell] is the cell of the original board that ends up in cell on the transformed board
+        source = [0] * cells
+        for row in range(rows):
+            for column in range(columns):
+                newRow, newColumn = transformStep(transform, row, column, rows, columns)
+                source[newRow * columns + newColumn] = row * columns + column
+        getters.append(itemgetter(*[cells - 1 - source[cells - 1 - digit] for digit in range(cells)]))
+    return getters
+
+
+def flipColumns4(board):
+    '''Flip a packed 4x4 board left to right'''
+    return (reversedRows[board & 0xFFFF] | reversedRows[board >> 16 & 0xFFFF] << 16
+            | reversedRows[board >> 32 & 0xFFFF] << 32 | reversedRows[board >> 48] << 48)
+
+
+def flipRows4(board):
+    '''Flip a packed 4x4 board top to bottom'''
+    # Swap the rows in each pair, then swap the pairs
+    board = ((board & 0x0000FFFF0000FFFF) << 16) | ((board >> 16) & 0x0000FFFF0000FFFF)
+    return ((board & 0x00000000FFFFFFFF) << 32) | (board >> 32)
+
+
+def getVariants4(board):
+    '''Return a packed 4x4 board under each of the 8 transforms, in transform order'''
+    variants = []
+    for start in (board, engine.transpose(board)):
+        # Each flip only moves whole rows or reverses them, so all 4 are built from the same rows
+        row0 = start & 0xFFFF
+        row1 = start >> 16 & 0xFFFF
+        row2 = start >> 32 & 0xFFFF
+        row3 = start >> 48
+        reversed0 = reversedRows[row0]
+        reversed1 = reversedRows[row1]
+        reversed2 = reversedRows[row2]
+        reversed3 = reversedRows[row3]
+        variants += [
+            start,
+            reversed0 | reversed1 << 16 | reversed2 << 32 | reversed3 << 48,
+            row3 | row2 << 16 | row1 << 32 | row0 << 48,
+            reversed3 | reversed2 << 16 | reversed1 << 32 | reversed0 << 48,
+        ]
+    return variants
+
+
+def getVariants(board, size):
+    '''Return a packed board under each of its transforms, in transform order'''
+    if size == (4, 4):
+        return getVariants4(board)
+    digits = f"{board:0{size[0] * size[1]}x}"
+    return [int("".join(getter(digits)), 16) for getter in getDigitGetters(tuple(size))]
+
+
+def applyTransform(board, transform, size):
+    '''Return a packed board after a transform'''
+    if size == (4, 4):
+        if transform & transposeCells:
+            board = engine.transpose(board)
+        if transform & flipColumns:
+            board = flipColumns4(board)
+        if transform & flipRows:
+            board = flipRows4(board)
+        return board
+    return int("".join(getDigitGetters(tuple(size))[transform](f"{board:0{size[0] * size[1]}x}")), 16)
+
+
+def invertTransform(board, transform, size):
+    '''Return a transformed packed board as it was before the transform'''
+    # Each step undoes itself, so doing them in the opposite order undoes the whole transform
+    if size == (4, 4):
+        if transform & flipRows:
+            board = flipRows4(board)
+        if transform & flipColumns:
+            board = flipColumns4(board)
+        if transform & transposeCells:
+            board = engine.transpose(board)
+        return board
+    for step in (flipRows, flipColumns, transposeCells):
+        if transform & step:
+            board = applyTransform(board, step, size)
+    return board
+
+
+def canonicalize(board, size):
+    '''Return (canonical board, transform), where the canonical board is the smallest of the board's variants and is the
+    same for every variant, and transform turns the board given into it'''
+    variants = getVariants(board, size)
+    canonical = min(variants)
+    return canonical, variants.index(canonical)
+
+
+def canonicalBoard(board, size):
+    '''Return just the canonical board, for use as a cache or dataset key'''
+    return min(getVariants(board, size))
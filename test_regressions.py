@@ -0,0 +1,282 @@
+# Regression tests
+# Checks the move tables against a plain Python slide, the batch engine against the scalar engine, and the byte level
+# formats of the replay logs and leaderboard files, so a change to any of them can't go unnoticed. Run with pytest.
+
+import pickle
+import struct
+from random import Random
+
+import numpy as np
+import pytest
+
+import batch
+import engine
+import leaderboard
+import replay
+from spawns import SpawnStream
+
+# Sizes which cover the 4x4 tables, the line tables for small boards and the bytes path for boards over engine.cellsLimit
+sizes = [(4, 4), (3, 3), (2, 5), (5, 5), (6, 6), (3, 7), (7, 7), (16, 16)]
+
+
+def randomBoard(size, rng, largest=engine.maxExponent):
+    '''Return a packed board with about half of its cells empty, and a quarter holding the largest tile so that pairs of
+    them are common'''
+    return engine.packLine([rng.choice([0, 0, rng.randint(1, largest), largest]) for cell in range(size[0] * size[1])])
+
+
+def referenceMove(board, direction, size):
+    '''Move a packed board one line at a time with engine.slideLine, returning (board, gained, moved)'''
+    rows, columns = size
+    cells = engine.unpackLine(board, rows * columns)
+    if direction == engine.LEFT or direction == engine.RIGHT:
+        lines = [[row * columns + column for column in range(columns)] for row in range(rows)]
+    else:
+        lines = [[row * columns + column for row in range(rows)] for column in range(columns)]
+    if direction == engine.RIGHT or direction == engine.DOWN:
+        lines = [line[::-1] for line in lines]
+
+    newCells = [0] * len(cells)
+    gained = 0
+    for line in lines:
+        slid, lineGained = engine.slideLine([cells[cell] for cell in line])
+        gained += lineGained
+        for cell, exponent in zip(line, slid):
+            newCells[cell] = exponent
+    newBoard = engine.packLine(newCells)
+    return newBoard, gained, newBoard != board
+
+
+def testPackedLayout():
+    '''Cell (row, column) is the 4 bits at 4 * (row * columns + column), with the value stored as its exponent'''
+    board = engine.packBoard([2, 4, 0, 0, 0, 8, 0, 0, 0, 0, 0, 0, 0, 0, 0, 32768], (4, 4))
+    assert board == 0xF000_0000_0030_0021
+    assert engine.unpackBoard(board, (4, 4))[15] == 32768
+    assert engine.boardToCells(board, (4, 4)) == bytes([1, 2, 0, 0, 0, 3] + [0] * 9 + [15])
+    assert engine.cellsToBoard(engine.boardToCells(board, (4, 4))) == board
+
+
+def testKnownMoves():
+    '''Merges happen once per tile, towards the direction moved, and never past maxExponent'''
+    row = engine.packBoard([2, 2, 4, 4] + [0] * 12, (4, 4))
+    assert engine.move(row, engine.LEFT) == (engine.packBoard([4, 8] + [0] * 14, (4, 4)), 12, True)
+    row = engine.packBoard([2, 2, 2, 2] + [0] * 12, (4, 4))
+    assert engine.move(row, engine.RIGHT) == (engine.packBoard([0, 0, 4, 4] + [0] * 12, (4, 4)), 8, True)
+    full = engine.packBoard([32768, 32768, 0, 0] + [0] * 12, (4, 4))
+    assert engine.move(full, engine.LEFT) == (full, 0, False)
+    assert engine.boardStatus(full, (4, 4))[0] == 1 << engine.RIGHT | 1 << engine.DOWN
+
+
+@pytest.mark.parametrize("size", sizes)
+def testMoveBoardMatchesSlideLine(size):
+    '''engine.moveBoard gives the same board, score and moved flag as sliding each line in Python'''
+    rng = Random(f"move {size}")
+    for i in range(300):
+        board = randomBoard(size, rng, rng.choice([3, engine.maxExponent]))
+        for direction in range(4):
+            assert engine.moveBoard(board, direction, size) == referenceMove(board, direction, size)
+
+
+@pytest.mark.parametrize("size", sizes)
+def testBoardStatusMatchesMoves(size):
+    '''boardStatus gives the directions that move a tile, the empty cell count and the largest exponent'''
+    rng = Random(f"status {size}")
+    for i in range(300):
+        board = randomBoard(size, rng, rng.choice([3, engine.maxExponent]))
+        legal = sum(1 << direction for direction in range(4) if referenceMove(board, direction, size)[2])
+        cells = engine.unpackLine(board, size[0] * size[1])
+        assert engine.boardStatus(board, size) == (legal, cells.count(0), max(cells))
+
+
+@pytest.mark.parametrize("size", sizes)
+def testMoveTracksMatchMoves(size):
+    '''Putting each tile where moveTracks says it goes, merging the pairs, gives the board moveBoard makes'''
+    rng = Random(f"tracks {size}")
+    for i in range(100):
+        board = randomBoard(size, rng)
+        for direction in range(4):
+            cells = [0] * (size[0] * size[1])
+            for start, end, merged in engine.moveTracks(board, direction, size):
+                exponent = (board >> (4 * start)) & 0xF
+                cells[end] = exponent + 1 if merged and cells[end] else exponent
+            assert engine.packLine(cells) == engine.moveBoard(board, direction, size)[0]
+
+
+@pytest.mark.parametrize("size", [(4, 4), (3, 5), (6, 6)])
+def testBatchMatchesScalarEngine(size):
+    '''batch.moveBatch and batch.legalMoves agree with the scalar engine, including tiles at maxExponent'''
+    rng = Random(f"batch {size}")
+    boards = [randomBoard(size, rng, rng.choice([3, engine.maxExponent])) for i in range(500)]
+    cells = np.array([list(engine.boardToCells(board, size)) for board in boards], dtype=np.uint8).reshape((-1,) + size)
+    moves = np.array([rng.randrange(4) for board in boards])
+
+    newCells, rewards, moved = batch.moveBatch(cells, moves)
+    legal = batch.legalMoves(cells)
+    for i, board in enumerate(boards):
+        newBoard, gained, hasMoved = engine.moveBoard(board, int(moves[i]), size)
+        assert engine.cellsToBoard(newCells[i].tobytes()) == newBoard
+        assert (rewards[i], moved[i]) == (gained, hasMoved)
+        assert sum(1 << direction for direction in range(4) if legal[i, direction]) == engine.boardStatus(board, size)[0]
+
+
+def testReplayBytes(tmp_path):
+    '''The replay log layout is fixed: header, then G, M, K, U and E chunks exactly as described in replay.py'''
+    path = tmp_path / "replays.bin"
+    writer = replay.ReplayWriter(str(path))
+    recorder = replay.ReplayRecorder(writer, 7, (4, 4), keyframeInterval=2)
+    recorder.recordSpawn(0, 1)
+    recorder.recordSpawn(5, 2)
+    recorder.recordMove(engine.LEFT, 3, 1, 0x1234, 4)
+    recorder.recordMove(engine.DOWN, 12, 2, 0x5678, 8)
+    recorder.rewind(1)
+    recorder.finish(4)
+    writer.close()
+
+    expected = (b"2048RPL\x01"
+                + b"G" + struct.pack("<QBBB", 7, 4, 4, 2) + bytes([0, 11])
+                + b"M" + struct.pack("<H", 2) + bytes([3 | 2 << 2]) + bytes([6, 25])
+                + b"K" + struct.pack("<IQ", 2, 8) + (0x5678).to_bytes(8, "little")
+                + b"U" + struct.pack("<I", 1)
+                + b"E" + struct.pack("<QI", 4, 1))
+    assert path.read_bytes() == expected
+
+    game, = replay.readReplays(str(path))
+    assert (game.seed, game.size, game.startSpawns) == (7, (4, 4), [(0, 1), (5, 2)])
+    assert (game.moves, game.spawns, game.finalScore) == ([engine.LEFT], [(3, 1)], 4)
+
+
+def testSpawnAndMoveEncoding():
+    '''Spawns take 1 byte on boards up to 128 cells and 2 above, and moves are packed 4 to a byte'''
+    spawns = [(0, 1), (127, 2), (64, 1)]
+    assert replay.encodeSpawns(spawns, (8, 16)) == bytes([0, 255, 128])
+    assert replay.decodeSpawns(replay.encodeSpawns(spawns, (8, 16)), (8, 16)) == spawns
+    largeSpawns = [(0, 1), (4095, 2), (300, 1)]
+    assert replay.encodeSpawns(largeSpawns, (64, 64)) == struct.pack("<3H", 0, 8191, 600)
+    assert replay.decodeSpawns(replay.encodeSpawns(largeSpawns, (64, 64)), (64, 64)) == largeSpawns
+
+    moves = [Random(3).randrange(4) for i in range(1001)]
+    assert replay.decodeMoves(replay.encodeMoves(moves), len(moves)) == moves
+
+
+def playRecordedGame(recorder, size, seed, moveCount, rng):
+    '''Play random moves on a board, recording them, and return the (packed board, score) after each move'''
+    spawns = SpawnStream(seed)
+    board = 0
+    for i in range(2):
+        board, cell, exponent = spawns.spawn(board, size)
+        recorder.recordSpawn(cell, exponent)
+
+    positions = []
+    score = 0
+    while len(positions) < moveCount:
+        legal = [direction for direction in range(4) if engine.moveBoard(board, direction, size)[2]]
+        if not legal:
+            break
+        direction = rng.choice(legal)
+        board, gained, moved = engine.moveBoard(board, direction, size)
+        score += gained
+        board, cell, exponent = spawns.spawn(board, size)
+        positions.append((board, score))
+        recorder.recordMove(direction, cell, exponent, board, score)
+    return positions
+
+
+def testReplayRoundTrip(tmp_path):
+    '''Games of several sizes, with keyframes and an undo, read back with the same boards and scores at every move'''
+    path = str(tmp_path / "replays.bin")
+    rng = Random("replays")
+    writer = replay.ReplayWriter(path)
+    games = []
+    for size in [(4, 4), (5, 5), (3, 7), (16, 16)]:
+        recorder = replay.ReplayRecorder(writer, rng.getrandbits(63), size, keyframeInterval=16, chunkSize=10)
+        positions = playRecordedGame(recorder, size, recorder.seed, 150, rng)
+        # Undo the last few moves, the game then ends on the board it went back to
+        recorder.rewind(len(positions) - 5)
+        positions = positions[:-5]
+        recorder.finish(positions[-1][1])
+        games.append((size, positions))
+    writer.close()
+
+    replays = replay.readReplays(path)
+    assert len(replays) == len(games)
+    for game, (size, positions) in zip(replays, games):
+        assert game.size == size
+        assert game.verify()
+        assert len(game.moves) == len(positions)
+        for moveIndex in range(0, len(positions), 7):
+            assert game.boardAt(moveIndex + 1) == positions[moveIndex]
+
+    # A new writer carries on the same file without writing the header again
+    replay.ReplayWriter(path).close()
+    assert len(replay.readReplays(path)) == len(games)
+
+
+def testParseDuration():
+    '''Times saved as text by older versions of the game, including games of a day or more'''
+    assert leaderboard.parseDuration("0:01:02") == 62000
+    assert leaderboard.parseDuration("1:00:00.500000") == 3600500
+    assert leaderboard.parseDuration("1 day, 2:00:00") == 26 * 3600000
+    assert leaderboard.parseDuration("3 days, 0:00:01") == (72 * 3600 + 1) * 1000
+    assert leaderboard.normalizeTime(["0:00:10", 50, "4 x 4"]) == [10000, 50, "4 x 4", 2048]
+    assert leaderboard.normalizeTime([10000, 50, "4 x 4", 4096]) == [10000, 50, "4 x 4", 4096]
+
+
+def writePickles(path, records, tail=b""):
+    '''Write records to a pickle file the way older versions of the game did, followed by any extra bytes'''
+    with open(path, "wb") as f:
+        for record in records:
+            pickle.dump(record, f)
+        f.write(tail)
+
+
+@pytest.mark.parametrize("tail", [b"", b"\x80", pickle.dumps([1, "4 x 4"])[:-3], b"\x80\x04\x95\xff\xff\xff\xff\xff\xff\x7f\x00", b"\xff" * 40])
+def testDamagedRecords(tmp_path, tail):
+    '''A damaged end of file ends the records, and the next record appended cuts it off so it can be read'''
+    path = str(tmp_path / "high_scores.bin")
+    writePickles(path, [[100, "4 x 4"], [200, "5 x 5"]], tail)
+    assert leaderboard.readPickles(path) == [[100, "4 x 4"], [200, "5 x 5"]]
+
+    leaderboard.appendRecord(path, [300, "4 x 4"])
+    leaderboard.appendRecord(path, [400, "6 x 6"])
+    assert leaderboard.readPickles(path) == [[100, "4 x 4"], [200, "5 x 5"], [300, "4 x 4"], [400, "6 x 6"]]
+    assert leaderboard.readPickles(str(tmp_path / "missing.bin")) == []
+
+
+def testMigrateTimesFile(tmp_path):
+    '''Text times are rewritten as milliseconds with the max tile, and a file already converted is left alone'''
+    path = str(tmp_path / "best_times.bin")
+    writePickles(path, [["0:02:00", 300, "4 x 4"], [5000, 40, "3 x 3", 2048], ["1 day, 0:00:00", 9000, "4 x 4"]])
+    assert leaderboard.migrateTimesFile(path)
+    assert leaderboard.readPickles(path) == [[120000, 300, "4 x 4", 2048], [5000, 40, "3 x 3", 2048],
+                                             [86400000, 9000, "4 x 4", 2048]]
+    assert not leaderboard.migrateTimesFile(path)
+
+
+def testLeaderboardImport(tmp_path):
+    '''The pickle files, backups included, are imported once when the database is created, and the times file is
+    only converted the first time'''
+    scores = str(tmp_path / "high_scores.bin")
+    backupScores = str(tmp_path / "backup_scores.bin")
+    times = str(tmp_path / "best_times.bin")
+    database = str(tmp_path / "leaderboard.db")
+    writePickles(scores, [[100, "4 x 4"], [300, "4 x 4"], [50, "5 x 5"]])
+    # The backup is an older copy of the same history, so its records aren't counted twice
+    writePickles(backupScores, [[100, "4 x 4"], [300, "4 x 4"]])
+    writePickles(times, [["0:01:00", 500, "4 x 4"], [30000, 400, "4 x 4", 4096]])
+
+    board = leaderboard.Leaderboard(database, [scores, backupScores], [times])
+    assert board.topScores(5) == [[300, "4 x 4"], [100, "4 x 4"], [50, "5 x 5"]]
+    assert board.topScores(5, "5 x 5") == [[50, "5 x 5"]]
+    assert board.bestTimes(5) == [[30000, 400, "4 x 4", 4096], [60000, 500, "4 x 4", 2048]]
+    assert (board.getMeta("imported"), board.getMeta("timesMigrated")) == ("1", "1")
+    assert leaderboard.readPickles(times)[0] == [60000, 500, "4 x 4", 2048]
+    board.addScore(999, "4 x 4")
+    board.close()
+
+    # Opening it again reads the database, not the pickle files, so text times added now aren't read or converted
+    writePickles(times, [["0:00:01", 1, "4 x 4"]])
+    board = leaderboard.Leaderboard(database, [scores, backupScores], [times])
+    assert board.topScores(1) == [[999, "4 x 4"]]
+    assert len(board.bestTimes(5)) == 2
+    board.close()
+    assert leaderboard.readPickles(times) == [["0:00:01", 1, "4 x 4"]]
@@ -0,0 +1,78 @@
+# Board viewport
+# Works out how big the tiles are drawn and which cells are on screen. Tiles are drawn at their normal 100 pixels when the
+# board fits in the largest window allowed, and are shrunk to fit when it doesn't. Once tiles reach the smallest size that
+# can still be read the board no longer fits, so only the cells inside the window are drawn and the view can be scrolled.
+
+# The largest window the game will open, and the tile sizes used
+maxWindowSize = (900, 900)
+maxTileSize = 100
+minTileSize = 12
+
+
+def getTileGap(tileSize):
+    '''Return the gap between tiles of the size given, a tenth of the tile size as with the normal 100 pixel tiles'''
+    return max(1, tileSize // 10)
+
+
+def getTileSize(boardSize):
+    '''Return the largest tile size that lets a board of (rows, columns) fit in the largest window, but no smaller than minTileSize'''
+    rows, columns = boardSize
+    for tileSize in range(maxTileSize, minTileSize, -1):
+        step = tileSize + getTileGap(tileSize)
+        if columns * step + getTileGap(tileSize) <= maxWindowSize[0] and rows * step + getTileGap(tileSize) <= maxWindowSize[1]:
+            return tileSize
+    return minTileSize
+
+
+def getWindowSize(boardSize):
+    '''Return the window size for a board of (rows, columns), 450 x 450 for a 4 x 4 board and never more than maxWindowSize'''
+    tileSize = getTileSize(boardSize)
+    step = tileSize + getTileGap(tileSize)
+    width = boardSize[1] * step + getTileGap(tileSize)
+    height = boardSize[0] * step + getTileGap(tileSize)
+    return (min(width, maxWindowSize[0]), min(height, maxWindowSize[1]))
+
+
+class Viewport:
+    '''The part of a board shown in the window, and where each cell in it is drawn'''
+
+    def __init__(self, boardSize, windowSize):
+        '''Fit a board of (rows, columns) into a window of (width, height) pixels, starting at the top left cell'''
+        self.size = boardSize
+        self.tileSize = getTileSize(boardSize)
+        self.tileGap = getTileGap(self.tileSize)
+        step = self.tileSize + self.tileGap
+
+        # How many whole rows and columns fit in the window
+        self.visibleRows = min(boardSize[0], max(1, (windowSize[1] - self.tileGap) // step))
+        self.visibleColumns = min(boardSize[1], max(1, (windowSize[0] - self.tileGap) // step))
+        self.firstRow = 0
+        self.firstColumn = 0
+        self.update()
+
+    def fitsWindow(self):
+        '''Check if every cell of the board is shown'''
+        return self.visibleRows == self.size[0] and self.visibleColumns == self.size[1]
+
+    def scroll(self, rows, columns):
+        '''Move the view by a number of rows and columns, stopping at the edges of the board. Returns True if the view moved'''
+        firstRow = min(max(0, self.firstRow + rows), self.size[0] - self.visibleRows)
+        firstColumn = min(max(0, self.firstColumn + columns), self.size[1] - self.visibleColumns)
+        if (firstRow, firstColumn) == (self.firstRow, self.firstColumn):
+            return False
+        self.firstRow = firstRow
+        self.firstColumn = firstColumn
+        self.update()
+        return True
+
+    def update(self):
+        '''Work out which cells are shown and the top left corner of each one on screen'''
+        step = self.tileSize + self.tileGap
+        columns = self.size[1]
+        # The position of every cell, relative to the view, so cells off screen are drawn outside the window
+        self.positions = [((column - self.firstColumn) * step + self.tileGap, (row - self.firstRow) * step + self.tileGap)
+                          for row in range(self.size[0]) for column in range(columns)]
+        # The cells that are shown, row by row
+        self.visibleCells = [row * columns + column
+                             for row in range(self.firstRow, self.firstRow + self.visibleRows)
+                             for column in range(self.firstColumn, self.firstColumn + self.visibleColumns)]